@@ -0,0 +1,135 @@
+"""
+Benchmark generate_dataframe: bản trải lịch từng ô (trước khi vector hoá) so với bản NumPy hiện tại.
+
+Dữ liệu: 150 nhân sự × 3 dự án × 8 công việc rải trong năm 2025 (3.600 dòng × 365 ngày).
+Hai bản phải cho cùng DataFrame (assert_frame_equal, kể cả kiểu dữ liệu) trước khi so thời gian.
+
+Chạy từ thư mục gốc của repo:
+    python benchmarks/bench_generate_dataframe.py [--staff 150] [--projects 3] [--tasks 8] [--repeat 3]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+from typing import List
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.POD_Calendar import load_holidays
+from src.POD_TimeTracker import generate_dataframe
+
+def make_forms(staff: int = 150, projects: int = 3, tasks: int = 8, seed: int = 2025) -> List[dict]:
+    """
+    Hàm sinh kết quả processing_json giả: mỗi nhân sự có `projects` dự án, mỗi dự án `tasks` công việc
+    dài 1 -> 20 ngày, bắt đầu ngẫu nhiên trong năm 2025. Ngày cuối cùng của năm luôn được phủ để lịch đủ 365 ngày.
+    """
+    rng = random.Random(seed)
+    year_start = datetime(2025, 1, 1)
+    forms = []
+    for person in range(staff):
+        person_projects = []
+        for project in range(projects):
+            infos = []
+            for task in range(tasks):
+                start = year_start + timedelta(days=rng.randrange(0, 345))
+                end = start + timedelta(days=rng.randrange(0, 20))
+                infos.append({
+                    "Mô tả công việc": f"Công việc {task + 1}",
+                    "Kế hoạch - Từ": start.strftime("%Y-%m-%d"),
+                    "Kế hoạch - Đến": end.strftime("%Y-%m-%d"),
+                    "QTY": round(rng.uniform(0.5, 8), 2),
+                    "Nơi làm việc": "Văn phòng"
+                })
+            person_projects.append({"Mã dự án": f"ES{project:03d}", "Thông tin": infos})
+        forms.append({"Tên nhân sự": f"Nhân sự {person:03d}", "Dự án": person_projects})
+    forms[0]["Dự án"][0]["Thông tin"][0]["Kế hoạch - Đến"] = "2025-12-31"
+    return forms
+
+def generate_dataframe_rows(json_data: List[dict]) -> pd.DataFrame:
+    """
+    Bản generate_dataframe trước khi vector hoá (duyệt từng công việc × từng ngày). Khác bản gốc duy nhất ở điều kiện
+    ngày làm việc: có thêm ngày nghỉ lễ (load_holidays) để cùng quy tắc với lịch hiện tại.
+    """
+    holidays = set(load_holidays())
+    rows = []
+    stt_global = 0
+
+    start_dates = []
+    end_dates = []
+    for person in json_data:
+        for project in person["Dự án"]:
+            for task in project["Thông tin"]:
+                if task.get("Kế hoạch - Từ"):
+                    start_dates.append(task["Kế hoạch - Từ"])
+                if task.get("Kế hoạch - Đến"):
+                    end_dates.append(task["Kế hoạch - Đến"])
+
+    date_min = min(datetime.strptime(d, "%Y-%m-%d") for d in start_dates)
+    date_max = max(datetime.strptime(d, "%Y-%m-%d") for d in end_dates)
+    calendar_days = pd.date_range(start=date_min, end=date_max)
+
+    for person in json_data:
+        name = person["Tên nhân sự"]
+        stt_global += 1
+        for project in person["Dự án"]:
+            ma_du_an = project["Mã dự án"]
+            for task in project["Thông tin"]:
+                start = task["Kế hoạch - Từ"]
+                end = task["Kế hoạch - Đến"]
+                QTY = task["QTY"]
+
+                row = {
+                    "STT": stt_global,
+                    "Tên nhân sự": name,
+                    "Mã dự án": ma_du_an,
+                    "Mô tả công việc": task["Mô tả công việc"],
+                    "Thời gian bắt đầu": start,
+                    "Thời gian kết thúc": end
+                }
+
+                start_date = datetime.strptime(start, "%Y-%m-%d")
+                end_date = datetime.strptime(end, "%Y-%m-%d")
+
+                for date in calendar_days:
+                    if start_date <= date <= end_date:
+                        if date.weekday() < 5 and date.strftime("%Y-%m-%d") not in holidays:
+                            row[date.strftime("%Y-%m-%d")] = QTY
+                        else:
+                            row[date.strftime("%Y-%m-%d")] = 0
+                    else:
+                        row[date.strftime("%Y-%m-%d")] = None
+
+                rows.append(row)
+    return pd.DataFrame(rows)
+
+def best_time(function, json_data: List[dict], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(json_data)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--staff", type=int, default=150)
+    parser.add_argument("--projects", type=int, default=3)
+    parser.add_argument("--tasks", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    json_data = make_forms(args.staff, args.projects, args.tasks)
+    expected = generate_dataframe_rows(json_data)
+    result = generate_dataframe(json_data)
+    pd.testing.assert_frame_equal(result, expected)
+    print(f"assert_frame_equal: OK ({result.shape[0]} dòng × {result.shape[1] - 6} ngày)")
+
+    before = best_time(generate_dataframe_rows, json_data, args.repeat)
+    after = best_time(generate_dataframe, json_data, args.repeat)
+    print(f"Từng ô (trước): {before:.2f} s")
+    print(f"NumPy (sau):    {after:.3f} s  (~{before / after:.0f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -26,4 +26,69 @@ CREATE TABLE IF NOT EXISTS "Session" (
     "user_id" VARCHAR(255) NOT NULL,
     "created_at" TIMESTAMP DEFAULT NOW(),
     "expires_at" TIMESTAMP
-);
\ No newline at end of file
+);
+CREATE INDEX IF NOT EXISTS "Session_user_id_idx" ON "Session" ("user_id");
+
+CREATE TABLE IF NOT EXISTS "SessionRevocation" (
+    "user_id" VARCHAR(255) PRIMARY KEY,
+    "not_before" TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS "MergeJob" (
+    "job_id" UUID PRIMARY KEY,
+    "user_id" VARCHAR(255) NOT NULL,
+    "request_id" VARCHAR(255),
+    "dedup_key" VARCHAR(64) NOT NULL,
+    "payload" JSONB NOT NULL,
+    "status" VARCHAR(16) NOT NULL DEFAULT 'queued',
+    "stage" VARCHAR(32) NOT NULL DEFAULT 'queued',
+    "stages" JSONB NOT NULL DEFAULT '{}'::jsonb,
+    "attempts" INTEGER NOT NULL DEFAULT 0,
+    "max_attempts" INTEGER NOT NULL DEFAULT 3,
+    "result" JSONB,
+    "error" TEXT,
+    "worker_id" VARCHAR(255),
+    "created_at" TIMESTAMP NOT NULL DEFAULT NOW(),
+    "run_after" TIMESTAMP NOT NULL DEFAULT NOW(),
+    "started_at" TIMESTAMP,
+    "heartbeat_at" TIMESTAMP,
+    "finished_at" TIMESTAMP
+);
+-- Mỗi yêu cầu (theo dedup_key) chỉ có một job đang chờ hoặc đang chạy
+CREATE UNIQUE INDEX IF NOT EXISTS "MergeJob_dedup_key_active_idx" ON "MergeJob" ("dedup_key") WHERE "status" IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS "MergeJob_queued_idx" ON "MergeJob" ("created_at") WHERE "status" = 'queued';
+CREATE INDEX IF NOT EXISTS "MergeJob_running_idx" ON "MergeJob" ("heartbeat_at") WHERE "status" = 'running';
+CREATE INDEX IF NOT EXISTS "MergeJob_user_id_idx" ON "MergeJob" ("user_id", "created_at");
+
+-- Ô ngày của các file form đã merge (mỗi file form giữ phiên bản mới nhất), partition theo năm của "work_date".
+-- Partition của từng năm được tạo khi nạp dữ liệu (POD_Timesheet_DB.ensure_timesheet_partitions)
+CREATE TABLE IF NOT EXISTS "TimesheetEntry" (
+    "source_file" VARCHAR(1024) NOT NULL,
+    "employee" VARCHAR(255),
+    "project" VARCHAR(255),
+    "task" TEXT,
+    "work_date" DATE NOT NULL,
+    "hours" DOUBLE PRECISION NOT NULL
+) PARTITION BY RANGE ("work_date");
+CREATE INDEX IF NOT EXISTS "TimesheetEntry_employee_date_idx" ON "TimesheetEntry" ("employee", "work_date");
+CREATE INDEX IF NOT EXISTS "TimesheetEntry_project_date_idx" ON "TimesheetEntry" ("project", "work_date");
+CREATE INDEX IF NOT EXISTS "TimesheetEntry_source_file_idx" ON "TimesheetEntry" ("source_file");
+
+CREATE TABLE IF NOT EXISTS "TimesheetSource" (
+    "source_file" VARCHAR(1024) PRIMARY KEY,
+    "source_etag" VARCHAR(255) NOT NULL,
+    "summary_file" VARCHAR(1024),
+    "row_count" INTEGER NOT NULL DEFAULT 0,
+    "loaded_at" TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Tổng số giờ theo (nhân sự, ngày) của "TimesheetEntry", cập nhật cùng transaction khi nạp file form
+-- ("entries" = số ô ngày đang góp vào tổng; dòng về 0 thì bị xoá)
+CREATE TABLE IF NOT EXISTS "EmployeeDailyHours" (
+    "employee" VARCHAR(255) NOT NULL,
+    "work_date" DATE NOT NULL,
+    "hours" NUMERIC(14, 4) NOT NULL,
+    "entries" INTEGER NOT NULL,
+    PRIMARY KEY ("employee", "work_date")
+);
+CREATE INDEX IF NOT EXISTS "EmployeeDailyHours_work_date_idx" ON "EmployeeDailyHours" ("work_date");
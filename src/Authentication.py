@@ -1,17 +1,169 @@
 import uuid
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import secrets
+import threading
 from datetime import datetime, timedelta
+from typing import Optional
+from src.DB_Connection import get_postgres_pool
+
+SESSION_TTL = timedelta(hours=8)
+SESSION_TOKEN_VERSION = "v1"
+
+# Khóa ký session token, bắt buộc phải cấu hình (dùng chung cho mọi process / instance của API).
+# Chỉ khi EVISOR_DEV_MODE=1 mới được phép thiếu SESSION_SECRET: khi đó dùng khóa ngẫu nhiên, token chỉ hợp lệ
+# trong process hiện tại và mất hiệu lực khi khởi động lại.
+EVISOR_DEV_MODE = os.getenv("EVISOR_DEV_MODE", "0") == "1"
+# Kiểm tra phiên qua bảng "Session" cho client chưa gửi session token (cách cũ, mỗi request một truy vấn DB).
+# Đã ngừng hỗ trợ: mặc định tắt, bật tạm bằng SESSION_LEGACY_FALLBACK=1 trong thời gian chuyển client sang token.
+# Sẽ bị xoá hẳn ở bản phát hành sau ngày SESSION_LEGACY_FALLBACK_UNTIL.
+SESSION_LEGACY_FALLBACK = os.getenv("SESSION_LEGACY_FALLBACK", "0") == "1"
+SESSION_LEGACY_FALLBACK_UNTIL = "2027-01-31"
+
+_session_secret = os.getenv("SESSION_SECRET")
+if not _session_secret:
+    if not EVISOR_DEV_MODE:
+        raise RuntimeError("SESSION_SECRET chưa được cấu hình. Đặt SESSION_SECRET (chuỗi ngẫu nhiên, ví dụ `openssl rand -hex 32`), hoặc EVISOR_DEV_MODE=1 khi chạy thử trên máy dev.")
+    print("EVISOR_DEV_MODE: SESSION_SECRET chưa được cấu hình, dùng khóa ngẫu nhiên: token chỉ hợp lệ trong process hiện tại.")
+    _session_secret = secrets.token_hex(32)
+SESSION_SECRET = _session_secret.encode("utf-8")
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(message: bytes) -> str:
+    return _b64encode(hmac.new(SESSION_SECRET, message, hashlib.sha256).digest())
+
+def create_session_token(user_id: str, session_id: str, issued_at: datetime, expires_at: datetime) -> str:
+    """
+    Tạo session token ký bằng HMAC-SHA256, mang theo user_id, session_id, thời điểm cấp và hết hạn.
+    Token có dạng `v1.<payload>.<chữ ký>` và được xác thực hoàn toàn trong process, không cần truy vấn DB.
+    """
+    payload = {
+        "uid": user_id,
+        "sid": session_id,
+        "iat": int(issued_at.timestamp() * 1000),
+        "exp": int(expires_at.timestamp() * 1000),
+    }
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    signing_input = f"{SESSION_TOKEN_VERSION}.{body}".encode("ascii")
+    return f"{SESSION_TOKEN_VERSION}.{body}.{_sign(signing_input)}"
+
+def verify_session_token(token: str, user_id: Optional[str] = None) -> Optional[dict]:
+    """
+    Kiểm tra chữ ký, thời hạn và trạng thái thu hồi của session token.
+    Trả về payload nếu token hợp lệ (và thuộc về user_id nếu được truyền vào), ngược lại trả về None.
+    """
+    try:
+        version, body, signature = token.split(".")
+    except (AttributeError, ValueError):
+        return None
+    if version != SESSION_TOKEN_VERSION:
+        return None
+    if not hmac.compare_digest(_sign(f"{version}.{body}".encode("ascii")), signature):
+        return None
+    try:
+        payload = json.loads(_b64decode(body))
+    except ValueError:
+        return None
+    if user_id is not None and payload.get("uid") != user_id:
+        return None
+    if payload.get("exp", 0) <= time.time() * 1000:
+        return None
+    if session_revocations.is_revoked(payload.get("uid"), payload.get("iat", 0)):
+        return None
+    return payload
+
+class SessionRevocations:
+    """
+    Danh sách thu hồi session được giữ trong bộ nhớ: user_id -> mốc "not_before" (epoch ms).
+    Token của user được cấp trước mốc này bị coi là đã thu hồi.
+    Danh sách được nạp lại định kỳ từ bảng "SessionRevocation" (SESSION_REVOCATION_REFRESH giây, mặc định 30)
+    để các process khác nhận được thay đổi; thay đổi trong process hiện tại có hiệu lực ngay.
+    """
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._not_before = {}
+        self._loaded_at = None
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self, conn):
+        cursor = conn.cursor()
+        try:
+            query = """
+                SELECT "user_id", "not_before" FROM "SessionRevocation" WHERE "not_before" > %s
+                """
+            cursor.execute(query, (datetime.now() - SESSION_TTL,))
+            self._not_before = {
+                user_id: int(not_before.timestamp() * 1000) for user_id, not_before in cursor.fetchall()
+            }
+            self._loaded_at = time.monotonic()
+        finally:
+            cursor.close()
+
+    def _refresh_if_stale(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_interval:
+            return
+        # Chỉ một luồng nạp lại, các luồng khác tiếp tục dùng danh sách hiện có
+        if not self._refresh_lock.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            with get_postgres_pool().connection() as conn:
+                self.refresh(conn)
+        except Exception as e:
+            print(f"Error refreshing session revocations: {str(e)}")
+            if self._loaded_at is None:
+                raise
+        finally:
+            self._refresh_lock.release()
+
+    def is_revoked(self, user_id: str, issued_at_ms: int) -> bool:
+        self._refresh_if_stale()
+        not_before = self._not_before.get(user_id)
+        return not_before is not None and issued_at_ms < not_before
+
+    def revoke(self, conn, user_id: str, not_before: datetime):
+        """Thu hồi mọi token của user_id được cấp trước not_before (không commit)."""
+        cursor = conn.cursor()
+        try:
+            query = """
+                INSERT INTO "SessionRevocation" ("user_id", "not_before") VALUES (%s, %s)
+                ON CONFLICT ("user_id") DO UPDATE SET "not_before" = GREATEST("SessionRevocation"."not_before", EXCLUDED."not_before")
+                """
+            cursor.execute(query, (user_id, not_before))
+        finally:
+            cursor.close()
+        not_before_ms = int(not_before.timestamp() * 1000)
+        self._not_before[user_id] = max(self._not_before.get(user_id, 0), not_before_ms)
+
+session_revocations = SessionRevocations(float(os.getenv("SESSION_REVOCATION_REFRESH", "30")))
+
+def revoke_user_sessions(conn, user_id: str):
+    """
+    Thu hồi ngay toàn bộ session đang có của user (dùng cho đăng xuất hoặc buộc đăng xuất).
+    """
+    session_revocations.revoke(conn, user_id, datetime.now() + timedelta(milliseconds=1))
+    conn.commit()
 
 def Authentication_function(conn, input):
     """
     Authenticate a user based on the provided username and password.
     
     Args:
-        conn: PostgreSQL connection object.
+        conn: PostgreSQL connection object borrowed from the pool (the caller returns it).
         input: Input data containing username and password.
     
     Returns:
         dict: Authentication result with status and message.
     """
+    cursor = None
     try:
         cursor = conn.cursor()
         query = """
@@ -23,7 +175,8 @@ def Authentication_function(conn, input):
         if user:
             session_id = str(uuid.uuid4())
             created_at = datetime.now()
-            expires_at = created_at + timedelta(hours=8)
+            expires_at = created_at + SESSION_TTL
+            session_token = create_session_token(user[0], session_id, created_at, expires_at)
 
             delete_query = """
                 DELETE FROM "Session" WHERE "user_id" = %s
@@ -36,6 +189,8 @@ def Authentication_function(conn, input):
                 VALUES (%s, %s, %s, %s)
                 """
             cursor.execute(insert_query, (session_id, user[0], created_at, expires_at))
+            # Mỗi user chỉ có một phiên: token cấp trước lần đăng nhập này không còn hợp lệ
+            session_revocations.revoke(conn, user[0], created_at)
             conn.commit()
             return {
                 "status": "success", 
@@ -44,7 +199,7 @@ def Authentication_function(conn, input):
                 "avatar": user[2],
                 "full_name": user[3],
                 "message": "Đăng nhập thành công!",
-                "session_id": session_id,
+                "session_id": session_token,
                 "expires_at": expires_at
                 }
         else:
@@ -61,19 +216,21 @@ def Authentication_function(conn, input):
             }
     
     finally:
-        cursor.close()
-        conn.close()
+        if cursor is not None:
+            cursor.close()
 
 def check_session(conn , user_id: str) -> bool:
     """
     Check if the session for the given user_id is valid.
     
     Args:
+        conn: PostgreSQL connection object borrowed from the pool (the caller returns it).
         user_id (str): The user ID to check the session for.
     
     Returns:
         bool: True if the session is valid, False otherwise.
     """
+    cursor = None
     try:
         cursor = conn.cursor()
         query = """
@@ -92,10 +249,11 @@ def check_session(conn , user_id: str) -> bool:
         return False
     
     finally:
-        cursor.close()
-        conn.close()
+        if cursor is not None:
+            cursor.close()
 
 def Authentication_Logout_function(conn, input):
+    cursor = None
     try:
         user = input.username
         if user:
@@ -104,7 +262,7 @@ def Authentication_Logout_function(conn, input):
                 DELETE FROM "Session" WHERE "user_id" = %s
                 """
             cursor.execute(delete_query, (user,))
-            conn.commit()
+            revoke_user_sessions(conn, user)
             return {
                 "status": "success", 
                 "message": "Đăng xuất thành công!"
@@ -113,4 +271,26 @@ def Authentication_Logout_function(conn, input):
         return {
             "status": "error", 
             "message": str(e)
-            }
\ No newline at end of file
+            }
+    finally:
+        if cursor is not None:
+            cursor.close()
+
+_legacy_fallback_warned = False
+
+def validate_session(user_id: str, session_token: Optional[str] = None) -> bool:
+    """
+    Kiểm tra phiên làm việc của một request: session token được xác thực ngay trong process (không truy vấn DB).
+    Request không có token bị từ chối, trừ khi bật SESSION_LEGACY_FALLBACK=1 (kiểm tra cũ qua bảng "Session",
+    đã ngừng hỗ trợ, xem SESSION_LEGACY_FALLBACK_UNTIL).
+    """
+    global _legacy_fallback_warned
+    if session_token:
+        return verify_session_token(session_token, user_id) is not None
+    if not SESSION_LEGACY_FALLBACK:
+        return False
+    if not _legacy_fallback_warned:
+        _legacy_fallback_warned = True
+        print(f"Cảnh báo: có request không gửi session token, đang kiểm tra qua bảng \"Session\" (SESSION_LEGACY_FALLBACK). Cách này sẽ bị xoá sau {SESSION_LEGACY_FALLBACK_UNTIL}.")
+    with get_postgres_pool().connection() as conn:
+        return check_session(conn, user_id)
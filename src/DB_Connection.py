@@ -1,22 +1,184 @@
 import psycopg2
+from psycopg2 import pool
 import os
+import threading
+import time
+from contextlib import contextmanager
+
+class PostgresPool:
+    """
+    Pool kết nối PostgreSQL dùng chung cho toàn bộ process.
+    Kết nối được mượn qua context manager `connection()` và tự trả lại pool khi ra khỏi khối `with`.
 
-def get_postgres_connection(POSTGRESQL_SERVER: str, POSTGRES_PORT_EXTERNAL: str, POSTGRES_DB: str, POSTGRES_USER: str, POSTGRES_PASSWORD: str):
-    """Establish a connection to the PostgreSQL database using environment variables.
     Args:
-        POSTGRESQL_SERVER (str): Hostname of the PostgreSQL server.
-        POSTGRES_PORT_EXTERNAL (str): External port of the PostgreSQL server.
-        POSTGRES_DB (str): Name of the PostgreSQL database.
-        POSTGRES_USER (str): Username for the PostgreSQL database.
-        POSTGRES_PASSWORD (str): Password for the PostgreSQL database.
-    Returns:
-        psycopg2.extensions.connection: A connection object to the PostgreSQL database.
+        minconn (int): Số kết nối tối thiểu luôn được giữ mở.
+        maxconn (int): Số kết nối tối đa được mở đồng thời.
+        checkout_timeout (float): Thời gian tối đa (giây) chờ khi pool đã dùng hết kết nối.
+        healthcheck_idle (float): Kết nối rảnh lâu hơn số giây này sẽ được kiểm tra bằng `SELECT 1` trước khi cho mượn.
+        **conn_kwargs: Tham số truyền cho `psycopg2.connect`.
+    """
+    def __init__(self, minconn: int, maxconn: int, checkout_timeout: float = 10.0, healthcheck_idle: float = 30.0, **conn_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **conn_kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        # id của các kết nối đang rảnh trong pool (psycopg2 chỉ giữ lại tối đa minconn kết nối rảnh, còn lại đóng khi trả)
+        prefilled = [self._pool.getconn() for _ in range(minconn)]
+        for conn in prefilled:
+            self._pool.putconn(conn)
+        self._idle = {id(conn) for conn in prefilled}
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.healthcheck_idle:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _getconn(self):
+        conn = self._pool.getconn()
+        with self._lock:
+            self._idle.discard(id(conn))
+        return conn
+
+    def _checkout(self):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise pool.PoolError(f"Không lấy được kết nối PostgreSQL sau {self.checkout_timeout} giây (pool đã dùng hết {self.maxconn} kết nối).")
+        waited = time.monotonic() - started
+        try:
+            conn = self._getconn()
+            while not self._is_healthy(conn):
+                with self._lock:
+                    self._discarded += 1
+                    self._last_used.pop(id(conn), None)
+                    self._pool.putconn(conn, close=True)
+                conn = self._getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def _checkin(self, conn, broken: bool = False):
+        try:
+            if not broken and not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
+            broken = broken or bool(conn.closed)
+            with self._lock:
+                self._in_use -= 1
+                if broken:
+                    self._discarded += 1
+                    self._last_used.pop(id(conn), None)
+                else:
+                    self._last_used[id(conn)] = time.monotonic()
+                # Trả kết nối trong lock để _idle luôn khớp với các kết nối rảnh trong pool
+                self._pool.putconn(conn, close=broken)
+                if not conn.closed:
+                    self._idle.add(id(conn))
+                else:
+                    self._last_used.pop(id(conn), None)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Mượn một kết nối từ pool. Giao dịch chưa commit sẽ bị rollback khi trả kết nối.
+        Kết nối bị lỗi ở tầng kết nối (OperationalError/InterfaceError) sẽ bị đóng thay vì trả về pool.
+        """
+        conn = self._checkout()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self._checkin(conn, broken=broken)
+
+    def stats(self) -> dict:
+        """
+        Trả về thống kê của pool: số kết nối đang dùng, đang rảnh và thời gian chờ khi mượn kết nối.
+        """
+        with self._lock:
+            idle = len(self._idle)
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "idle": idle,
+                "open": self._in_use + idle,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_avg_ms": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+    def close(self):
+        with self._lock:
+            self._idle.clear()
+        self._pool.closeall()
+
+_postgres_pool = None
+_postgres_pool_pid = None
+_postgres_pool_lock = threading.Lock()
+
+def get_postgres_pool() -> PostgresPool:
+    """
+    Trả về pool kết nối PostgreSQL dùng chung của process hiện tại (khởi tạo ở lần gọi đầu tiên).
+    Kích thước pool cấu hình qua biến môi trường POSTGRES_POOL_MIN, POSTGRES_POOL_MAX,
+    thời gian chờ qua POSTGRES_POOL_TIMEOUT và ngưỡng kiểm tra kết nối rảnh qua POSTGRES_POOL_HEALTHCHECK_IDLE.
+    Process con (fork) sẽ tự tạo pool riêng, không dùng chung socket với process cha.
     """
-    conn = psycopg2.connect(
-        host=os.getenv("POSTGRESQL_SERVER"),
-        port=os.getenv("POSTGRES_PORT_EXTERNAL"),
-        database=os.getenv("POSTGRES_DB"),
-        user=os.getenv("POSTGRES_USER"),
-        password=os.getenv("POSTGRES_PASSWORD")
-    )
-    return conn
\ No newline at end of file
+    global _postgres_pool, _postgres_pool_pid
+    with _postgres_pool_lock:
+        if _postgres_pool is None or _postgres_pool_pid != os.getpid():
+            _postgres_pool = PostgresPool(
+                minconn=int(os.getenv("POSTGRES_POOL_MIN", "1")),
+                maxconn=int(os.getenv("POSTGRES_POOL_MAX", "10")),
+                checkout_timeout=float(os.getenv("POSTGRES_POOL_TIMEOUT", "10")),
+                healthcheck_idle=float(os.getenv("POSTGRES_POOL_HEALTHCHECK_IDLE", "30")),
+                host=os.getenv("POSTGRESQL_SERVER"),
+                port=os.getenv("POSTGRES_PORT_EXTERNAL"),
+                database=os.getenv("POSTGRES_DB"),
+                user=os.getenv("POSTGRES_USER"),
+                password=os.getenv("POSTGRES_PASSWORD")
+            )
+            _postgres_pool_pid = os.getpid()
+        return _postgres_pool
+
+def close_postgres_pool():
+    """Đóng toàn bộ kết nối của pool dùng chung (gọi khi tắt ứng dụng)."""
+    global _postgres_pool
+    with _postgres_pool_lock:
+        if _postgres_pool is not None and _postgres_pool_pid == os.getpid():
+            _postgres_pool.close()
+        _postgres_pool = None
@@ -0,0 +1,202 @@
+import os
+import time
+import asyncio
+import functools
+import threading
+import multiprocessing
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.POD_Calendar import init_business_calendar, get_business_calendar_holidays
+
+# Số luồng của "làn nhanh": các endpoint nhẹ (đăng nhập, presign, trạng thái job...) chạy trên pool luồng riêng,
+# không phải chờ chung threadpool với các endpoint nặng
+FAST_LANE_WORKERS = int(os.getenv("FAST_LANE_WORKERS", "8"))
+# Số process chạy phần tốn CPU của merge (0 = chạy ngay trên luồng worker của job, trong process API)
+POD_MERGE_PROCESSES = int(os.getenv("POD_MERGE_PROCESSES", os.getenv("POD_JOB_WORKERS", "2")))
+
+class FastLane:
+    """
+    Pool luồng riêng cho các endpoint nhẹ, kèm thống kê số request đang chạy và thời gian chờ luồng.
+
+    Args:
+        workers (int): Số luồng tối đa.
+    """
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fast-lane")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._calls = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _call(self, submitted: float, func, args, kwargs):
+        waited = time.monotonic() - submitted
+        with self._lock:
+            self._calls += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return func(*args, **kwargs)
+
+    async def run(self, func, *args, **kwargs):
+        """Chạy hàm đồng bộ func trên pool luồng của làn nhanh và chờ kết quả (không chặn event loop)."""
+        with self._lock:
+            self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._call, time.monotonic(), func, args, kwargs)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": self._in_flight,
+                "queued": max(self._in_flight - self.workers, 0),
+                "calls": self._calls,
+                "wait_avg_ms": round(self._wait_total / self._calls * 1000, 3) if self._calls else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+_fast_lane = None
+_fast_lane_lock = threading.Lock()
+
+def get_fast_lane() -> FastLane:
+    """
+    Trả về làn nhanh dùng chung của process hiện tại (khởi tạo ở lần gọi đầu tiên, FAST_LANE_WORKERS luồng).
+    """
+    global _fast_lane
+    with _fast_lane_lock:
+        if _fast_lane is None:
+            _fast_lane = FastLane(FAST_LANE_WORKERS)
+        return _fast_lane
+
+def fast_lane(func):
+    """
+    Decorator cho endpoint đồng bộ: endpoint được chạy trên làn nhanh thay vì threadpool chung của FastAPI.
+    Chữ ký hàm được giữ nguyên (qua __wrapped__) nên FastAPI vẫn đọc tham số như cũ.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await get_fast_lane().run(func, *args, **kwargs)
+    return wrapper
+
+def shutdown_fast_lane():
+    global _fast_lane
+    with _fast_lane_lock:
+        if _fast_lane is not None:
+            _fast_lane.shutdown()
+            _fast_lane = None
+
+class MergeExecutor:
+    """
+    Pool process riêng cho phần tốn CPU của merge (dựng timesheet, ghi file xlsx), kèm thống kê số tác vụ
+    đang chạy / đang chờ process và thời gian chạy. Process bị kill giữa chừng (vd. hết bộ nhớ) thì pool được tạo lại.
+
+    Args:
+        processes (int): Số process tối đa.
+    """
+    def __init__(self, processes: int):
+        self.processes = processes
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._calls = 0
+        self._broken = 0
+        self._duration_total = 0.0
+        self._duration_max = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                mp_context = multiprocessing.get_context("forkserver")
+                # Forkserver import sẵn module merge (pandas, openpyxl) một lần, process con khởi động nhanh hơn
+                mp_context.set_forkserver_preload(["src.POD_TimeTracker"])
+                # Process con dùng đúng lịch nghỉ lễ của process này (không tự đọc lại POD_HOLIDAYS / POD_HOLIDAYS_FILE)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=mp_context,
+                    initializer=init_business_calendar,
+                    initargs=(get_business_calendar_holidays(),)
+                )
+            return self._executor
+
+    def run(self, func, *args):
+        """Chạy func(*args) (hàm cấp module, tham số pickle được) trên một process của pool và chờ kết quả."""
+        executor = self._get_executor()
+        started = time.monotonic()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            return executor.submit(func, *args).result()
+        except BrokenProcessPool:
+            with self._lock:
+                self._broken += 1
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            duration = time.monotonic() - started
+            with self._lock:
+                self._in_flight -= 1
+                self._calls += 1
+                self._duration_total += duration
+                self._duration_max = max(self._duration_max, duration)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "processes": self.processes,
+                "in_flight": self._in_flight,
+                "queued": max(self._in_flight - self.processes, 0),
+                "calls": self._calls,
+                "broken": self._broken,
+                "duration_avg_ms": round(self._duration_total / self._calls * 1000, 3) if self._calls else 0.0,
+                "duration_max_ms": round(self._duration_max * 1000, 3),
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+_merge_executor = None
+_merge_executor_lock = threading.Lock()
+
+def get_merge_executor() -> Optional[MergeExecutor]:
+    """
+    Trả về pool process merge dùng chung (POD_MERGE_PROCESSES process, khởi tạo ở lần gọi đầu tiên),
+    hoặc None nếu POD_MERGE_PROCESSES = 0.
+    """
+    global _merge_executor
+    if POD_MERGE_PROCESSES <= 0:
+        return None
+    with _merge_executor_lock:
+        if _merge_executor is None:
+            _merge_executor = MergeExecutor(POD_MERGE_PROCESSES)
+        return _merge_executor
+
+def run_merge_task(func, *args):
+    """
+    Chạy phần tốn CPU của merge trong pool process merge, để pandas/openpyxl không tranh GIL với các endpoint
+    của process API. Nếu POD_MERGE_PROCESSES = 0 thì chạy ngay trên luồng hiện tại.
+    """
+    executor = get_merge_executor()
+    if executor is None:
+        return func(*args)
+    return executor.run(func, *args)
+
+def shutdown_merge_executor():
+    global _merge_executor
+    with _merge_executor_lock:
+        if _merge_executor is not None:
+            _merge_executor.shutdown()
+            _merge_executor = None
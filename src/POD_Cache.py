@@ -0,0 +1,447 @@
+import os
+import json
+import hashlib
+import tempfile
+import time
+import threading
+import pandas as pd
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+from src.POD_Calendar import holiday_fingerprint
+
+# Cache kết quả parse form: tầng bộ nhớ (LRU, theo số form) và tầng đĩa (Parquet, giới hạn theo dung lượng).
+# Cấu hình qua POD_CACHE_MEMORY_ITEMS, POD_CACHE_DIR, POD_CACHE_DISK_MAX_BYTES (0 = tắt tầng đĩa).
+POD_CACHE_MEMORY_ITEMS = int(os.getenv("POD_CACHE_MEMORY_ITEMS", "256"))
+POD_CACHE_DIR = os.getenv("POD_CACHE_DIR", os.path.join(tempfile.gettempdir(), "evisor_pod_cache"))
+POD_CACHE_DISK_MAX_BYTES = int(os.getenv("POD_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+# Phiên bản cách parse form. Tăng số này khi processing_json thay đổi kết quả để bỏ qua các kết quả parse đã cache.
+POD_FORM_PARSER_VERSION = "3"
+# Cache nội dung file xlsx (dạng bảng) cho POD_TimeTracker_Getfile, lưu trong thư mục con "workbooks" của POD_CACHE_DIR.
+POD_WORKBOOK_CACHE_ITEMS = int(os.getenv("POD_WORKBOOK_CACHE_ITEMS", "16"))
+# Cache nội dung JSON đã serialize của POD_TimeTracker_Getfile và URL presigned của POD_TimeTracker_Download (có TTL).
+POD_PAYLOAD_CACHE_TTL = float(os.getenv("POD_PAYLOAD_CACHE_TTL", "300"))
+POD_PAYLOAD_CACHE_ITEMS = int(os.getenv("POD_PAYLOAD_CACHE_ITEMS", "64"))
+POD_PAYLOAD_CACHE_MAX_BYTES = int(os.getenv("POD_PAYLOAD_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+POD_PRESIGN_EXPIRES = int(os.getenv("POD_PRESIGN_EXPIRES", "3600"))
+POD_PRESIGN_CACHE_TTL = float(os.getenv("POD_PRESIGN_CACHE_TTL", str(POD_PRESIGN_EXPIRES - 600)))
+# Cache kết quả POD_TimeTracker_Validate theo (bucket, object, ETag), có TTL.
+POD_VALIDATION_CACHE_TTL = float(os.getenv("POD_VALIDATION_CACHE_TTL", "3600"))
+POD_VALIDATION_CACHE_ITEMS = int(os.getenv("POD_VALIDATION_CACHE_ITEMS", "1024"))
+# Chỉ mục kết quả merge: mỗi bộ input (ETag) -> file tổng hợp đã xuất. Cấu hình qua POD_MERGE_INDEX_DIR, POD_MERGE_INDEX_MAX_BYTES.
+POD_MERGE_INDEX_DIR = os.getenv("POD_MERGE_INDEX_DIR", os.path.join(tempfile.gettempdir(), "evisor_pod_merge_index"))
+POD_MERGE_INDEX_MAX_BYTES = int(os.getenv("POD_MERGE_INDEX_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Các cột của bảng công việc đã chuẩn hoá, theo đúng thứ tự nhân sự / dự án / công việc trong form
+FORM_RECORD_COLUMNS = ["Tên nhân sự", "Mã dự án", "Mô tả công việc", "Kế hoạch - Từ", "Kế hoạch - Đến", "QTY", "Nơi làm việc"]
+TASK_FIELDS = ["Mô tả công việc", "Kế hoạch - Từ", "Kế hoạch - Đến", "QTY", "Nơi làm việc"]
+
+def json_to_records(json_data: List[dict]) -> pd.DataFrame:
+    """
+    Hàm chuyển kết quả processing_json (nhân sự -> dự án -> công việc) thành bảng phẳng FORM_RECORD_COLUMNS.
+    """
+    rows = [
+        (person["Tên nhân sự"], project["Mã dự án"], *(task[field] for field in TASK_FIELDS))
+        for person in json_data
+        for project in person["Dự án"]
+        for task in project["Thông tin"]
+    ]
+    records = pd.DataFrame.from_records(rows, columns=FORM_RECORD_COLUMNS)
+    records["QTY"] = records["QTY"].astype(float)
+    return records
+
+def records_to_json(records: pd.DataFrame) -> List[dict]:
+    """
+    Hàm dựng lại kết quả processing_json từ bảng công việc phẳng, giữ nguyên thứ tự nhân sự / dự án / công việc.
+    """
+    names = records["Tên nhân sự"].tolist()
+    codes = [None if pd.isna(code) else code for code in records["Mã dự án"].tolist()]
+    columns = [records[field].tolist() for field in TASK_FIELDS]
+    people = {}
+    for name, code, values in zip(names, codes, zip(*columns)):
+        projects = people.setdefault(name, {})
+        projects.setdefault(code, []).append(dict(zip(TASK_FIELDS, values)))
+    return [
+        {
+            "Tên nhân sự": name,
+            "Dự án": [{"Mã dự án": code, "Thông tin": tasks} for code, tasks in projects.items()]
+        }
+        for name, projects in people.items()
+    ]
+
+def write_file_atomic(path: str, write):
+    """
+    Hàm ghi file qua file tạm rồi đổi tên, để process khác không bao giờ đọc phải file ghi dở.
+    Tham số write nhận đường dẫn file tạm và ghi nội dung vào đó.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def evict_oldest_files(directory: str, suffix: str, max_bytes: int):
+    """
+    Hàm xoá các file ít được dùng gần đây nhất (theo mtime) trong directory cho tới khi
+    tổng dung lượng các file có đuôi suffix không vượt quá max_bytes.
+    """
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.name.endswith(suffix):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+class FrameCache:
+    """
+    Cache DataFrame theo (bucket, tên object, ETag). Object được upload lại sẽ có ETag mới
+    nên không cần cơ chế huỷ cache: bản cũ chỉ đơn giản là không còn được tra tới và sẽ bị đẩy ra dần.
+
+    Args:
+        memory_items (int): Số bảng tối đa giữ trong bộ nhớ (LRU).
+        disk_dir (str): Thư mục lưu file Parquet của tầng đĩa.
+        disk_max_bytes (int): Dung lượng tối đa của tầng đĩa, 0 để tắt tầng đĩa.
+    """
+    def __init__(self, memory_items: int, disk_dir: Optional[str], disk_max_bytes: int):
+        self.memory_items = memory_items
+        self.disk_dir = disk_dir if disk_max_bytes > 0 else None
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def key(bucket_name: str, object_name: str, etag: str) -> str:
+        return hashlib.sha256(f"{bucket_name}\0{object_name}\0{etag}".encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.parquet")
+
+    def _remember(self, key: str, frame: pd.DataFrame):
+        with self._lock:
+            self._memory[key] = frame
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get_frame(self, bucket_name: str, object_name: str, etag: Optional[str]) -> Optional[pd.DataFrame]:
+        """
+        Trả về bảng đã lưu của object, hoặc None nếu chưa có.
+        """
+        if not etag:
+            with self._lock:
+                self._misses += 1
+            return None
+        key = self.key(bucket_name, object_name, etag)
+        with self._lock:
+            frame = self._memory.get(key)
+            if frame is not None:
+                self._memory.move_to_end(key)
+                self._memory_hits += 1
+        if frame is None and self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                frame = pd.read_parquet(path)
+                os.utime(path)
+            except (OSError, ValueError):
+                frame = None
+            if frame is not None:
+                self._remember(key, frame)
+                with self._lock:
+                    self._disk_hits += 1
+        if frame is None:
+            with self._lock:
+                self._misses += 1
+        return frame
+
+    def put_frame(self, bucket_name: str, object_name: str, etag: Optional[str], frame: pd.DataFrame):
+        """
+        Lưu bảng của object vào cả hai tầng cache.
+        """
+        if not etag:
+            return
+        key = self.key(bucket_name, object_name, etag)
+        self._remember(key, frame)
+        if self.disk_dir:
+            self._write_disk(key, frame)
+
+    def _write_disk(self, key: str, frame: pd.DataFrame):
+        path = self._disk_path(key)
+        try:
+            write_file_atomic(path, lambda tmp_path: frame.to_parquet(tmp_path, index=False))
+        except Exception as e:
+            # Bảng có cột kiểu hỗn hợp (vd. mô tả là số) không ghi được Parquet: chỉ giữ ở tầng bộ nhớ
+            print(f"Không ghi được cache Parquet {path}: {e}")
+            return
+        evict_oldest_files(self.disk_dir, ".parquet", self.disk_max_bytes)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._memory_hits + self._disk_hits + self._misses
+            hits = self._memory_hits + self._disk_hits
+            return {
+                "memory_items": len(self._memory),
+                "memory_max_items": self.memory_items,
+                "disk_dir": self.disk_dir,
+                "disk_max_bytes": self.disk_max_bytes,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+class ParsedFormCache(FrameCache):
+    """
+    Cache kết quả parse form (processing_json) theo (bucket, tên object, ETag), POD_FORM_PARSER_VERSION và lịch
+    nghỉ lễ (holiday_fingerprint, vì QTY được chia theo số ngày làm việc), lưu dưới dạng bảng công việc phẳng FORM_RECORD_COLUMNS.
+    """
+    @staticmethod
+    def _version(etag: Optional[str]) -> Optional[str]:
+        return f"{etag}|{POD_FORM_PARSER_VERSION}|{holiday_fingerprint()}" if etag else etag
+
+    def get(self, bucket_name: str, object_name: str, etag: Optional[str]) -> Optional[List[dict]]:
+        """
+        Trả về kết quả parse đã lưu của object (dạng processing_json), hoặc None nếu chưa có.
+        """
+        records = self.get_frame(bucket_name, object_name, self._version(etag))
+        return records_to_json(records) if records is not None else None
+
+    def put(self, bucket_name: str, object_name: str, etag: Optional[str], json_data: List[dict]):
+        """
+        Lưu kết quả parse hợp lệ của object vào cả hai tầng cache.
+        """
+        if etag:
+            self.put_frame(bucket_name, object_name, self._version(etag), json_to_records(json_data))
+
+class TTLCache:
+    """
+    Cache trong bộ nhớ có thời hạn: mỗi giá trị hết hạn sau ttl giây, ngoài ra bị đẩy ra theo LRU
+    khi vượt quá số phần tử hoặc tổng dung lượng (theo size khai báo khi put).
+
+    Args:
+        ttl (float): Thời gian sống mặc định (giây) của mỗi giá trị.
+        max_items (int): Số phần tử tối đa.
+        max_bytes (int): Tổng dung lượng tối đa, 0 là không giới hạn.
+    """
+    def __init__(self, ttl: float, max_items: int, max_bytes: int = 0):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _drop(self, key):
+        _, _, size = self._items.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] <= time.monotonic():
+                self._drop(key)
+                item = None
+            if item is None:
+                self._misses += 1
+                return None
+            self._items.move_to_end(key)
+            self._hits += 1
+            return item[1]
+
+    def put(self, key, value, size: int = 0, ttl: Optional[float] = None):
+        # Giá trị lớn hơn 1/4 dung lượng cho phép không được cache để không đẩy hết các giá trị khác ra
+        if self.max_bytes and size > self.max_bytes // 4:
+            return
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, size)
+            self._bytes += size
+            now = time.monotonic()
+            for old_key in [k for k, item in self._items.items() if item[0] <= now]:
+                self._drop(old_key)
+            while len(self._items) > self.max_items or (self.max_bytes and self._bytes > self.max_bytes):
+                self._drop(next(iter(self._items)))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "max_items": self.max_items,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+_parsed_form_cache = None
+_parsed_form_cache_lock = threading.Lock()
+
+def get_parsed_form_cache() -> ParsedFormCache:
+    """
+    Trả về cache kết quả parse form dùng chung của process (khởi tạo ở lần gọi đầu tiên).
+    """
+    global _parsed_form_cache
+    with _parsed_form_cache_lock:
+        if _parsed_form_cache is None:
+            _parsed_form_cache = ParsedFormCache(
+                memory_items=POD_CACHE_MEMORY_ITEMS,
+                disk_dir=POD_CACHE_DIR,
+                disk_max_bytes=POD_CACHE_DISK_MAX_BYTES
+            )
+        return _parsed_form_cache
+
+class MergeResultIndex:
+    """
+    Chỉ mục kết quả merge: cùng một bộ file đầu vào (theo thứ tự, cùng ETag), cùng file tổng hợp gốc
+    và cùng phiên bản pipeline thì trả lại file tổng hợp đã xuất thay vì dựng và upload lại.
+    Mỗi kết quả là một file JSON nhỏ trong index_dir, dùng chung được giữa các worker trên cùng máy.
+    Kết quả chỉ còn hiệu lực khi file tổng hợp còn tồn tại trên MinIO: người gọi kiểm tra bằng stat_object
+    và gọi discard() khi file đã bị xoá (theo lifecycle của bucket).
+
+    Args:
+        index_dir (str): Thư mục lưu chỉ mục.
+        max_bytes (int): Dung lượng tối đa của chỉ mục, kết quả ít được dùng nhất bị xoá trước.
+    """
+    def __init__(self, index_dir: str, max_bytes: int):
+        self.index_dir = index_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    @staticmethod
+    def key(inputs: List[tuple], summary: Optional[tuple], version: str) -> str:
+        """
+        Khoá của một lần merge: inputs là danh sách (object, ETag) theo thứ tự, summary là (object, ETag) của file gốc (nếu có).
+        """
+        payload = json.dumps({"version": version, "inputs": inputs, "summary": summary}, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.index_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Trả về kết quả đã lưu ({"output", "overwork", "created_at"}) hoặc None.
+        """
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            result = None
+        with self._lock:
+            if result is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return result
+
+    def put(self, key: str, output: str, overwork):
+        result = {"output": output, "overwork": overwork, "created_at": datetime.now().isoformat(timespec="seconds")}
+        def write(tmp_path):
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False)
+        write_file_atomic(self._path(key), write)
+        evict_oldest_files(self.index_dir, ".json", self.max_bytes)
+
+    def discard(self, key: str):
+        """
+        Xoá kết quả có file tổng hợp không còn trên MinIO.
+        """
+        with self._lock:
+            self._hits -= 1
+            self._misses += 1
+            self._stale += 1
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "index_dir": self.index_dir,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "stale": self._stale,
+            }
+
+_workbook_cache = None
+_workbook_cache_lock = threading.Lock()
+
+def get_workbook_cache() -> FrameCache:
+    """
+    Trả về cache nội dung file xlsx dùng chung của process (khởi tạo ở lần gọi đầu tiên).
+    """
+    global _workbook_cache
+    with _workbook_cache_lock:
+        if _workbook_cache is None:
+            _workbook_cache = FrameCache(
+                memory_items=POD_WORKBOOK_CACHE_ITEMS,
+                disk_dir=os.path.join(POD_CACHE_DIR, "workbooks"),
+                disk_max_bytes=POD_CACHE_DISK_MAX_BYTES
+            )
+        return _workbook_cache
+
+_payload_cache = TTLCache(POD_PAYLOAD_CACHE_TTL, POD_PAYLOAD_CACHE_ITEMS, POD_PAYLOAD_CACHE_MAX_BYTES)
+_presign_cache = TTLCache(POD_PRESIGN_CACHE_TTL, 4096)
+_validation_cache = TTLCache(POD_VALIDATION_CACHE_TTL, POD_VALIDATION_CACHE_ITEMS)
+
+def get_payload_cache() -> TTLCache:
+    """
+    Trả về cache nội dung JSON của POD_TimeTracker_Getfile, khoá theo (object, ETag, tham số lọc).
+    """
+    return _payload_cache
+
+def get_presign_cache() -> TTLCache:
+    """
+    Trả về cache URL presigned của POD_TimeTracker_Download, khoá theo (bucket, object, ETag).
+    URL được dùng lại tối đa POD_PRESIGN_CACHE_TTL giây, nên luôn còn hạn ít nhất POD_PRESIGN_EXPIRES - POD_PRESIGN_CACHE_TTL giây.
+    """
+    return _presign_cache
+
+def get_validation_cache() -> TTLCache:
+    """
+    Trả về cache kết quả kiểm tra form của POD_TimeTracker_Validate, khoá theo (bucket, object, ETag, POD_FORM_PARSER_VERSION, holiday_fingerprint).
+    """
+    return _validation_cache
+
+_merge_result_index = None
+_merge_result_index_lock = threading.Lock()
+
+def get_merge_result_index() -> MergeResultIndex:
+    """
+    Trả về chỉ mục kết quả merge dùng chung của process (khởi tạo ở lần gọi đầu tiên).
+    """
+    global _merge_result_index
+    with _merge_result_index_lock:
+        if _merge_result_index is None:
+            _merge_result_index = MergeResultIndex(POD_MERGE_INDEX_DIR, POD_MERGE_INDEX_MAX_BYTES)
+        return _merge_result_index
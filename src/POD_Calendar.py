@@ -0,0 +1,143 @@
+import os
+import hashlib
+import numpy as np
+from typing import List, Optional
+
+# Ngày nghỉ lễ mặc định (Tết Dương lịch, Tết Nguyên đán, Giỗ Tổ Hùng Vương, 30/4, 1/5, Quốc khánh), chỉ có năm 2025 và 2026.
+# Có thể thay thế bằng biến môi trường POD_HOLIDAYS (danh sách ngày YYYY-MM-DD cách nhau bởi dấu phẩy)
+# hoặc POD_HOLIDAYS_FILE (file mỗi dòng một ngày, dòng bắt đầu bằng # được bỏ qua).
+# Lịch chỉ "phủ" các năm có ít nhất một ngày trong danh sách đang dùng. Ngày kế hoạch thuộc năm chưa được phủ
+# vẫn được tính (chỉ trừ Thứ 7, Chủ nhật) nhưng bị cảnh báo; đặt POD_HOLIDAYS_STRICT=1 để báo lỗi thay vì cảnh báo.
+# Khi sang năm mới cần bổ sung ngày nghỉ lễ của năm đó (nên dùng POD_HOLIDAYS_FILE).
+DEFAULT_HOLIDAYS = [
+    # 2025
+    "2025-01-01",
+    "2025-01-27", "2025-01-28", "2025-01-29", "2025-01-30", "2025-01-31",
+    "2025-04-07",
+    "2025-04-30", "2025-05-01",
+    "2025-09-01", "2025-09-02",
+    # 2026
+    "2026-01-01",
+    "2026-02-16", "2026-02-17", "2026-02-18", "2026-02-19", "2026-02-20",
+    "2026-04-27",
+    "2026-04-30", "2026-05-01",
+    "2026-09-01", "2026-09-02",
+]
+
+# Thứ 2 -> Thứ 6 là ngày làm việc
+WEEKMASK = "1111100"
+POD_HOLIDAYS_STRICT = os.getenv("POD_HOLIDAYS_STRICT", "0") == "1"
+
+class HolidayCoverageError(ValueError):
+    """Ngày kế hoạch thuộc năm chưa có trong lịch nghỉ lễ (chỉ raise khi POD_HOLIDAYS_STRICT=1)."""
+
+def load_holidays() -> List[str]:
+    """
+    Hàm đọc danh sách ngày nghỉ lễ theo cấu hình.
+    Trả về danh sách ngày dạng YYYY-MM-DD.
+    """
+    holidays_file = os.getenv("POD_HOLIDAYS_FILE")
+    if holidays_file:
+        with open(holidays_file, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+    holidays_env = os.getenv("POD_HOLIDAYS")
+    if holidays_env is not None:
+        return [day.strip() for day in holidays_env.split(",") if day.strip()]
+    return list(DEFAULT_HOLIDAYS)
+
+_business_calendar = None
+_holiday_years = None
+_warned_years = set()
+
+def get_business_calendar() -> np.busdaycalendar:
+    """
+    Trả về lịch làm việc dùng chung (Thứ 2 -> Thứ 6, trừ ngày nghỉ lễ), chỉ khởi tạo một lần.
+    """
+    if _business_calendar is None:
+        init_business_calendar(load_holidays())
+    return _business_calendar
+
+def init_business_calendar(holidays: List[str]):
+    """
+    Hàm dựng lịch làm việc dùng chung từ danh sách ngày nghỉ lễ cho trước. Dùng làm initializer của các pool process
+    (get_business_calendar_holidays của process cha) để mọi process tính giờ theo cùng một lịch.
+    """
+    global _business_calendar, _holiday_years
+    days = np.array(holidays, dtype="datetime64[D]")
+    _holiday_years = set((days.astype("datetime64[Y]").astype(int) + 1970).tolist())
+    _business_calendar = np.busdaycalendar(weekmask=WEEKMASK, holidays=days)
+
+def get_business_calendar_holidays() -> List[str]:
+    """
+    Trả về các ngày nghỉ lễ của lịch làm việc dùng chung (dạng YYYY-MM-DD, ngày lễ trùng cuối tuần đã bị lịch bỏ).
+    """
+    return [str(day) for day in get_business_calendar().holidays]
+
+def holiday_fingerprint() -> str:
+    """
+    Trả về dấu vân tay của lịch làm việc dùng chung, dùng trong khoá cache của các kết quả phụ thuộc số ngày làm việc
+    (QTY của form đã parse, kết quả kiểm tra form, memo merge).
+    """
+    return hashlib.sha1(",".join(get_business_calendar_holidays()).encode("ascii")).hexdigest()[:16]
+
+def get_holiday_years() -> set:
+    """
+    Trả về các năm được lịch nghỉ lễ phủ (năm có ít nhất một ngày nghỉ lễ trong danh sách).
+    """
+    get_business_calendar()
+    return _holiday_years
+
+def check_holiday_coverage(*date_arrays) -> List[int]:
+    """
+    Hàm kiểm tra các ngày kế hoạch có nằm trong các năm được lịch nghỉ lễ phủ hay không (get_holiday_years).
+    Năm chưa được phủ: in cảnh báo (mỗi năm một lần), hoặc raise HolidayCoverageError nếu POD_HOLIDAYS_STRICT=1.
+    Trả về danh sách năm chưa được phủ.
+    """
+    first, last = None, None
+    for dates in date_arrays:
+        days = np.asarray(dates, dtype="datetime64[D]")
+        days = days[~np.isnat(days)]
+        if days.size:
+            first = days.min() if first is None else min(first, days.min())
+            last = days.max() if last is None else max(last, days.max())
+    if first is None:
+        return []
+    covered = get_holiday_years()
+    first_year = int(first.astype("datetime64[Y]").astype(int)) + 1970
+    last_year = int(last.astype("datetime64[Y]").astype(int)) + 1970
+    missing = [year for year in range(first_year, last_year + 1) if year not in covered]
+    if missing:
+        message = (
+            f"Lịch nghỉ lễ chưa có năm {', '.join(map(str, missing))}: ngày nghỉ lễ của các năm này không được trừ "
+            f"khi tính số ngày làm việc. Vui lòng bổ sung vào POD_HOLIDAYS_FILE hoặc POD_HOLIDAYS."
+        )
+        if POD_HOLIDAYS_STRICT:
+            raise HolidayCoverageError(message)
+        if not _warned_years.issuperset(missing):
+            _warned_years.update(missing)
+            print(f"Cảnh báo: {message}")
+    return missing
+
+def count_working_days(start_dates, end_dates, calendar: Optional[np.busdaycalendar] = None) -> np.ndarray:
+    """
+    Hàm tính số ngày làm việc trong khoảng [start, end] (tính cả hai đầu) cho nhiều khoảng cùng lúc.
+    Tham số:
+    - start_dates, end_dates: mảng ngày (datetime64, Timestamp, datetime hoặc chuỗi YYYY-MM-DD) cùng độ dài.
+    - calendar: lịch làm việc, mặc định là get_business_calendar().
+    Trả về:
+    - np.ndarray: số ngày làm việc của từng khoảng (âm nếu start > end).
+    Với lịch mặc định, ngày thuộc năm chưa có trong lịch nghỉ lễ bị cảnh báo / báo lỗi (check_holiday_coverage).
+    """
+    start_arr = np.asarray(start_dates, dtype="datetime64[D]")
+    end_arr = np.asarray(end_dates, dtype="datetime64[D]")
+    if calendar is None:
+        check_holiday_coverage(start_arr, end_arr)
+    calendar = calendar if calendar is not None else get_business_calendar()
+    return np.busday_count(start_arr, end_arr + 1, busdaycal=calendar)
+
+def working_day_mask(days, calendar: Optional[np.busdaycalendar] = None) -> np.ndarray:
+    """
+    Hàm trả về mảng bool cho biết từng ngày trong days có phải ngày làm việc hay không.
+    """
+    calendar = calendar if calendar is not None else get_business_calendar()
+    return np.is_busday(np.asarray(days, dtype="datetime64[D]"), busdaycal=calendar)
@@ -0,0 +1,447 @@
+import os
+import json
+import uuid
+import socket
+import hashlib
+import functools
+import threading
+from typing import Callable, List, Optional
+from psycopg2.extras import Json
+from src.DB_Connection import get_postgres_pool
+
+# Số luồng worker xử lý job merge trong mỗi process API (0 = process này chỉ nhận job, không xử lý)
+POD_JOB_WORKERS = int(os.getenv("POD_JOB_WORKERS", "2"))
+# Chu kỳ (giây) worker kiểm tra hàng đợi khi không có job
+POD_JOB_POLL_INTERVAL = float(os.getenv("POD_JOB_POLL_INTERVAL", "1"))
+# Chu kỳ (giây) worker báo còn sống cho các job đang chạy; job không báo quá POD_JOB_STALE_AFTER giây
+# (process bị kill, máy chết) được đưa lại hàng đợi để chạy lại
+POD_JOB_HEARTBEAT_INTERVAL = float(os.getenv("POD_JOB_HEARTBEAT_INTERVAL", "10"))
+POD_JOB_STALE_AFTER = float(os.getenv("POD_JOB_STALE_AFTER", "60"))
+# Số lần chạy tối đa của một job và thời gian chờ (giây, nhân theo số lần đã chạy) trước khi chạy lại
+POD_JOB_MAX_ATTEMPTS = int(os.getenv("POD_JOB_MAX_ATTEMPTS", "3"))
+POD_JOB_RETRY_DELAY = float(os.getenv("POD_JOB_RETRY_DELAY", "5"))
+# Giới hạn nhận job: số job đang chờ/đang chạy tối đa của một user và của cả hàng đợi (0 = không giới hạn),
+# và thời gian (giây) gợi ý client gửi lại khi bị từ chối
+POD_MERGE_USER_LIMIT = int(os.getenv("POD_MERGE_USER_LIMIT", "2"))
+POD_MERGE_QUEUE_MAX = int(os.getenv("POD_MERGE_QUEUE_MAX", "50"))
+POD_MERGE_RETRY_AFTER = int(os.getenv("POD_MERGE_RETRY_AFTER", "30"))
+
+def job_dedup_key(user_id: str, payload: dict) -> str:
+    """
+    Hàm tính khoá chống trùng của một job: cùng user gửi lại cùng yêu cầu trong lúc job trước
+    còn đang chờ hoặc đang chạy sẽ nhận lại job_id của job đó.
+    Khoá chỉ gồm các trường xác định công việc: danh sách file (giữ nguyên thứ tự vì thứ tự file quyết định thứ tự
+    dòng trong file tổng hợp), file tổng hợp gốc và force.
+    request_id / start_time thay đổi mỗi lần client gửi lại nên không tham gia vào khoá.
+    """
+    summary_file = payload.get("summary_file")
+    work = {
+        "path_files": list(payload.get("path_files") or []),
+        "summary_file": summary_file.split("estec/")[-1] if summary_file else None,
+        "force": bool(payload.get("force", False))
+    }
+    raw = json.dumps([user_id, work], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class JobRejected(Exception):
+    """
+    Job không được nhận vì user đã đạt giới hạn số job đồng thời hoặc hàng đợi đã đầy (trả về HTTP 429).
+    """
+    def __init__(self, message: str, retry_after: int = POD_MERGE_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def enqueue_job(conn, user_id: str, request_id: str, payload: dict, max_attempts: int = POD_JOB_MAX_ATTEMPTS,
+                user_limit: int = POD_MERGE_USER_LIMIT, queue_max: int = POD_MERGE_QUEUE_MAX) -> dict:
+    """
+    Hàm thêm một job vào hàng đợi (bảng "MergeJob"), hoặc trả về job đang chờ/đang chạy có cùng khoá chống trùng.
+    Job mới chỉ được nhận khi user chưa có quá user_limit job đang chờ/đang chạy và hàng đợi chưa có quá queue_max job
+    (0 = không giới hạn), ngược lại raise JobRejected.
+    Trả về dict job_id / job_status / duplicate / queue_position (thứ tự trong hàng đợi, 0 nếu job đang chạy).
+    """
+    dedup_key = job_dedup_key(user_id, payload)
+    cursor = conn.cursor()
+    try:
+        # Khoá theo user đến hết transaction: các request đồng thời của cùng user được kiểm tra giới hạn lần lượt
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (user_id,))
+        query = """
+            SELECT "job_id", "status" FROM "MergeJob"
+            WHERE "dedup_key" = %s AND "status" IN ('queued', 'running')
+            """
+        cursor.execute(query, (dedup_key,))
+        row = cursor.fetchone()
+        duplicate = row is not None
+        if not duplicate:
+            query = """
+                SELECT COUNT(*) FILTER (WHERE "user_id" = %s), COUNT(*) FILTER (WHERE "status" = 'queued')
+                FROM "MergeJob" WHERE "status" IN ('queued', 'running')
+                """
+            cursor.execute(query, (user_id,))
+            user_active, queued = cursor.fetchone()
+            if user_limit and user_active >= user_limit:
+                raise JobRejected(f"Bạn đang có {user_active} yêu cầu merge chưa xong (tối đa {user_limit}). Vui lòng chờ các yêu cầu này hoàn tất.")
+            if queue_max and queued >= queue_max:
+                raise JobRejected(f"Hệ thống đang có {queued} yêu cầu merge chờ xử lý. Vui lòng thử lại sau.")
+            query = """
+                INSERT INTO "MergeJob" ("job_id", "user_id", "request_id", "dedup_key", "payload", "max_attempts", "stages")
+                VALUES (%s, %s, %s, %s, %s, %s, jsonb_build_object('queued', NOW()))
+                RETURNING "job_id", "status"
+                """
+            cursor.execute(query, (str(uuid.uuid4()), user_id, request_id, dedup_key, Json(payload), max_attempts))
+            row = cursor.fetchone()
+        query = """
+            SELECT COUNT(*) FROM "MergeJob"
+            WHERE "status" = 'queued' AND "created_at" <= (SELECT "created_at" FROM "MergeJob" WHERE "job_id" = %s)
+            """
+        cursor.execute(query, (row[0],))
+        position = cursor.fetchone()[0] if row[1] == "queued" else 0
+        conn.commit()
+    finally:
+        cursor.close()
+    return {
+        "job_id": str(row[0]),
+        "job_status": row[1],
+        "duplicate": duplicate,
+        "queue_position": position
+    }
+
+def claim_job(conn, worker_id: str) -> Optional[dict]:
+    """
+    Hàm lấy job cũ nhất đang chờ để xử lý. Dùng FOR UPDATE SKIP LOCKED nên nhiều worker (nhiều luồng, nhiều process)
+    lấy job cùng lúc mà không chờ nhau và không lấy trùng job.
+    Trả về dict job_id / payload / attempts / max_attempts, hoặc None nếu hàng đợi rỗng.
+    """
+    cursor = conn.cursor()
+    try:
+        query = """
+            UPDATE "MergeJob" SET
+                "status" = 'running', "stage" = 'running', "attempts" = "attempts" + 1, "worker_id" = %s,
+                "started_at" = NOW(), "heartbeat_at" = NOW(), "stages" = "stages" || jsonb_build_object('running', NOW())
+            WHERE "job_id" = (
+                SELECT "job_id" FROM "MergeJob"
+                WHERE "status" = 'queued' AND "run_after" <= NOW()
+                ORDER BY "created_at"
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING "job_id", "payload", "attempts", "max_attempts"
+            """
+        cursor.execute(query, (worker_id,))
+        row = cursor.fetchone()
+        conn.commit()
+    finally:
+        cursor.close()
+    if row is None:
+        return None
+    return {"job_id": str(row[0]), "payload": row[1], "attempts": row[2], "max_attempts": row[3]}
+
+def update_job_stage(conn, job_id: str, worker_id: str, stage: str):
+    """
+    Hàm ghi lại bước đang xử lý của job (và thời điểm bắt đầu bước đó trong "stages").
+    Chỉ worker đang giữ job mới cập nhật được.
+    """
+    cursor = conn.cursor()
+    try:
+        query = """
+            UPDATE "MergeJob" SET "stage" = %s, "heartbeat_at" = NOW(), "stages" = "stages" || jsonb_build_object(%s::text, NOW())
+            WHERE "job_id" = %s AND "status" = 'running' AND "worker_id" = %s
+            """
+        cursor.execute(query, (stage, stage, job_id, worker_id))
+        conn.commit()
+    finally:
+        cursor.close()
+
+def finish_job(conn, job_id: str, worker_id: str, result: dict):
+    """
+    Hàm lưu kết quả của job. Kết quả có status "error" (lỗi dữ liệu đầu vào) được lưu là failed và không chạy lại.
+    """
+    status = "failed" if isinstance(result, dict) and result.get("status") == "error" else "succeeded"
+    cursor = conn.cursor()
+    try:
+        query = """
+            UPDATE "MergeJob" SET
+                "status" = %s, "stage" = 'done', "result" = %s, "finished_at" = NOW(),
+                "stages" = "stages" || jsonb_build_object('done', NOW())
+            WHERE "job_id" = %s AND "status" = 'running' AND "worker_id" = %s
+            """
+        cursor.execute(query, (status, Json(result, dumps=lambda value: json.dumps(value, default=str)), job_id, worker_id))
+        conn.commit()
+    finally:
+        cursor.close()
+
+def retry_or_fail_job(conn, job_id: str, worker_id: str, error: str):
+    """
+    Hàm xử lý job bị lỗi ngoài dự kiến (exception): đưa lại hàng đợi sau POD_JOB_RETRY_DELAY * số lần đã chạy,
+    hoặc đánh dấu failed nếu đã chạy đủ max_attempts lần.
+    """
+    cursor = conn.cursor()
+    try:
+        query = """
+            UPDATE "MergeJob" SET
+                "status" = CASE WHEN "attempts" < "max_attempts" THEN 'queued' ELSE 'failed' END,
+                "stage" = CASE WHEN "attempts" < "max_attempts" THEN 'queued' ELSE 'done' END,
+                "run_after" = NOW() + make_interval(secs => %s * "attempts"),
+                "finished_at" = CASE WHEN "attempts" < "max_attempts" THEN NULL ELSE NOW() END,
+                "worker_id" = NULL, "error" = %s
+            WHERE "job_id" = %s AND "status" = 'running' AND "worker_id" = %s
+            """
+        cursor.execute(query, (POD_JOB_RETRY_DELAY, error, job_id, worker_id))
+        conn.commit()
+    finally:
+        cursor.close()
+
+def heartbeat_jobs(conn, worker_ids: List[str]):
+    """
+    Hàm báo các job đang chạy trên các worker này vẫn còn được xử lý.
+    """
+    cursor = conn.cursor()
+    try:
+        query = """
+            UPDATE "MergeJob" SET "heartbeat_at" = NOW()
+            WHERE "status" = 'running' AND "worker_id" = ANY(%s)
+            """
+        cursor.execute(query, (worker_ids,))
+        conn.commit()
+    finally:
+        cursor.close()
+
+def requeue_stale_jobs(conn, stale_after: float = POD_JOB_STALE_AFTER) -> int:
+    """
+    Hàm đưa lại hàng đợi các job đang chạy nhưng worker không còn báo heartbeat (process bị kill giữa chừng),
+    hoặc đánh dấu failed nếu job đã chạy đủ max_attempts lần.
+    Trả về số job được xử lý.
+    """
+    cursor = conn.cursor()
+    try:
+        query = """
+            UPDATE "MergeJob" SET
+                "status" = CASE WHEN "attempts" < "max_attempts" THEN 'queued' ELSE 'failed' END,
+                "stage" = CASE WHEN "attempts" < "max_attempts" THEN 'queued' ELSE 'done' END,
+                "finished_at" = CASE WHEN "attempts" < "max_attempts" THEN NULL ELSE NOW() END,
+                "worker_id" = NULL,
+                "error" = 'Worker ' || "worker_id" || ' ngừng hoạt động khi đang xử lý job.'
+            WHERE "status" = 'running' AND "heartbeat_at" < NOW() - make_interval(secs => %s)
+            """
+        cursor.execute(query, (stale_after,))
+        count = cursor.rowcount
+        conn.commit()
+    finally:
+        cursor.close()
+    return count
+
+def get_job(conn, job_id: str, user_id: str) -> Optional[dict]:
+    """
+    Hàm lấy trạng thái, bước đang xử lý và kết quả (nếu đã xong) của một job thuộc về user_id.
+    Trả về None nếu không có job.
+    """
+    try:
+        job_id = str(uuid.UUID(job_id))
+    except (TypeError, ValueError):
+        return None
+    cursor = conn.cursor()
+    try:
+        query = """
+            SELECT "job_id", "request_id", "status", "stage", "stages", "attempts", "max_attempts", "result", "error",
+                   "created_at", "started_at", "finished_at"
+            FROM "MergeJob" WHERE "job_id" = %s AND "user_id" = %s
+            """
+        cursor.execute(query, (job_id, user_id))
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if row is None:
+        return None
+    columns = ["job_id", "request_id", "job_status", "stage", "stages", "attempts", "max_attempts", "result", "error",
+               "created_at", "started_at", "finished_at"]
+    job = dict(zip(columns, row))
+    job["job_id"] = str(job["job_id"])
+    return job
+
+def job_queue_stats(conn) -> dict:
+    """
+    Hàm thống kê hàng đợi job: số job theo trạng thái, thời gian chờ (giây) của job đang chờ lâu nhất
+    và thời gian chờ trung bình / lớn nhất của các job bắt đầu chạy trong 1 giờ qua.
+    """
+    cursor = conn.cursor()
+    try:
+        query = """
+            SELECT "status", COUNT(*), EXTRACT(EPOCH FROM NOW() - MIN("created_at"))
+            FROM "MergeJob" WHERE "status" IN ('queued', 'running') GROUP BY "status"
+            """
+        cursor.execute(query)
+        rows = {status: (count, age) for status, count, age in cursor.fetchall()}
+        query = """
+            SELECT AVG(EXTRACT(EPOCH FROM "started_at" - "created_at")), MAX(EXTRACT(EPOCH FROM "started_at" - "created_at"))
+            FROM "MergeJob" WHERE "started_at" > NOW() - INTERVAL '1 hour'
+            """
+        cursor.execute(query)
+        wait_avg, wait_max = cursor.fetchone()
+    finally:
+        cursor.close()
+    queued_count, queued_age = rows.get("queued", (0, None))
+    return {
+        "queued": queued_count,
+        "running": rows.get("running", (0, None))[0],
+        "oldest_queued_seconds": round(float(queued_age), 3) if queued_age is not None else None,
+        "wait_avg_seconds": round(float(wait_avg), 3) if wait_avg is not None else None,
+        "wait_max_seconds": round(float(wait_max), 3) if wait_max is not None else None,
+        "user_limit": POD_MERGE_USER_LIMIT,
+        "queue_max": POD_MERGE_QUEUE_MAX
+    }
+
+def report_job_stage(job_id: str, worker_id: str, stage: str):
+    """
+    Hàm ghi lại bước đang xử lý của job; lỗi khi ghi chỉ được log, không làm dừng job.
+    """
+    try:
+        with get_postgres_pool().connection() as conn:
+            update_job_stage(conn, job_id, worker_id, stage)
+    except Exception as e:
+        print(f"Error updating job {job_id} stage: {str(e)}")
+
+def run_job(handler: Callable[[dict, Callable[[str], None]], dict], job_id: str, worker_id: str, payload: dict) -> dict:
+    """
+    Hàm chạy handler của một job, tiến độ được ghi thẳng vào "MergeJob".
+    """
+    return handler(payload, functools.partial(report_job_stage, job_id, worker_id))
+
+class JobWorkers:
+    """
+    Nhóm luồng worker xử lý job trong hàng đợi "MergeJob" của process hiện tại.
+    Trạng thái job: queued -> running -> succeeded / failed (running -> queued khi chạy lại).
+    Mỗi luồng lấy job bằng claim_job, gọi handler(payload, progress) và lưu kết quả; progress(stage) ghi lại bước đang xử lý.
+    Một luồng riêng gửi heartbeat cho các job đang chạy và đưa lại hàng đợi các job mất worker.
+
+    Args:
+        handler (Callable): Hàm xử lý job, nhận (payload, progress) và trả về dict kết quả.
+        workers (int): Số luồng worker.
+        poll_interval (float): Chu kỳ (giây) kiểm tra hàng đợi khi không có job.
+        heartbeat_interval (float): Chu kỳ (giây) gửi heartbeat và kiểm tra job mất worker.
+    """
+    def __init__(self, handler: Callable[[dict, Callable[[str], None]], dict], workers: int = POD_JOB_WORKERS,
+                 poll_interval: float = POD_JOB_POLL_INTERVAL, heartbeat_interval: float = POD_JOB_HEARTBEAT_INTERVAL):
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = {}
+        self._completed = 0
+        self._failed = 0
+        self._retried = 0
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, args=(f"{self._prefix}:{index}",), name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.workers:
+            thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self):
+        """Báo cho các worker kiểm tra hàng đợi ngay (gọi sau khi thêm job trong process này)."""
+        self._wake.set()
+
+    def _work(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                with get_postgres_pool().connection() as conn:
+                    job = claim_job(conn, worker_id)
+            except Exception as e:
+                print(f"Error claiming job: {str(e)}")
+                job = None
+            if job is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            try:
+                self._execute(worker_id, job)
+            except Exception as e:
+                # Không lưu được kết quả: job hết heartbeat và được chạy lại
+                print(f"Error finishing job {job['job_id']}: {str(e)}")
+
+    def _execute(self, worker_id: str, job: dict):
+        job_id = job["job_id"]
+        with self._lock:
+            self._running[job_id] = worker_id
+
+        try:
+            result = run_job(self.handler, job_id, worker_id, job["payload"])
+        except Exception as e:
+            with self._lock:
+                if job["attempts"] < job["max_attempts"]:
+                    self._retried += 1
+                else:
+                    self._failed += 1
+            with get_postgres_pool().connection() as conn:
+                retry_or_fail_job(conn, job_id, worker_id, str(e))
+        else:
+            with self._lock:
+                if isinstance(result, dict) and result.get("status") == "error":
+                    self._failed += 1
+                else:
+                    self._completed += 1
+            with get_postgres_pool().connection() as conn:
+                finish_job(conn, job_id, worker_id, result)
+        finally:
+            with self._lock:
+                self._running.pop(job_id, None)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                with self._lock:
+                    worker_ids = list(self._running.values())
+                with get_postgres_pool().connection() as conn:
+                    if worker_ids:
+                        heartbeat_jobs(conn, worker_ids)
+                    requeued = requeue_stale_jobs(conn)
+                if requeued:
+                    print(f"Requeued {requeued} stale job(s)")
+            except Exception as e:
+                print(f"Error sending job heartbeat: {str(e)}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": len(self._running),
+                "completed": self._completed,
+                "failed": self._failed,
+                "retried": self._retried
+            }
+
+_job_workers = None
+
+def start_job_workers(handler: Callable[[dict, Callable[[str], None]], dict]) -> JobWorkers:
+    """
+    Khởi động các worker xử lý job của process hiện tại (gọi khi khởi động ứng dụng).
+    """
+    global _job_workers
+    if _job_workers is None:
+        _job_workers = JobWorkers(handler)
+        _job_workers.start()
+    return _job_workers
+
+def get_job_workers() -> Optional[JobWorkers]:
+    return _job_workers
+
+def stop_job_workers():
+    """Dừng các worker (gọi khi tắt ứng dụng); job đang chạy dở sẽ được worker khác chạy lại khi hết heartbeat."""
+    global _job_workers
+    if _job_workers is not None:
+        _job_workers.stop()
+        _job_workers = None
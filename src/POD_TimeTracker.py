@@ -2,17 +2,83 @@ import pandas as pd
 from io import BytesIO
 from minio import Minio
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Callable, List, Optional
 import numpy as np
 import openpyxl
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.compute as pc
+import os
+import json
+import time
+import uuid
+import hashlib
+import zipfile
+import multiprocessing
+from itertools import islice
+from xml.etree import ElementTree
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 from datetime import datetime, timedelta
-from openpyxl.styles import PatternFill, Border, Side
-from fastapi.responses import JSONResponse
+from openpyxl.styles import PatternFill, Border, Side, NamedStyle
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from openpyxl.styles import Alignment
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.merge import MergedCellRange
+from src.POD_Calendar import count_working_days, working_day_mask, HolidayCoverageError, holiday_fingerprint, init_business_calendar, get_business_calendar_holidays
+from src.POD_Cache import ParsedFormCache, MergeResultIndex, get_parsed_form_cache, get_merge_result_index, get_workbook_cache
+from src.POD_Cache import get_payload_cache, get_presign_cache, get_validation_cache, POD_PRESIGN_EXPIRES, POD_FORM_PARSER_VERSION
+from src.Executors import run_merge_task
+from src.DB_Connection import get_postgres_pool
+from src.POD_Timesheet_DB import POD_TIMESHEET_DB, pending_timesheet_sources, load_timesheet_entries
+from minio.error import S3Error
+import urllib3
+import psycopg2
+import psycopg2.pool
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 
-def POD_TimeTracker_Merge_Manual_function(minio_client: Minio, input: BaseModel):
+# Số luồng tải file / số process parse file khi merge
+POD_MERGE_WORKERS = int(os.getenv("POD_MERGE_WORKERS", "4"))
+# Xuất file tổng hợp: ghi thêm bản local (debug) và kích thước part khi upload multipart
+POD_EXPORT_LOCAL = os.getenv("POD_EXPORT_LOCAL", "0").lower() in ("1", "true", "yes")
+POD_EXPORT_PART_SIZE = int(os.getenv("POD_EXPORT_PART_SIZE", str(16 * 1024 * 1024)))
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# Phiên bản cách dựng / xuất bảng tổng hợp. Tăng số này khi thay đổi kết quả merge để bỏ qua các kết quả đã memo.
+POD_PIPELINE_VERSION = "3"
+# Phiên bản định dạng sidecar Parquet của file tổng hợp
+SIDECAR_VERSION = "1"
+# Số dòng đầu mỗi sheet được quét để tìm khối header của form TimeTracker (dòng có "STT" ở cột A)
+FORM_HEADER_SCAN_ROWS = int(os.getenv("FORM_HEADER_SCAN_ROWS", "30"))
+# Số cột được quét ở các dòng đầu sheet (A -> M: khối header và ô mã dự án M2)
+FORM_HEADER_SCAN_COLUMNS = 13
+# Chữ ký header của form: {chỉ số cột: các cụm từ (chữ hoa), ô phải chứa một trong các cụm} ở dòng header và dòng ngay dưới
+FORM_HEADER_SIGNATURE = {0: ("STT",), 1: ("MÔ TẢ", "DESCRIPTION"), 3: ("NHÂN SỰ", "ASSIGNEE"), 5: ("KẾ HOẠCH", "PLAN")}
+FORM_SUB_HEADER_SIGNATURE = {5: ("TỪ",), 6: ("ĐẾN",)}
+# Số cột dữ liệu validate_form cần đọc (A -> I: STT, mô tả, nhân sự, ngày kế hoạch Từ / Đến, số giờ)
+FORM_VALIDATE_COLUMNS = 9
+# Ô mã dự án mặc định của form mẫu (M2), dùng khi sheet không có nhãn "Mã dự án"
+FORM_PROJECT_CELL = (2, 13)
+MISSING_PROJECT_MESSAGE = "Không có mã dự án (ô bên phải nhãn \"Mã dự án\", hoặc ô M2). Vui lòng kiểm tra lại."
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    Hàm phân biệt lỗi hạ tầng có thể hết khi chạy lại (mất kết nối MinIO / PostgreSQL, lỗi I/O, process bị kill)
+    với lỗi do dữ liệu (form không hợp lệ, file không tồn tại). Lỗi hạ tầng được raise để hàng đợi job chạy lại,
+    lỗi dữ liệu được trả về dạng dict lỗi.
+    Lỗi được bọc lại (raise ... from e) được xét theo lỗi gốc.
+    """
+    while error is not None:
+        if isinstance(error, S3Error):
+            return error.code not in ("NoSuchKey", "NoSuchBucket")
+        if isinstance(error, (BrokenProcessPool, OSError, urllib3.exceptions.HTTPError,
+                              psycopg2.OperationalError, psycopg2.InterfaceError, psycopg2.pool.PoolError)):
+            return True
+        error = error.__cause__
+    return False
+
+def POD_TimeTracker_Merge_Manual_function(minio_client: Minio, input: BaseModel, progress: Optional[Callable[[str], None]] = None):
+    progress = progress or (lambda stage: None)
     try:
         input_dict = input.dict()
         request_id = input_dict.get("request_id", "evisor-1234567890")
@@ -21,39 +87,50 @@ def POD_TimeTracker_Merge_Manual_function(minio_client: Minio, input: BaseModel)
         summary_file = input_dict.get("summary_file", None).split("estec/")[-1]
         print(f"Summary file: {summary_file}")
         path_files = input_dict.get("path_files", [])
+        force = input_dict.get("force", False)
 
-        obj = minio_client.get_object("estec", summary_file)
-        data = obj.read()
-        file_stream = BytesIO(data)
-
-        df_final = pd.read_excel(file_stream, engine='openpyxl')
-        cols_to_fill = [
-                "STT",
-                "Tên nhân sự",
-                "Mã dự án",
-                "Mô tả công việc",
-                "Thời gian bắt đầu",
-                "Thời gian kết thúc"
-            ]
-        df_final[cols_to_fill] = df_final[cols_to_fill].fillna(method="ffill")
-        results = []
-        for file_path in path_files:
-            obj = minio_client.get_object("estec", file_path)
+        progress("stat")
+        input_etags = stat_objects(minio_client, "estec", path_files)
+        summary_etag = minio_client.stat_object("estec", summary_file).etag
+        merge_index = get_merge_result_index()
+        merge_key = merge_result_key(path_files, input_etags, (summary_file, summary_etag))
+        memo = None if force else lookup_merge_result(minio_client, merge_index, merge_key)
+        if memo is not None:
+            return {
+                "status": "success",
+                "request_id": request_id,
+                "user_id": user_id,
+                "start_time": start_time,
+                "output": memo["output"],
+                "overwork": memo["overwork"],
+                "cache": {"hits": 0, "misses": 0},
+                "memo": True
+            }
+
+        progress("parse")
+        base_cells = load_summary_sidecar(minio_client, "estec", summary_file, summary_etag)
+        if base_cells is None:
+            # File tổng hợp cũ (chưa có sidecar) hoặc đã bị sửa tay: đọc lại từ xlsx
+            obj = minio_client.get_object("estec", summary_file)
             data = obj.read()
             file_stream = BytesIO(data)
-            json = processing_json(file_stream)
-            if isinstance(json, dict) and json.get("status") == "error":
-                return json
-            results.append(json)
-            df = generate_dataframe(json)
-            print("df_final:", df_final.head())
-            print(f"DataFrame: {df}")
-            df_final = pd.concat([df_final, df], ignore_index=True)
-
-        df_final = df_final.sort_values(by=["STT", "Tên nhân sự", "Mã dự án", "Thời gian bắt đầu"]).reset_index(drop=True)
-        print("df_final:", df_final.head())
-        output_path_local, overwork = save_file_local(df_final)
-        output_path_minio = save_file_minio(minio_client, output_path_local)
+
+            df_final = pd.read_excel(file_stream, engine='openpyxl')
+            df_final[INFO_COLUMNS] = df_final[INFO_COLUMNS].ffill()
+            base_cells = summary_to_cells(df_final)
+        results, cache_info = fetch_and_parse_files(minio_client, path_files, etags=input_etags)
+        if isinstance(results, dict):
+            return results
+        progress("build")
+        timesheet, workbook, overwork = run_merge_task(render_summary, results, base_cells)
+        print(f"Timesheet: {len(timesheet.info)} dòng, {len(timesheet.cells)} ô ngày")
+        progress("export")
+        output_path_minio = export_summary(minio_client, timesheet, workbook)
+        progress("load")
+        timesheet_db = load_timesheet_db(path_files, input_etags, results, output_path_minio)
+        if timesheet_db["status"] != "error":
+            # Chưa nạp được vào PostgreSQL thì không memo, để lần merge sau nạp lại
+            save_merge_result(merge_index, merge_key, output_path_minio, overwork if overwork else None)
         # print(f"Output path: {output_path_minio}")
 
         return {
@@ -62,71 +139,292 @@ def POD_TimeTracker_Merge_Manual_function(minio_client: Minio, input: BaseModel)
             "user_id": user_id,
             "start_time": start_time,
             "output": output_path_minio,
-            "overwork": overwork if overwork else None      
+            "overwork": overwork if overwork else None,
+            "cache": cache_info,
+            "memo": False,
+            "timesheet_db": timesheet_db
         }
 
     except Exception as e:
+        if is_transient_error(e):
+            # Lỗi hạ tầng (MinIO, PostgreSQL, I/O, process merge bị kill): raise để job được chạy lại thay vì trả lỗi
+            raise
         return {
             "status": "error",
             "message": str(e)
         }
 
-def POD_TimeTracker_Download_function(minio_client: Minio, input: BaseModel, MINIO_BUCKET: str):
+def POD_TimeTracker_Download_function(minio_client: Minio, input: BaseModel, MINIO_BUCKET: str, if_none_match: Optional[str] = None):
+    """
+    Hàm tạo URL presigned để tải file. URL của cùng một phiên bản file (ETag) được dùng lại cho tới khi gần hết hạn.
+    Response có header ETag (theo ETag của file và URL); client gửi lại If-None-Match khớp sẽ nhận 304.
+    """
     try:
         path_file = input.path_file
         path_file = path_file.split(f"{MINIO_BUCKET}/")[-1] if f"{MINIO_BUCKET}/" in path_file else path_file
-        url = minio_client.presigned_get_object(MINIO_BUCKET, path_file, expires=timedelta(seconds=3600))
+        object_etag = minio_client.stat_object(MINIO_BUCKET, path_file).etag
+        presign_cache = get_presign_cache()
+        cache_key = (MINIO_BUCKET, path_file, object_etag)
+        presigned = presign_cache.get(cache_key)
+        if presigned is None:
+            url = minio_client.presigned_get_object(MINIO_BUCKET, path_file, expires=timedelta(seconds=POD_PRESIGN_EXPIRES))
+            presigned = (url, (datetime.now() + timedelta(seconds=POD_PRESIGN_EXPIRES)).isoformat(timespec="seconds"))
+            presign_cache.put(cache_key, presigned)
+        url, expires_at = presigned
+        etag = response_etag(object_etag, url)
+        if etag_matches(if_none_match, etag):
+            return not_modified_response(etag)
+        return JSONResponse(
+            content={
+                "status": "success",
+                "url": url,
+                "expires_at": expires_at
+            },
+            headers={"ETag": etag}
+        )
+    except Exception as e:
         return {
-            "status": "success",
-            "url": url
+            "status": "error",
+            "message": str(e)
         }
+
+def POD_TimeTracker_Download_Zip_function(minio_client: Minio, input: BaseModel, MINIO_BUCKET: str):
+    """
+    Hàm tải nhiều file cùng lúc dưới dạng một file zip.
+    File zip được tạo dần trong lúc gửi cho client (iter_zip_objects), không lưu toàn bộ file zip trong bộ nhớ hay ra đĩa.
+    Các file được kiểm tra tồn tại trước (stat_objects) để báo lỗi trước khi bắt đầu gửi.
+    """
+    try:
+        path_files = [
+            path_file.split(f"{MINIO_BUCKET}/")[-1] if f"{MINIO_BUCKET}/" in path_file else path_file
+            for path_file in input.path_files
+        ]
+        if not path_files:
+            return {
+                "status": "error",
+                "message": "Chưa chọn file nào để tải."
+            }
+        stat_objects(minio_client, MINIO_BUCKET, path_files)
+        filename = f"ES_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        return StreamingResponse(
+            iter_zip_objects(minio_client, MINIO_BUCKET, path_files),
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
     except Exception as e:
         return {
             "status": "error",
             "message": str(e)
         }
 
-def POD_TimeTracker_Getfile_function(minio_client: Minio, input: BaseModel, MINIO_BUCKET: str):
+class _ZipChunkWriter:
+    """
+    Đích ghi (chỉ ghi tiếp, không seek) cho zipfile: giữ các đoạn bytes đã ghi cho tới khi được lấy ra bằng drain().
+    """
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        if self._chunks:
+            data = b"".join(self._chunks)
+            self._chunks = []
+            yield data
+
+def zip_entry_names(object_names: List[str]) -> List[str]:
+    """
+    Hàm đặt tên file trong zip theo tên file của object, thêm hậu tố (1), (2)... nếu trùng tên.
+    """
+    names = []
+    used = set()
+    for object_name in object_names:
+        name = os.path.basename(object_name)
+        stem, ext = os.path.splitext(name)
+        count = 1
+        while name in used:
+            name = f"{stem} ({count}){ext}"
+            count += 1
+        used.add(name)
+        names.append(name)
+    return names
+
+def iter_zip_objects(minio_client: Minio, bucket_name: str, object_names: List[str], chunk_size: int = 1024 * 1024):
+    """
+    Generator tạo file zip từ các object trên MinIO: đọc từng object theo đoạn chunk_size và trả về ngay phần zip vừa ghi.
+    File xlsx đã được nén sẵn nên được lưu nguyên (ZIP_STORED). Bộ nhớ dùng chỉ khoảng một đoạn chunk_size.
+    """
+    writer = _ZipChunkWriter()
+    with zipfile.ZipFile(writer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for object_name, entry_name in zip(object_names, zip_entry_names(object_names)):
+            response = minio_client.get_object(bucket_name, object_name)
+            try:
+                with archive.open(entry_name, mode="w", force_zip64=True) as entry:
+                    for chunk in response.stream(chunk_size):
+                        entry.write(chunk)
+                        yield from writer.drain()
+            finally:
+                response.close()
+                response.release_conn()
+            yield from writer.drain()
+    yield from writer.drain()
+
+def POD_TimeTracker_Getfile_function(minio_client: Minio, input: BaseModel, MINIO_BUCKET: str, if_none_match: Optional[str] = None):
     """
     Hàm để lấy file từ MinIO và chuyển đổi nội dung sang định dạng JSON.
+    File xlsx chỉ được đọc một lần cho mỗi ETag (load_workbook_frame), các lần gọi sau (kể cả khi phân trang)
+    đọc từ bản cache dạng cột.
     Tham số:
     - minio_client: Đối tượng Minio để tương tác với MinIO.
-    - input: Đối tượng chứa thông tin đầu vào, bao gồm request_id, user_id và path_file.
+    - input: Đối tượng chứa thông tin đầu vào, bao gồm request_id, user_id, path_file và các tham số lọc:
+      offset/limit (phân trang), columns (chỉ lấy các cột này), date_from/date_to (chỉ lấy các cột ngày trong khoảng),
+      employees (chỉ lấy công việc của các nhân sự này), stream (trả về NDJSON dạng stream, mỗi dòng một bản ghi).
+    - if_none_match: Giá trị header If-None-Match của client.
+    Response có header ETag tính từ ETag của file và các tham số; nếu khớp If-None-Match thì trả 304 mà không đọc file.
+    Nội dung JSON đã serialize được cache (get_payload_cache) theo ETag đó.
     Trả về:
-    - dict: Kết quả xử lý, bao gồm status và dữ liệu JSON.
+    - dict: Kết quả xử lý, bao gồm status, dữ liệu JSON của trang hiện tại và tổng số dòng (total) sau khi lọc.
+    - StreamingResponse NDJSON nếu stream=True (tổng số dòng nằm trong header X-Total-Count).
     Nếu có lỗi xảy ra, trả về dict chứa status là "error" và message mô tả lỗi.
     """
     try:
         path_file = input.path_file
         path_file = path_file.split(f"{MINIO_BUCKET}/")[-1] if f"{MINIO_BUCKET}/" in path_file else path_file
         # print(f"Retrieving file from MinIO: {path_file}")
-        response = minio_client.get_object(MINIO_BUCKET, path_file)
-        try:
-            content = BytesIO(response.read())
-            df = pd.read_excel(content)
-            df.replace({np.nan: None, np.inf: None, -np.inf: None}, inplace=True)
-            json_data = df.to_dict(orient="records")
-            # print(f"Retrieved data from MinIO: {json_data}")
-            return JSONResponse(content={"status": "success", "data": json_data})
-        finally:
-            response.close()
-            response.release_conn()
+        object_etag = minio_client.stat_object(MINIO_BUCKET, path_file).etag
+        params = json.dumps({
+            "offset": input.offset, "limit": input.limit, "columns": input.columns, "date_from": input.date_from,
+            "date_to": input.date_to, "employees": input.employees, "stream": input.stream
+        }, ensure_ascii=False, sort_keys=True)
+        etag = response_etag(MINIO_BUCKET, path_file, object_etag, params)
+        if etag_matches(if_none_match, etag):
+            return not_modified_response(etag)
+        payload_cache = get_payload_cache()
+        if not input.stream:
+            content = payload_cache.get(etag)
+            if content is not None:
+                return Response(content=content, media_type="application/json", headers={"ETag": etag})
+
+        frame, _ = load_workbook_frame(minio_client, MINIO_BUCKET, path_file, etag=object_etag)
+        frame = select_workbook_frame(frame, input.columns, input.date_from, input.date_to, input.employees)
+        total = len(frame)
+        end = input.offset + input.limit if input.limit is not None else None
+        frame = frame.iloc[input.offset:end]
+        if input.stream:
+            return StreamingResponse(
+                iter_ndjson(frame),
+                media_type="application/x-ndjson",
+                headers={"X-Total-Count": str(total), "ETag": etag}
+            )
+        # Phần data được pandas ghi thẳng ra JSON, không tạo dict cho từng dòng
+        meta = json.dumps({"total": total, "offset": input.offset, "limit": input.limit})
+        content = f'{{"status": "success", "data": {frame_to_json(frame)}, {meta[1:]}'.encode("utf-8")
+        payload_cache.put(etag, content, size=len(content))
+        return Response(content=content, media_type="application/json", headers={"ETag": etag})
     except Exception as e:
         return {
             "status": "error",
             "message": str(e)
         }
 
-def POD_TimeTracker_Merge_function(minio_client: Minio, input: BaseModel):
+def response_etag(*parts: str) -> str:
+    """
+    Hàm tạo giá trị header ETag (dạng chuỗi trong ngoặc kép) từ các thành phần quyết định nội dung response.
+    """
+    return '"' + hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Hàm kiểm tra header If-None-Match của client có khớp ETag hiện tại hay không (hỗ trợ danh sách, "*" và ETag yếu W/).
+    """
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in [tag[2:] if tag.startswith("W/") else tag for tag in candidates]
+
+def not_modified_response(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+def load_workbook_frame(minio_client: Minio, bucket_name: str, object_name: str, etag: Optional[str] = None):
+    """
+    Hàm đọc sheet đầu tiên của file xlsx thành DataFrame (pd.read_excel), dùng bản cache theo ETag nếu có.
+    Tên cột được chuyển thành chuỗi (giống khoá khi trả về JSON) để lưu được dưới dạng Parquet.
+    Tham số etag: ETag hiện tại của file nếu đã stat trước đó.
+    Trả về (DataFrame, ETag).
+    """
+    workbook_cache = get_workbook_cache()
+    if etag is None:
+        etag = minio_client.stat_object(bucket_name, object_name).etag
+    frame = workbook_cache.get_frame(bucket_name, object_name, etag)
+    if frame is None:
+        data, etag = download_object(minio_client, bucket_name, object_name)
+        frame = pd.read_excel(BytesIO(data))
+        frame.columns = [str(col) for col in frame.columns]
+        workbook_cache.put_frame(bucket_name, object_name, etag, frame)
+    return frame, etag
+
+def select_workbook_frame(frame: pd.DataFrame, columns: Optional[List[str]] = None, date_from: Optional[str] = None,
+                          date_to: Optional[str] = None, employees: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Hàm lọc cột / dòng của bảng đọc từ file tổng hợp.
+    - columns: chỉ giữ các cột này (theo thứ tự trong file).
+    - date_from / date_to (YYYY-MM-DD): chỉ giữ các cột ngày trong khoảng, các cột không phải ngày được giữ nguyên.
+    - employees: chỉ giữ các dòng của các nhân sự này. Tên nhân sự chỉ nằm ở dòng đầu của vùng ô được merge
+      nên việc lọc dùng giá trị đã forward-fill, dữ liệu trả về vẫn giữ nguyên như trong file.
+    """
+    selected = list(frame.columns)
+    if columns:
+        missing = [col for col in columns if col not in frame.columns]
+        if missing:
+            raise ValueError(f"Không tìm thấy cột: {', '.join(missing)}")
+        wanted = set(columns)
+        selected = [col for col in selected if col in wanted]
+    if date_from or date_to:
+        dates = pd.to_datetime(pd.Index(selected), format="%Y-%m-%d", errors="coerce")
+        in_range = ~dates.isna()
+        if date_from:
+            in_range &= dates >= pd.Timestamp(date_from)
+        if date_to:
+            in_range &= dates <= pd.Timestamp(date_to)
+        selected = [col for col, kept in zip(selected, dates.isna() | in_range) if kept]
+    if employees:
+        if "Tên nhân sự" not in frame.columns:
+            raise ValueError("File không có cột Tên nhân sự để lọc theo nhân sự.")
+        frame = frame[frame["Tên nhân sự"].ffill().isin(employees)]
+    return frame[selected]
+
+def frame_to_json(frame: pd.DataFrame, lines: bool = False) -> str:
+    """
+    Hàm chuyển bảng sang mảng JSON các bản ghi (hoặc NDJSON nếu lines=True), NaN / inf được ghi thành null.
+    """
+    return frame.to_json(orient="records", lines=lines, force_ascii=False, double_precision=15, date_format="iso")
+
+def iter_ndjson(frame: pd.DataFrame, batch_size: int = 1000):
+    """
+    Hàm sinh nội dung NDJSON (mỗi dòng một bản ghi) theo từng lô batch_size dòng,
+    chỉ lô đang gửi được chuyển sang JSON trong bộ nhớ.
+    """
+    for start in range(0, len(frame), batch_size):
+        chunk = frame_to_json(frame.iloc[start:start + batch_size], lines=True)
+        yield chunk if chunk.endswith("\n") else chunk + "\n"
+
+def POD_TimeTracker_Merge_function(minio_client: Minio, input: BaseModel, progress: Optional[Callable[[str], None]] = None):
     """
     Hàm xử lý dữ liệu từ MinIO và trả về kết quả.
     Tham số:
     - minio_client: Đối tượng Minio để tương tác với MinIO.
     - input: Đối tượng chứa thông tin đầu vào, bao gồm request_id, user_id, start_time và path_files.
+    - progress: Hàm nhận tên bước đang xử lý (stat, parse, build, export, load), dùng để báo tiến độ khi chạy dạng job.
     Trả về:
     - dict: Kết quả xử lý, bao gồm status, request_id, user_id, start_time, output và overwork (nếu có).
     Nếu có lỗi xảy ra, trả về dict chứa status là "error" và message mô tả lỗi.
     """
+    progress = progress or (lambda stage: None)
     try:
         input_dict = input.dict()
         request_id = input_dict.get("request_id", "evisor-1234567890")
@@ -136,24 +434,38 @@ def POD_TimeTracker_Merge_function(minio_client: Minio, input: BaseModel):
 
         if not path_files:
             return {"status": "error", "message": "No files provided in path_files."}
-        
-        df_final = pd.DataFrame()
-        results = []
-        for file_path in path_files:
-            obj = minio_client.get_object("estec", file_path)
-            data = obj.read()
-            file_stream = BytesIO(data)
-            json = processing_json(file_stream)
-            if isinstance(json, dict) and json.get("status") == "error":
-                return json
-            results.append(json)
-            df = generate_dataframe(json)
-            df_final = pd.concat([df_final, df], ignore_index=True) 
-        
-        df_final = df_final.sort_values(by=["STT", "Tên nhân sự", "Mã dự án", "Thời gian bắt đầu"]).reset_index(drop=True)
-        print("df_final:", df_final.head())
-        output_path_local, overwork = save_file_local(df_final)
-        output_path_minio = save_file_minio(minio_client, output_path_local)
+
+        progress("stat")
+        input_etags = stat_objects(minio_client, "estec", path_files)
+        merge_index = get_merge_result_index()
+        merge_key = merge_result_key(path_files, input_etags)
+        memo = None if input_dict.get("force", False) else lookup_merge_result(minio_client, merge_index, merge_key)
+        if memo is not None:
+            return {
+                "status": "success",
+                "request_id": request_id,
+                "user_id": user_id,
+                "start_time": start_time,
+                "output": memo["output"],
+                "overwork": memo["overwork"],
+                "cache": {"hits": 0, "misses": 0},
+                "memo": True
+            }
+
+        progress("parse")
+        results, cache_info = fetch_and_parse_files(minio_client, path_files, etags=input_etags)
+        if isinstance(results, dict):
+            return results
+        progress("build")
+        timesheet, workbook, overwork = run_merge_task(render_summary, results, None)
+        print(f"Timesheet: {len(timesheet.info)} dòng, {len(timesheet.cells)} ô ngày")
+        progress("export")
+        output_path_minio = export_summary(minio_client, timesheet, workbook)
+        progress("load")
+        timesheet_db = load_timesheet_db(path_files, input_etags, results, output_path_minio)
+        if timesheet_db["status"] != "error":
+            # Chưa nạp được vào PostgreSQL thì không memo, để lần merge sau nạp lại
+            save_merge_result(merge_index, merge_key, output_path_minio, overwork if overwork else None)
         # print(f"Output path: {output_path_minio}")
 
         return {
@@ -162,29 +474,27 @@ def POD_TimeTracker_Merge_function(minio_client: Minio, input: BaseModel):
             "user_id": user_id,
             "start_time": start_time,
             "output": output_path_minio,
-            "overwork": overwork if overwork else None      
+            "overwork": overwork if overwork else None,
+            "cache": cache_info,
+            "memo": False,
+            "timesheet_db": timesheet_db
         }
 
     except Exception as e:
+        if is_transient_error(e):
+            # Lỗi hạ tầng (MinIO, PostgreSQL, I/O, process merge bị kill): raise để job được chạy lại thay vì trả lỗi
+            raise
         return {
             "status": "error",
             "message": str(e)
         }
 
-def get_weekend_columns(df: pd.DataFrame) -> List[int]:
+def new_output_filename() -> str:
     """
-    Hàm để xác định các cột là ngày cuối tuần trong DataFrame.
-    Trả về danh sách các chỉ số cột tương ứng với ngày cuối tuần.
+    Hàm tạo tên file tổng hợp không trùng lặp (kể cả khi nhiều lần merge trong cùng một giây).
     """
-    weekend_cols = []
-    for col in df.columns:
-        try:
-            date = pd.to_datetime(col, errors='coerce')
-            if date is not pd.NaT and date.weekday() in [5, 6]:
-                weekend_cols.append(col)
-        except:
-            continue
-    return weekend_cols
+    now = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"ES_{now}_{uuid.uuid4().hex[:8]}.xlsx"
 
 def save_file_minio(minio_client: Minio, file_path: str) -> str:
     try:
@@ -195,50 +505,232 @@ def save_file_minio(minio_client: Minio, file_path: str) -> str:
         # print(f"File saved to MinIO at {output_path}")
         return output_path
     except Exception as e:
-        raise Exception(f"Error saving file to MinIO: {str(e)}")
+        raise Exception(f"Error saving file to MinIO: {str(e)}") from e
 
-def merge_cells_by_columns(worksheet, df, col_indices):
+def render_summary(results: List[list], base_cells: Optional[tuple] = None):
+    """
+    Hàm dựng timesheet từ kết quả parse các file form (và bảng tổng hợp cũ nếu có) rồi ghi file tổng hợp xlsx vào bộ nhớ.
+    Đây là phần tốn CPU của merge, được chạy trong pool process merge (run_merge_task).
+    Trả về (timesheet, nội dung file xlsx, kết quả check_overwork).
+    """
+    timesheet = build_timesheet([json_to_tasks(json) for json in results], base_cells=base_cells)
+    buffer = BytesIO()
+    overwork = write_summary_workbook(timesheet, buffer)
+    return timesheet, buffer.getvalue(), overwork
+
+def save_file_minio_stream(minio_client: Minio, workbook: bytes) -> str:
+    """
+    Hàm upload nội dung file tổng hợp (đã ghi trong bộ nhớ) thẳng lên MinIO bằng put_object,
+    không đi qua ổ đĩa của máy chạy API. File lớn hơn POD_EXPORT_PART_SIZE được upload multipart.
+    Trả về đường dẫn trên MinIO.
+    """
+    bucket_name = "estec"
+    object_name = f"data/POD/TimeTracker/Output/{new_output_filename()}"
+    try:
+        minio_client.put_object(
+            bucket_name,
+            object_name,
+            BytesIO(workbook),
+            length=len(workbook),
+            content_type=XLSX_CONTENT_TYPE,
+            part_size=POD_EXPORT_PART_SIZE
+        )
+    except Exception as e:
+        raise Exception(f"Error saving file to MinIO: {str(e)}") from e
+    print("✅ Xuất file thành công với ô đã được merge theo nhóm.")
+    return f"{bucket_name}/{object_name}"
+
+def export_summary(minio_client: Minio, timesheet: "Timesheet", workbook: bytes) -> str:
+    """
+    Hàm xuất bảng tổng hợp (nội dung xlsx do render_summary ghi) và sidecar của nó lên MinIO.
+    Mặc định upload trực tiếp từ bộ nhớ (save_file_minio_stream);
+    đặt POD_EXPORT_LOCAL=1 để ghi thêm file ra thư mục Output trên máy (dùng khi debug).
+    Trả về đường dẫn trên MinIO.
+    """
+    if POD_EXPORT_LOCAL:
+        output_path_local = save_file_local(workbook)
+        output_path_minio = save_file_minio(minio_client, output_path_local)
+    else:
+        output_path_minio = save_file_minio_stream(minio_client, workbook)
+    save_summary_sidecar(minio_client, output_path_minio, timesheet)
+    return output_path_minio
+
+def load_timesheet_db(path_files: List[str], etags: List[str], results: List[list], output_path_minio: str) -> dict:
+    """
+    Hàm nạp các ô ngày của các file form vừa merge vào PostgreSQL (bảng "TimesheetEntry"), để truy vấn số giờ
+    bằng SQL thay vì đọc lại file tổng hợp. Chỉ các file chưa nạp hoặc đã đổi ETag mới được nạp lại;
+    dữ liệu COPY được dựng trong pool process merge.
+    Với merge bổ sung, chỉ các file form mới được nạp: các dòng của file tổng hợp cũ đã được nạp từ file form gốc.
+    Lỗi khi nạp không làm hỏng lần merge (file tổng hợp đã được xuất), chỉ được ghi log và trả về trong kết quả.
+    Trả về dict status, loaded (số file đã nạp), skipped (số file không đổi), rows (số dòng đã nạp).
+    """
+    if not POD_TIMESHEET_DB:
+        return {"status": "disabled"}
+    try:
+        with get_postgres_pool().connection() as conn:
+            pending = pending_timesheet_sources(conn, path_files, etags)
+            rows = 0
+            if pending:
+                sources = [path_files[index] for index in pending]
+                copy = run_merge_task(timesheet_copy_data, [results[index] for index in pending], sources)
+                rows = load_timesheet_entries(conn, output_path_minio, sources, [etags[index] for index in pending], copy)
+        return {"status": "success", "loaded": len(pending), "skipped": len(path_files) - len(pending), "rows": rows}
+    except Exception as e:
+        print(f"Lỗi khi nạp timesheet vào PostgreSQL: {e}")
+        return {"status": "error", "message": str(e)}
+
+def sidecar_object_name(summary_object: str) -> str:
+    """
+    Hàm trả về tên object sidecar (Parquet) đi kèm file tổng hợp: cùng thư mục, cùng tên, đuôi .parquet.
+    """
+    return f"{os.path.splitext(summary_object)[0]}.parquet"
+
+def summary_to_cells(df: pd.DataFrame):
+    """
+    Hàm chuyển bảng tổng hợp dạng rộng (INFO_COLUMNS + một cột mỗi ngày) sang dạng ô:
+    (bảng thông tin INFO_COLUMNS, chỉ số dòng, ngày, số giờ) của các ô ngày có giá trị.
+    """
+    date_cols = get_date_columns(df)
+    days = pd.to_datetime(pd.Index(date_cols), format="%Y-%m-%d").values.astype("datetime64[D]")
+    values = df[date_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+    rows, cols = np.nonzero(~np.isnan(values))
+    info = df[INFO_COLUMNS].reset_index(drop=True)
+    return info, rows, days[cols], values[rows, cols]
+
+def cells_to_sidecar_table(info: pd.DataFrame, rows: np.ndarray, days: np.ndarray, hours: np.ndarray) -> pa.Table:
+    """
+    Hàm dựng bảng Arrow của sidecar: mỗi dòng của bảng tổng hợp là một bản ghi gồm INFO_COLUMNS
+    và hai cột danh sách "Ngày" / "Giờ" chứa các ô ngày có giá trị của dòng đó (rows phải tăng dần).
+    """
+    offsets = np.zeros(len(info) + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=len(info)), out=offsets[1:])
+    offsets = pa.array(offsets)
+    table = pa.Table.from_pandas(info, preserve_index=False)
+    table = table.append_column("Ngày", pa.ListArray.from_arrays(offsets, pa.array(days, type=pa.date32())))
+    table = table.append_column("Giờ", pa.ListArray.from_arrays(offsets, pa.array(hours, type=pa.float64())))
+    return table
+
+def sidecar_table_to_cells(table: pa.Table):
+    """
+    Hàm ngược của cells_to_sidecar_table.
+    """
+    info = table.select(INFO_COLUMNS).to_pandas()
+    day_lists = table.column("Ngày").combine_chunks()
+    rows = pc.list_parent_indices(day_lists).to_numpy()
+    days = pc.list_flatten(day_lists).to_numpy(zero_copy_only=False).astype("datetime64[D]")
+    hours = pc.list_flatten(table.column("Giờ").combine_chunks()).to_numpy(zero_copy_only=False)
+    return info, rows, days, hours
+
+def save_summary_sidecar(minio_client: Minio, output_path_minio: str, timesheet: "Timesheet"):
+    """
+    Hàm ghi sidecar Parquet của file tổng hợp lên MinIO, kèm ETag của file xlsx để nhận biết file bị sửa tay / upload đè.
+    Lỗi khi ghi sidecar chỉ được ghi log: lần merge bổ sung sau sẽ đọc lại từ xlsx.
+    """
+    bucket_name, summary_object = output_path_minio.split("/", 1)
+    try:
+        summary_etag = minio_client.stat_object(bucket_name, summary_object).etag
+        table = cells_to_sidecar_table(*timesheet.to_cells())
+        table = table.replace_schema_metadata({"summary_etag": summary_etag, "sidecar_version": SIDECAR_VERSION})
+        buffer = BytesIO()
+        pq.write_table(table, buffer)
+        length = buffer.tell()
+        buffer.seek(0)
+        minio_client.put_object(bucket_name, sidecar_object_name(summary_object), buffer, length=length, content_type="application/vnd.apache.parquet")
+    except Exception as e:
+        print(f"Không ghi được sidecar cho {output_path_minio}: {e}")
+
+def load_summary_sidecar(minio_client: Minio, bucket_name: str, summary_object: str, summary_etag: str):
+    """
+    Hàm đọc sidecar của file tổng hợp (dạng ô, xem summary_to_cells).
+    Trả về None nếu không có sidecar, sidecar không đọc được hoặc không khớp ETag hiện tại của file xlsx.
+    """
+    try:
+        data, _ = download_object(minio_client, bucket_name, sidecar_object_name(summary_object))
+        table = pq.read_table(BytesIO(data))
+    except Exception as e:
+        print(f"Không dùng được sidecar của {summary_object}: {e}")
+        return None
+    metadata = table.schema.metadata or {}
+    if metadata.get(b"summary_etag", b"").decode() != summary_etag or metadata.get(b"sidecar_version", b"").decode() != SIDECAR_VERSION:
+        print(f"Sidecar của {summary_object} không khớp với file xlsx hiện tại, đọc lại từ xlsx.")
+        return None
+    return sidecar_table_to_cells(table.replace_schema_metadata(None))
+
+def merge_ranges_by_columns(df: pd.DataFrame, col_indices: List[int]) -> List[tuple]:
+    """
+    Hàm tính các vùng cần merge theo từng cột bằng run-length (so sánh với dòng trước + cumsum).
+    Các cột được gom theo thứ bậc theo thứ tự trong col_indices: một vùng của cột sau
+    không bao giờ vượt qua ranh giới của các cột trước (vd. dự án không vượt qua nhân sự).
+    Ô trống không được merge.
+    Trả về danh sách (chỉ số cột, dòng bắt đầu, dòng kết thúc) theo chỉ số dòng của df.
+    """
+    n = len(df)
+    ranges = []
+    if n == 0:
+        return ranges
+    boundary = np.zeros(n, dtype=bool)
+    boundary[0] = True
     for col in col_indices:
-        start_row = 2
-        for row in range(3, len(df) + 2):
-            if df.iloc[row - 2, col] != df.iloc[row - 3, col]:
-                if row - 1 > start_row:
-                    worksheet.merge_cells(start_row=start_row, start_column=col + 1, end_row=row - 1, end_column=col + 1)
-                start_row = row
-        # Merge cho phần cuối cùng
-        if len(df) + 1 > start_row:
-            worksheet.merge_cells(start_row=start_row, start_column=col + 1, end_row=len(df) + 1, end_column=col + 1)
-
-def check_overwork(df: pd.DataFrame) -> Optional[dict]:
-    """
-    Kiểm tra xem có công việc nào có QTY > 8 giờ hay không.
-    Trả về dict chứa thông tin về nhân sự và ngày làm việc quá giờ.
-    Nếu không có thì trả về None.
+        codes, _ = pd.factorize(df.iloc[:, col])
+        boundary[1:] |= (codes[1:] != codes[:-1]) | (codes[1:] < 0)
+        starts = np.flatnonzero(boundary)
+        ends = np.append(starts[1:], n) - 1
+        long_runs = ends > starts
+        ranges.extend((col, start, end) for start, end in zip(starts[long_runs].tolist(), ends[long_runs].tolist()))
+    return ranges
+
+def merge_cells_by_columns(worksheet, df, col_indices):
+    """
+    Hàm merge các ô liên tiếp có cùng giá trị của các cột col_indices (theo thứ bậc, xem merge_ranges_by_columns).
+    Các vùng được thêm vào sheet một lần; ô bên dưới ô đầu của mỗi vùng được xóa giá trị nhưng giữ style (viền).
     """
-    # Lấy các cột ngày
-    date_cols = [col for col in df.columns if str(col).startswith('2025')]
+    for col, start, end in merge_ranges_by_columns(df, col_indices):
+        column = col + 1
+        for row in range(start + 3, end + 3):
+            worksheet.cell(row=row, column=column).value = None
+        worksheet.merged_cells.add(MergedCellRange(worksheet, f"{get_column_letter(column)}{start + 2}:{get_column_letter(column)}{end + 2}"))
 
-    # Gom nhóm theo Tên nhân sự + cột ngày
-    result = df.groupby('Tên nhân sự')[date_cols].sum().fillna(0)
+def daily_hours(cells: pd.DataFrame) -> pd.Series:
+    """
+    Hàm tính tổng số giờ theo (nhân sự, ngày) từ bảng ô ngày dạng dài, sắp xếp theo tên nhân sự rồi theo ngày.
+    Nhân sự và ngày được gộp thành một khoá số nguyên (mã category × số ngày + ngày) để groupby trên một mảng int64
+    thay vì trên hai cột category / datetime.
+    """
+    employees = cells["Tên nhân sự"].cat
+    day_numbers = cells["Ngày"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    if not len(day_numbers):
+        return pd.Series([], index=pd.MultiIndex.from_arrays([[], pd.DatetimeIndex([])], names=["Tên nhân sự", "Ngày"]), dtype=float)
+    first_day = day_numbers.min()
+    span = day_numbers.max() - first_day + 1
+    keys = employees.codes.to_numpy().astype(np.int64) * span + (day_numbers - first_day)
+    totals = pd.Series(cells["Giờ"].to_numpy()).groupby(keys, sort=True).sum()
+    key_values = totals.index.to_numpy()
+    index = pd.MultiIndex.from_arrays(
+        [employees.categories[key_values // span], pd.DatetimeIndex((key_values % span + first_day).astype("datetime64[D]"))],
+        names=["Tên nhân sự", "Ngày"]
+    )
+    return pd.Series(totals.to_numpy(), index=index)
 
-    # Lọc chỗ > 8
-    overwork = result[result > 8].dropna(how='all')
+def check_overwork(timesheet: "Timesheet") -> Optional[dict]:
+    """
+    Kiểm tra xem có nhân sự nào làm quá 8 giờ trong một ngày hay không (cộng mọi công việc của nhân sự trong ngày).
+    Trả về dict chứa thông tin về nhân sự và ngày làm việc quá giờ.
+    Nếu không có thì trả về None.
+    """
+    # Gom nhóm theo Tên nhân sự + ngày (mọi năm), lọc chỗ > 8
+    totals = daily_hours(timesheet.cells)
+    overwork = totals[totals > 8]
 
     # Schema
     output = []
-    for name, row in overwork.iterrows():
-        days = []
-        for day, hours in row.items():
-            if pd.notna(hours) and hours > 8:
-                days.append({
-                    "date_val": str(day),
-                    "hours": float(hours)
-                })
-        if days:
-            output.append({
-                "employee": name,
-                "overwork": days
-            })
+    for name, days in overwork.groupby(level=0, observed=True, sort=False):
+        output.append({
+            "employee": name,
+            "overwork": [
+                {"date_val": day.strftime("%Y-%m-%d"), "hours": float(hours)}
+                for day, hours in zip(days.index.get_level_values(1), days.tolist())
+            ]
+        })
 
     if not output:
         return None  # Không có ai làm quá 8 giờ
@@ -246,181 +738,518 @@ def check_overwork(df: pd.DataFrame) -> Optional[dict]:
     print("Overwork detected:", output)
     return output
 
-def save_file_local(df: pd.DataFrame):
-    now = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"./minio/minio_data/POD/TimeTracker/Output/ES_{now}.xlsx"
-    with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, startrow=1, header=False)
-        workbook = writer.book
-        worksheet = writer.sheets['Sheet1']
-
-        # Căn chỉnh các ô
-        center_alignment = Alignment(horizontal='center', vertical='center')
-
-        # Tạo fill xanh nhạt cho header
-        header_fill = PatternFill(start_color="D9EAF7", end_color="D9EAF7", fill_type="solid")
-
-        # Fill hồng cho cuối tuần
-        weekend_fill = PatternFill(start_color="FADADD", end_color="FADADD", fill_type="solid")
-
-        # Tạo border
-        thin = Side(border_style="thin", color="000000")
-        border = Border(top=thin, left=thin, right=thin, bottom=thin)
-
-        # Tạo fill đỏ cho ô quá giờ
-        overwork_fill = PatternFill(start_color="FF6666", end_color="FF6666", fill_type="solid")
-        overwork_warning_fill = PatternFill(start_color="f7dc6f", end_color="f7dc6f", fill_type="solid")
-
-        normal_fill = PatternFill(start_color="E2F0CB", end_color="E2F0CB", fill_type="solid")
-
-        # Xác định các cột là ngày cuối tuần
-        weekend_cols = get_weekend_columns(df)
-        overwork = check_overwork(df)
-        
-        print("Weekend columns:", weekend_cols)
-        # Áp dụng cho các ô header
-        for idx, col in enumerate(df.columns):
-            cell = worksheet.cell(row=1, column=idx+1, value=col)
-            if col in weekend_cols:
-                cell.fill = weekend_fill
-            else:
-                cell.fill = header_fill
-            cell.border = border
-            cell.alignment = center_alignment  
-        
-        # Áp dụng viền cho toàn bộ các ô dữ liệu
-        # for row in worksheet.iter_rows(min_row=2, max_row=1+len(df), min_col=1, max_col=len(df.columns)):
-        #     for cell in row:
-        #         cell.border = border
-        #         cell.alignment = center_alignment  
-        #         col_header = df.columns[cell.column - 1]
-        #         if str(col_header).startswith('2025'):
-        #             if isinstance(cell.value, (int, float)) and cell.value > 8:
-        #                 cell.fill = overwork_fill
-        for row_idx, row in enumerate(worksheet.iter_rows(min_row=2, max_row=1+len(df), min_col=1, max_col=len(df.columns)), start=2):
-            for cell in row:
-                cell.alignment = center_alignment
-                col_header = df.columns[cell.column - 1]
-                if not str(col_header).startswith('2025'):
-                    cell.border = border
-                
-                if str(col_header).startswith('2025'):
-                    # Lấy tên nhân sự dòng này:
-                    employee_name = df.iloc[row_idx - 2]['Tên nhân sự']
-                    # Kiểm tra (employee_name, col_header) có trong overwork không?
-                    overwork_flag = False
-                    for item in overwork:
-                        if item["employee"] == employee_name:
-                            for day in item["overwork"]:
-                                if str(day["date_val"]) == str(col_header):
-                                    overwork_flag = True
-                                    break
-                        if overwork_flag:
-                            break
-                    if isinstance(cell.value, (int, float)) and cell.value < 8:
-                        cell.fill = normal_fill
-                    if isinstance(cell.value, (int, float)) and overwork_flag:
-                        cell.fill = overwork_warning_fill
-                    if isinstance(cell.value, (int, float)) and cell.value > 8:
-                        cell.fill = overwork_fill
-                
-        merge_cells_by_columns(worksheet, df, [0, 1, 2])
+def get_date_columns(df: pd.DataFrame) -> List[str]:
+    """
+    Hàm trả về danh sách các cột ngày (tên cột dạng YYYY-MM-DD) của DataFrame, không phụ thuộc vào năm.
+    """
+    dates = pd.to_datetime(pd.Index(df.columns).astype(str), format="%Y-%m-%d", errors="coerce")
+    return list(df.columns[~dates.isna()])
+
+def overwork_mask(timesheet: "Timesheet", overwork: Optional[list]) -> np.ndarray:
+    """
+    Hàm chuyển kết quả check_overwork thành mảng bool theo từng ô ngày của timesheet.cells:
+    ô là True nếu nhân sự của ô đó làm quá 8 giờ trong ngày đó.
+    """
+    cells = timesheet.cells
+    if not overwork or not len(cells):
+        return np.zeros(len(cells), dtype=bool)
+    flagged = pd.MultiIndex.from_tuples(
+        [(item["employee"], pd.Timestamp(day["date_val"])) for item in overwork for day in item["overwork"]]
+    )
+    keys = pd.MultiIndex.from_arrays([cells["Tên nhân sự"].astype(object), cells["Ngày"]])
+    return keys.isin(flagged)
+
+def register_summary_styles(workbook) -> None:
+    """
+    Hàm đăng ký các style dùng chung cho file tổng hợp, mỗi ô chỉ cần gán tên style một lần.
+    """
+    center_alignment = Alignment(horizontal='center', vertical='center')
+    thin = Side(border_style="thin", color="000000")
+    border = Border(top=thin, left=thin, right=thin, bottom=thin)
+    styles = [
+        # Ô thông tin (STT, tên, dự án, ...) có viền
+        NamedStyle(name="pod_info", alignment=center_alignment, border=border),
+        # Ô ngày: < 8 giờ (xanh), tổng ngày của nhân sự > 8 giờ (vàng), bản thân ô > 8 giờ (đỏ)
+        NamedStyle(name="pod_day", alignment=center_alignment),
+        NamedStyle(name="pod_day_normal", alignment=center_alignment, fill=PatternFill(start_color="E2F0CB", end_color="E2F0CB", fill_type="solid")),
+        NamedStyle(name="pod_day_warning", alignment=center_alignment, fill=PatternFill(start_color="f7dc6f", end_color="f7dc6f", fill_type="solid")),
+        NamedStyle(name="pod_day_overwork", alignment=center_alignment, fill=PatternFill(start_color="FF6666", end_color="FF6666", fill_type="solid")),
+        # Header: xanh nhạt, ngày nghỉ màu hồng
+        NamedStyle(name="pod_header", alignment=center_alignment, border=border, fill=PatternFill(start_color="D9EAF7", end_color="D9EAF7", fill_type="solid")),
+        NamedStyle(name="pod_header_weekend", alignment=center_alignment, border=border, fill=PatternFill(start_color="FADADD", end_color="FADADD", fill_type="solid")),
+    ]
+    for style in styles:
+        workbook.add_named_style(style)
+
+def write_summary_workbook(timesheet: "Timesheet", output) -> Optional[list]:
+    """
+    Hàm ghi bảng tổng hợp ra file xlsx (đường dẫn hoặc file-like object) kèm định dạng.
+    Bảng rộng (một cột mỗi ngày) chỉ tồn tại trong sheet: mỗi ô ngày của timesheet.cells được ghi thẳng
+    vào vị trí (dòng, cột ngày) của nó, style được chọn cho mọi ô cùng lúc bằng NumPy rồi gán bằng style dùng chung.
+    Trả về kết quả check_overwork.
+    """
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.title = "Sheet1"
+    register_summary_styles(workbook)
+
+    info = timesheet.info
+    cells = timesheet.cells
+    calendar_days = timesheet.calendar_days()
+    overwork = check_overwork(timesheet)
+
+    # Header: cột ngày nghỉ (Thứ 7, Chủ nhật, ngày lễ) màu hồng
+    n_info = len(INFO_COLUMNS)
+    is_day_off = ~working_day_mask(calendar_days)
+    for idx, col in enumerate(INFO_COLUMNS):
+        worksheet.cell(row=1, column=idx + 1, value=col).style = "pod_header"
+    for idx, (col, day_off) in enumerate(zip(format_date_labels(calendar_days), is_day_off.tolist()), start=n_info + 1):
+        worksheet.cell(row=1, column=idx, value=col).style = "pod_header_weekend" if day_off else "pod_header"
+
+    # Ô thông tin: căn giữa và có viền
+    for idx, col in enumerate(INFO_COLUMNS):
+        for row, value in enumerate(info[col].tolist(), start=2):
+            cell = worksheet.cell(row=row, column=idx + 1, value=None if pd.isna(value) else value)
+            cell.style = "pod_info"
+
+    # Ô ngày: > 8 giờ (đỏ), tổng ngày của nhân sự > 8 giờ (vàng), < 8 giờ (xanh), đúng 8 giờ không tô màu
+    if len(cells):
+        values = cells["Giờ"].to_numpy()
+        flags = overwork_mask(timesheet, overwork)
+        style_names = ["pod_day", "pod_day_normal", "pod_day_warning", "pod_day_overwork"]
+        style_codes = np.select([values > 8, flags, values < 8], [3, 2, 1], default=0)
+        rows = cells["Dòng"].to_numpy() + 2
+        cols = (cells["Ngày"].to_numpy().astype("datetime64[D]") - calendar_days[0]).astype(np.int64) + n_info + 1
+        for row, col, value, code in zip(rows.tolist(), cols.tolist(), values.tolist(), style_codes.tolist()):
+            cell = worksheet.cell(row=row, column=col, value=value)
+            cell.style = style_names[code]
+
+    merge_cells_by_columns(worksheet, info, [0, 1, 2, 3])
+    workbook.save(output)
+    return overwork
+
+def save_file_local(workbook: bytes) -> str:
+    filename = f"./minio/minio_data/POD/TimeTracker/Output/{new_output_filename()}"
+    with open(filename, "wb") as f:
+        f.write(workbook)
     print("✅ Xuất file thành công với ô đã được merge theo nhóm.")
-    return filename, overwork
+    return filename
 
-def generate_dataframe(json_data: List[dict]) -> str:
-    # print("Generating output path...")
-    tasks = json_data
-    rows = []
-    stt_global = 0
-    # print("Processing tasks...")
-
-    # Get range date
-    start_dates = []
-    end_dates = []
-    for person in tasks:
+# Các cột thông tin (không phải cột ngày) của bảng tổng hợp và khóa sắp xếp
+INFO_COLUMNS = ["STT", "Tên nhân sự", "Mã dự án", "Mô tả công việc", "Thời gian bắt đầu", "Thời gian kết thúc"]
+SORT_COLUMNS = ["STT", "Tên nhân sự", "Mã dự án", "Thời gian bắt đầu"]
+
+def json_to_tasks(json_data: List[dict]) -> pd.DataFrame:
+    """
+    Hàm làm phẳng kết quả processing_json thành bảng công việc: mỗi dòng là một công việc của một nhân sự,
+    gồm các cột INFO_COLUMNS và QTY. STT được đánh theo thứ tự nhân sự trong form.
+    """
+    stt, names, projects, descriptions, starts, ends, qtys = [], [], [], [], [], [], []
+    for stt_global, person in enumerate(json_data, start=1):
         for project in person["Dự án"]:
             for task in project["Thông tin"]:
-                if task.get("Kế hoạch - Từ"):
-                    start_dates.append(task["Kế hoạch - Từ"])
-                if task.get("Kế hoạch - Đến"):
-                    end_dates.append(task["Kế hoạch - Đến"])
+                stt.append(stt_global)
+                names.append(person["Tên nhân sự"])
+                projects.append(project["Mã dự án"])
+                descriptions.append(task["Mô tả công việc"])
+                starts.append(task["Kế hoạch - Từ"])
+                ends.append(task["Kế hoạch - Đến"])
+                qtys.append(task["QTY"])
+    return pd.DataFrame({
+        "STT": np.array(stt, dtype=np.int64),
+        "Tên nhân sự": names,
+        "Mã dự án": projects,
+        "Mô tả công việc": descriptions,
+        "Thời gian bắt đầu": starts,
+        "Thời gian kết thúc": ends,
+        "QTY": np.array(qtys, dtype=float)
+    })
 
-    date_min = min(datetime.strptime(d, "%Y-%m-%d") for d in start_dates)
-    date_max = max(datetime.strptime(d, "%Y-%m-%d") for d in end_dates)
+def expand_tasks(start_arr: np.ndarray, end_arr: np.ndarray, qtys: np.ndarray, calendar_days: np.ndarray):
+    """
+    Hàm trải công việc ra ma trận công việc × ngày bằng phép so sánh broadcast:
+    ngày làm việc trong kế hoạch có giá trị QTY, ngày nghỉ trong kế hoạch là 0, ngoài kế hoạch là NaN.
+    Trả về (values, in_plan, is_working_day).
+    """
+    in_plan = (calendar_days[None, :] >= start_arr[:, None]) & (calendar_days[None, :] <= end_arr[:, None])
+    is_working_day = working_day_mask(calendar_days)
+    values = np.where(in_plan, np.where(is_working_day, qtys[:, None], 0.0), np.nan)
+    return values, in_plan, is_working_day
+
+def format_date_labels(calendar_days: np.ndarray) -> pd.Index:
+    return pd.DatetimeIndex(calendar_days).strftime("%Y-%m-%d")
+
+def generate_dataframe(json_data: List[dict]) -> str:
+    """
+    Hàm trải các công việc trong json_data ra lịch theo ngày.
+    Mỗi công việc của một nhân sự là một dòng, mỗi ngày trong khoảng [ngày bắt đầu nhỏ nhất, ngày kết thúc lớn nhất] là một cột:
+    ngày làm việc trong kế hoạch có giá trị QTY, ngày nghỉ (Thứ 7, Chủ nhật, ngày lễ) trong kế hoạch là 0, ngoài kế hoạch là None.
+    Lịch được tính một lần dưới dạng ma trận công việc × ngày bằng NumPy thay vì duyệt từng ô.
+    """
+    tasks = json_to_tasks(json_data)
+
+    start_arr = tasks["Thời gian bắt đầu"].to_numpy(dtype="datetime64[D]")
+    end_arr = tasks["Thời gian kết thúc"].to_numpy(dtype="datetime64[D]")
+    date_min = start_arr.min()
+    date_max = end_arr.max()
     print(f"Date range: {date_min} -> {date_max}")
-    calendar_days = pd.date_range(start=date_min, end=date_max)
+    calendar_days = np.arange(date_min, date_max + 1, dtype="datetime64[D]")
+    date_labels = format_date_labels(calendar_days)
 
-    for person in tasks:
-        name = person["Tên nhân sự"]
-        # print(f"Processing tasks for {name}...")
-        stt_global += 1
-        for project in person["Dự án"]:
-            ma_du_an = project["Mã dự án"]
-            for task in project["Thông tin"]:
-                description = task["Mô tả công việc"]
-                start = task["Kế hoạch - Từ"]
-                end = task["Kế hoạch - Đến"]
-                QTY = task["QTY"]
-                
-                row = {
-                    "STT": stt_global,
-                    "Tên nhân sự": name,
-                    "Mã dự án": ma_du_an,
-                    "Mô tả công việc": description,
-                    "Thời gian bắt đầu": start,
-                    "Thời gian kết thúc": end
-                }
+    values, in_plan, is_working_day = expand_tasks(start_arr, end_arr, tasks["QTY"].to_numpy(), calendar_days)
+
+    # Giữ kiểu dữ liệu như khi dựng DataFrame từ từng dòng: cột không có công việc nào là None (object),
+    # cột ngày nghỉ mà mọi công việc đều nằm trong kế hoạch chỉ chứa số 0 nguyên (int64)
+    empty_cols = ~in_plan.any(axis=0)
+    zero_cols = in_plan.all(axis=0) & ~is_working_day
+    day_columns = {}
+    for j, label in enumerate(date_labels):
+        if empty_cols[j]:
+            day_columns[label] = np.full(len(tasks), None, dtype=object)
+        elif zero_cols[j]:
+            day_columns[label] = np.zeros(len(tasks), dtype=np.int64)
+        else:
+            day_columns[label] = values[:, j]
+    df_days = pd.DataFrame(day_columns)
 
-                start_date = datetime.strptime(start, "%Y-%m-%d")
-                end_date = datetime.strptime(end, "%Y-%m-%d")
-
-                for date in calendar_days:
-                    if start_date <= date <= end_date:
-                        if date.weekday() < 5:
-                            row[date.strftime("%Y-%m-%d")] = QTY
-                        else:
-                            row[date.strftime("%Y-%m-%d")] = 0
-                    else:
-                        row[date.strftime("%Y-%m-%d")] = None
-
-                rows.append(row)
-    # Tạo DataFrame
-    df = pd.DataFrame(rows)
+    df = pd.concat([tasks[INFO_COLUMNS], df_days], axis=1)
     return df
 
-def amount_weekend_days(start_date: datetime, end_date: datetime) -> int:
+def _sort_order(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """
+    Hàm tính thứ tự sắp xếp ổn định theo nhiều cột (giá trị trống xếp cuối) bằng np.lexsort trên mã factorize.
+    """
+    keys = []
+    for col in reversed(columns):
+        codes, uniques = pd.factorize(df[col], sort=True)
+        keys.append(np.where(codes < 0, len(uniques), codes))
+    return np.lexsort(keys)
+
+class Timesheet:
+    """
+    Bảng tổng hợp dạng dài (thưa) dùng bên trong pipeline merge, thay cho bảng rộng một cột mỗi ngày.
+
+    Args:
+        info (pd.DataFrame): Mỗi dòng của bảng tổng hợp (một công việc của một nhân sự), cột INFO_COLUMNS,
+            đã sắp xếp theo SORT_COLUMNS.
+        cells (pd.DataFrame): Mỗi ô ngày có giá trị là một bản ghi ("Dòng", "Tên nhân sự", "Mã dự án", "Ngày", "Giờ"),
+            sắp xếp theo (Dòng, Ngày). "Dòng" là chỉ số dòng trong info, tên nhân sự và mã dự án có kiểu category.
+    """
+    CELL_COLUMNS = ["Dòng", "Tên nhân sự", "Mã dự án", "Ngày", "Giờ"]
+
+    def __init__(self, info: pd.DataFrame, cells: pd.DataFrame):
+        self.info = info
+        self.cells = cells
+
+    def calendar_days(self) -> np.ndarray:
+        """
+        Trục ngày của bảng khi xuất: mọi ngày từ ngày nhỏ nhất đến ngày lớn nhất có giá trị.
+        """
+        if not len(self.cells):
+            return np.array([], dtype="datetime64[D]")
+        days = self.cells["Ngày"].to_numpy().astype("datetime64[D]")
+        return np.arange(days.min(), days.max() + 1, dtype="datetime64[D]")
+
+    def to_cells(self):
+        """
+        Trả về (info, chỉ số dòng, ngày, số giờ), cùng dạng với summary_to_cells / load_summary_sidecar.
+        """
+        return (
+            self.info,
+            self.cells["Dòng"].to_numpy(),
+            self.cells["Ngày"].to_numpy().astype("datetime64[D]"),
+            self.cells["Giờ"].to_numpy()
+        )
+
+def expand_tasks_sparse(start_arr: np.ndarray, end_arr: np.ndarray, qtys: np.ndarray):
     """
-    Hàm để tính số ngày cuối tuần (Thứ 7, Chủ nhật) trong khoảng thời gian từ start_date đến end_date.
-    Trả về số lượng ngày cuối tuần.
+    Hàm trải công việc ra các ô ngày dạng dài: mỗi ngày trong kế hoạch [start, end] của mỗi công việc là một ô,
+    ngày làm việc có giá trị QTY, ngày nghỉ là 0.
+    Trả về (chỉ số công việc, ngày, số giờ) của từng ô, theo thứ tự công việc rồi theo ngày.
     """
-    if not isinstance(start_date, datetime) or not isinstance(end_date, datetime):
+    lengths = np.maximum((end_arr - start_arr).astype(np.int64) + 1, 0)
+    rows = np.repeat(np.arange(len(start_arr)), lengths)
+    first_cell = np.cumsum(lengths) - lengths
+    days = start_arr[rows] + (np.arange(len(rows)) - first_cell[rows])
+    hours = np.where(working_day_mask(days), qtys[rows], 0.0)
+    return rows, days, hours
+
+def build_timesheet(task_frames: List[pd.DataFrame], base_cells: Optional[tuple] = None) -> Timesheet:
+    """
+    Hàm dựng bảng tổng hợp dạng dài từ bảng công việc của nhiều form (và bảng tổng hợp cũ nếu có).
+    Chỉ các ngày nằm trong kế hoạch của công việc mới có ô, nên bộ nhớ tỉ lệ với số ô có giá trị
+    chứ không phải số dòng × số ngày. Bảng được sắp xếp một lần theo SORT_COLUMNS.
+    Tham số:
+    - task_frames: Danh sách bảng công việc (kết quả json_to_tasks) của từng form.
+    - base_cells: Bảng tổng hợp đã có ở dạng ô (summary_to_cells / load_summary_sidecar), giữ nguyên giá trị các ô ngày.
+      Các ô phải theo thứ tự (dòng, ngày). Các dòng cũ đã được sắp xếp sẵn; sắp xếp ổn định nên dòng cũ
+      luôn đứng trước dòng mới có cùng khoá.
+    """
+    tasks = pd.concat(task_frames, ignore_index=True) if task_frames else json_to_tasks([])
+    start_arr = tasks["Thời gian bắt đầu"].to_numpy(dtype="datetime64[D]")
+    end_arr = tasks["Thời gian kết thúc"].to_numpy(dtype="datetime64[D]")
+    task_rows, task_days, task_hours = expand_tasks_sparse(start_arr, end_arr, tasks["QTY"].to_numpy())
+
+    if base_cells is not None and len(base_cells[0]):
+        base_info, base_rows, base_days, base_hours = base_cells
+        info = pd.concat([base_info, tasks[INFO_COLUMNS]], ignore_index=True)
+        rows = np.concatenate([base_rows, task_rows + len(base_info)])
+        days = np.concatenate([base_days.astype("datetime64[D]"), task_days])
+        hours = np.concatenate([base_hours, task_hours])
+    else:
+        info, rows, days, hours = tasks[INFO_COLUMNS], task_rows, task_days, task_hours
+    if not len(info):
+        raise ValueError("Không có công việc nào trong các file đã chọn.")
+
+    # Ô của mỗi dòng nằm liền nhau và đã theo thứ tự ngày, nên chỉ cần chuyển nguyên khối ô theo thứ tự dòng mới
+    order = _sort_order(info, SORT_COLUMNS)
+    info = info.iloc[order].reset_index(drop=True)
+    counts = np.bincount(rows, minlength=len(order))
+    starts = np.cumsum(counts) - counts
+    new_counts = counts[order]
+    new_starts = np.cumsum(new_counts) - new_counts
+    cell_order = np.repeat(starts[order] - new_starts, new_counts) + np.arange(len(rows))
+    rows = np.repeat(np.arange(len(order), dtype=np.int32), new_counts)
+
+    employee_codes, employees = pd.factorize(info["Tên nhân sự"], sort=True)
+    project_codes, projects = pd.factorize(info["Mã dự án"], sort=True)
+    cells = pd.DataFrame({
+        "Dòng": rows,
+        "Tên nhân sự": pd.Categorical.from_codes(employee_codes[rows], categories=employees),
+        "Mã dự án": pd.Categorical.from_codes(project_codes[rows], categories=projects),
+        "Ngày": days[cell_order],
+        "Giờ": hours[cell_order]
+    })
+    return Timesheet(info, cells)
+
+def timesheet_copy_data(results: List[list], sources: List[str]) -> dict:
+    """
+    Hàm chuyển kết quả parse các file form sang dữ liệu CSV cho lệnh COPY vào bảng "TimesheetEntry":
+    mỗi ô ngày có giờ (khác 0) là một dòng (file nguồn, nhân sự, dự án, công việc, ngày, số giờ).
+    Trả về dict data (CSV), rows (số dòng của từng file), first_day / last_day (ngày nhỏ nhất / lớn nhất, None nếu rỗng).
+    """
+    frames, counts = [], []
+    for json, source in zip(results, sources):
+        tasks = json_to_tasks(json)
+        start_arr = tasks["Thời gian bắt đầu"].to_numpy(dtype="datetime64[D]")
+        end_arr = tasks["Thời gian kết thúc"].to_numpy(dtype="datetime64[D]")
+        rows, days, hours = expand_tasks_sparse(start_arr, end_arr, tasks["QTY"].to_numpy())
+        keep = np.nan_to_num(hours) != 0
+        rows, days, hours = rows[keep], days[keep], hours[keep]
+        frames.append(pd.DataFrame({
+            "source_file": source,
+            "employee": tasks["Tên nhân sự"].to_numpy()[rows],
+            "project": tasks["Mã dự án"].to_numpy()[rows],
+            "task": tasks["Mô tả công việc"].to_numpy()[rows],
+            "work_date": days,
+            "hours": hours
+        }))
+        counts.append(len(rows))
+    frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["work_date"])
+    if not len(frame):
+        return {"data": b"", "rows": counts, "first_day": None, "last_day": None}
+    days = frame["work_date"].to_numpy().astype("datetime64[D]")
+    return {
+        "data": frame.to_csv(index=False, header=False, date_format="%Y-%m-%d").encode("utf-8"),
+        "rows": counts,
+        "first_day": days.min().item(),
+        "last_day": days.max().item()
+    }
+
+def _plan_dates(column: pd.Series) -> pd.Series:
+    """
+    Hàm chuyển cột ngày kế hoạch sang datetime64, báo lỗi nếu có ô không phải ngày.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(column):
+        if not column.map(lambda value: isinstance(value, datetime)).all():
+            raise ValueError("start_date and end_date must be datetime objects")
+        column = pd.to_datetime(column)
+    if column.isna().any():
         raise ValueError("start_date and end_date must be datetime objects")
-    
-    if start_date > end_date:
-        raise ValueError("start_date must be before end_date")
+    return column
 
-    weekend_days = 0
-    current_date = start_date
+def form_task_errors(MaDuAn, excel_rows, descriptions, starts, ends, working_days, hours) -> List[dict]:
+    """
+    Hàm kiểm tra các công việc của một form (ngày kế hoạch đã hợp lệ): công việc không có ngày làm việc
+    (chỉ rơi vào Thứ 7, Chủ nhật, ngày lễ) và công việc không có số giờ (QTY).
+    Trả về list lỗi theo thứ tự công việc, mỗi lỗi gồm row (dòng trên sheet), column, code và message.
+    """
+    errors = []
+    for row, MoTa, Tu, Den, days, total in zip(excel_rows, descriptions, starts, ends, working_days, hours):
+        if days <= 0:
+            errors.append({
+                "row": int(row),
+                "column": "F:G",
+                "code": "no_working_days",
+                "message": f'''Dự án {MaDuAn} có công việc {MoTa}: Có ngày làm việc rơi vào Thứ 7, Chủ nhật hoặc ngày lễ. Vui lòng điều chỉnh lại ngày bắt đầu & kết thúc. Ngày bắt đầu hiện tại: {Tu}, Ngày kết thúc hiện tại: {Den}.'''
+            })
+        if np.isnan(total):
+            errors.append({
+                "row": int(row),
+                "column": "I",
+                "code": "missing_hours",
+                "message": f'''Dự án {MaDuAn} có công việc {MoTa}: Không có số giờ (QTY). Vui lòng kiểm tra lại.'''
+            })
+    return errors
 
-    while current_date <= end_date:
-        if current_date.weekday() in [5, 6]:
-            weekend_days += 1
-        current_date += timedelta(days=1)
-    print(f"Weekend days from {start_date} to {end_date}: {weekend_days}")
-    return weekend_days
+def match_form_signature(row: tuple, signature: dict) -> bool:
+    """
+    Hàm kiểm tra một dòng có khớp chữ ký header (FORM_HEADER_SIGNATURE / FORM_SUB_HEADER_SIGNATURE) hay không.
+    """
+    return all(
+        idx < len(row) and isinstance(row[idx], str) and any(word in row[idx].upper() for word in words)
+        for idx, words in signature.items()
+    )
 
-def processing_json(file_path: BytesIO): 
-    workbook = openpyxl.load_workbook(file_path, data_only=True)
-    sheet = workbook.active
-    
-    MaDuAn = sheet["M2"].value
-    header = [cell.value for cell in sheet[7][:13]]
-    sub_header = [cell.value for cell in sheet[8][:13]]
+def detect_form_layout(head: List[tuple]) -> Optional[tuple]:
+    """
+    Hàm tìm khối header của một sheet form trong các dòng đầu sheet (head[0] là dòng 1).
+    Sheet là form khi có đủ chữ ký header: dòng có STT, mô tả, nhân sự, kế hoạch (FORM_HEADER_SIGNATURE) và dòng
+    ngay dưới có Từ / Đến (FORM_SUB_HEADER_SIGNATURE), cùng một ô mã dự án: ô có giá trị đầu tiên bên phải nhãn
+    "Mã dự án" phía trên header, hoặc ô M2 nếu sheet không có nhãn.
+    Trả về (mã dự án, ô mã dự án dạng (dòng, cột), chỉ số dòng header trong head), hoặc None nếu sheet không phải form.
+    Sheet có chữ ký header nhưng ô mã dự án trống vẫn là form: mã dự án là None (lỗi missing_project).
+    """
+    header_idx = next(
+        (
+            idx for idx in range(len(head) - 1)
+            if match_form_signature(head[idx], FORM_HEADER_SIGNATURE) and match_form_signature(head[idx + 1], FORM_SUB_HEADER_SIGNATURE)
+        ),
+        None
+    )
+    if header_idx is None:
+        return None
+    for row_idx, row in enumerate(head[:header_idx]):
+        for col_idx, value in enumerate(row):
+            if isinstance(value, str) and value.strip().lower().startswith("mã dự án"):
+                for value_idx in range(col_idx + 1, len(row)):
+                    if row[value_idx] is not None and str(row[value_idx]).strip() != "":
+                        return row[value_idx], (row_idx + 1, value_idx + 1), header_idx
+                # Có nhãn nhưng không có giá trị: vẫn là form, lỗi missing_project
+                return None, (row_idx + 1, col_idx + 2), header_idx
+    # Không có nhãn: dùng ô mã dự án mặc định của form mẫu (M2); ô trống vẫn là form, lỗi missing_project
+    row_idx, col_idx = FORM_PROJECT_CELL
+    if header_idx >= row_idx and col_idx <= len(head[row_idx - 1]):
+        value = head[row_idx - 1][col_idx - 1]
+        if value is not None and str(value).strip() != "":
+            return value, FORM_PROJECT_CELL, header_idx
+    return None, FORM_PROJECT_CELL, header_idx
+
+def read_form_sheet(sheet, data_columns: int = FORM_HEADER_SCAN_COLUMNS) -> Optional[tuple]:
+    """
+    Hàm đọc một sheet form (chế độ read_only): tìm khối header trong FORM_HEADER_SCAN_ROWS dòng đầu (cột A -> M,
+    detect_form_layout) rồi đọc các dòng dữ liệu ngay sau 2 dòng header, chỉ gồm data_columns cột đầu (mặc định A -> M).
+    Trả về (mã dự án, ô mã dự án, header, sub_header, các dòng dữ liệu, số dòng trên sheet của dòng dữ liệu đầu tiên),
+    hoặc None nếu sheet không phải form.
+    """
+    rows = sheet.iter_rows(min_row=1, min_col=1, max_col=FORM_HEADER_SCAN_COLUMNS, values_only=True)
+    # Đọc thêm một dòng để dòng header ở cuối vùng quét vẫn kiểm tra được dòng Từ / Đến bên dưới
+    head = list(islice(rows, FORM_HEADER_SCAN_ROWS + 1))
+    layout = detect_form_layout(head)
+    if layout is None:
+        return None
+    MaDuAn, project_cell, header_idx = layout
+    first_data_row = header_idx + 3
+    header = head[header_idx]
+    sub_header = head[header_idx + 1]
+    if data_columns < FORM_HEADER_SCAN_COLUMNS:
+        data = list(sheet.iter_rows(min_row=first_data_row, min_col=1, max_col=data_columns, values_only=True))
+    else:
+        data = head[header_idx + 2:] + list(rows)
+    return MaDuAn, project_cell, header, sub_header, data, first_data_row
+
+def workbook_sheet_names(data: bytes) -> List[str]:
+    """
+    Hàm đọc danh sách tên sheet của file xlsx (từ xl/workbook.xml, không mở workbook).
+    Trả về list rỗng nếu không đọc được.
+    """
+    try:
+        with zipfile.ZipFile(BytesIO(data)) as archive:
+            root = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError):
+        return []
+    namespace = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+    return [sheet.get("name") for sheet in root.iter(f"{namespace}sheet")]
+
+def read_form_sheets(file_path: BytesIO, sheet_names: Optional[List[str]] = None) -> List[tuple]:
+    """
+    Hàm parse các sheet form của một workbook (mọi sheet, hoặc chỉ các sheet trong sheet_names, theo thứ tự của workbook).
+    Trả về list (tên sheet, kết quả parse_form_sheet) của từng sheet; sheet không có chữ ký header form
+    (detect_form_layout) được bỏ qua, không parse, và có kết quả None.
+    """
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        results = []
+        for name in workbook.sheetnames:
+            if sheet_names is not None and name not in sheet_names:
+                continue
+            sheet = read_form_sheet(workbook[name])
+            results.append((name, parse_form_sheet(sheet[0], sheet[2], sheet[3], sheet[4], sheet[5]) if sheet is not None else None))
+        return results
+    finally:
+        workbook.close()
+
+def combine_form_sheets(sheet_results: List[tuple]):
+    """
+    Hàm gộp kết quả parse các sheet của một workbook (read_form_sheets) thành một kết quả processing_json:
+    nhân sự trùng tên được gộp, công việc cùng mã dự án được nối theo thứ tự sheet. Các sheet bị bỏ qua được ghi log.
+    Trả về dict lỗi (gộp lỗi của mọi sheet) nếu có sheet lỗi hoặc workbook không có sheet form nào.
+    """
+    forms = [result for _, result in sheet_results if result is not None]
+    skipped = [name for name, result in sheet_results if result is None]
+    if skipped:
+        print(f"Bỏ qua các sheet không phải form TimeTracker: {', '.join(skipped)}")
+    if not forms:
+        return {
+            "status": "error",
+            "message": [f"Không tìm thấy sheet nào có header form TimeTracker (STT, mô tả, nhân sự, kế hoạch Từ / Đến và mã dự án). Các sheet đã bỏ qua: {', '.join(skipped)}. Vui lòng dùng đúng form mẫu."]
+        }
+    errors = [message for result in forms if isinstance(result, dict) for message in result["message"]]
+    if errors:
+        return {
+            "status": "error",
+            "message": errors
+        }
+    if len(forms) == 1:
+        return forms[0]
+    people = {}
+    for form in forms:
+        for person in form:
+            projects = people.setdefault(person["Tên nhân sự"], {})
+            for project in person["Dự án"]:
+                projects.setdefault(project["Mã dự án"], []).extend(project["Thông tin"])
+    return [
+        {
+            "Tên nhân sự": name,
+            "Dự án": [{"Mã dự án": code, "Thông tin": tasks} for code, tasks in projects.items()]
+        }
+        for name, projects in people.items()
+    ]
 
-    # print(f"MaDuAn: {MaDuAn}")
-    # print(f"header: {header}")
-    # print(f"sub_header: {sub_header}")
+def processing_json(file_path: BytesIO, sheet_names: Optional[List[str]] = None):
+    """
+    Hàm đọc form TimeTracker và gom công việc theo nhân sự. Mọi sheet có chữ ký header form (xem detect_form_layout)
+    đều được parse, mỗi sheet có mã dự án riêng; các sheet khác bị bỏ qua. Kết quả các sheet được gộp bằng combine_form_sheets.
+    Tham số:
+    - file_path: Đường dẫn hoặc file-like object của file xlsx.
+    - sheet_names: Chỉ parse các sheet này (mặc định: mọi sheet).
+    Trả về:
+    - list: danh sách nhân sự, mỗi nhân sự gồm các dự án và công việc.
+    - dict: {"status": "error", "message": [...]} nếu form thiếu mã dự án, có công việc không có ngày làm việc hoặc không có sheet form nào.
+    """
+    return combine_form_sheets(read_form_sheets(file_path, sheet_names))
+
+def parse_form_sheet(MaDuAn, header: tuple, sub_header: tuple, data: List[tuple], first_data_row: int):
+    """
+    Hàm gom công việc theo nhân sự của một sheet form đã đọc (read_form_sheet).
+    Ngày làm việc, QTY và danh sách nhân sự được tính theo cả cột thay vì từng dòng.
+    Trả về list nhân sự (cùng dạng processing_json), hoặc dict lỗi nếu sheet thiếu mã dự án hoặc có công việc không hợp lệ.
+    """
+    if MaDuAn is None or str(MaDuAn).strip() == "":
+        return {
+            "status": "error",
+            "message": [MISSING_PROJECT_MESSAGE]
+        }
 
     Header = []
     previous_h1 = ""
@@ -431,115 +1260,477 @@ def processing_json(file_path: BytesIO):
             previous_h1 = h1
         h2 = "" if h2 is None or "#REF" in str(h2) else h2
         Header.append(f"{h1} - {h2}" if h2 else h1)
-    
-    # print(f"Header: {Header}")
 
-    data = sheet.iter_rows(min_row=9, min_col=1, max_col=13, values_only=True)
-    df = pd.DataFrame(data, columns=Header).dropna(subset=[Header[0]])
+    df = pd.DataFrame(data, columns=Header)
+    df = df[df.iloc[:, 0].notna()]
+    # Bỏ dòng cuối (dòng tổng)
     df = df[:-1]
+    # Chỉ tính các công việc có nhân sự thực hiện
+    df = df[df.iloc[:, 3].notna()]
+    # Số dòng trên sheet của từng công việc
+    excel_rows = df.index.to_numpy() + first_data_row
+    df = df.reset_index(drop=True)
 
-    result = {}
-    message = []
-    for i in df.index:
-        row = df.loc[i]
-        if pd.isna(row[Header[3]]):
-            continue
-        members = str(row[Header[3]]).split(",")
-
-        start = pd.to_datetime(row[Header[5]])
-        end = pd.to_datetime(row[Header[6]])
-        days_task = (end - start).days + 1
-
-        # days_task = (row[Header[6]] - row[Header[5]]).days + 1
-        weekend_days = amount_weekend_days(row[Header[5]], row[Header[6]])
-        working_days = days_task - weekend_days
-
-        # print(f"Days task: {days_task}")
-
-        # if row[Header[1]]:
-        #     MoTaCongViec = row[Header[1]]  
-        # else:
-        #     MoTaCongViec = "Không có mô tả công việc"
-        #     message.append(f'''Dự án {MaDuAn} có công việc không có mô tả công việc. Vui lòng kiểm tra lại.''')
-
-        # if isinstance(row[Header[5]], datetime):
-        #     KeHoachTu = row[Header[5]].strftime("%Y-%m-%d")
-        # else:
-        #     KeHoachTu = None
-        #     message.append(f'''Dự án {MaDuAn} có công việc {MoTaCongViec}: Không có ngày bắt đầu. Vui lòng kiểm tra lại.''')
-            
-        # if isinstance(row[Header[6]], datetime):
-        #     KeHoachDen = row[Header[6]].strftime("%Y-%m-%d")
-        # else:
-        #     KeHoachDen = None
-        #     message.append(f'''Dự án {MaDuAn} có công việc {MoTaCongViec}: Không có ngày kết thúc. Vui lòng kiểm tra lại.''')
-
-        MoTaCongViec = row[Header[1]] if row[Header[1]] else "Không có mô tả công việc"
-        KeHoachTu = row[Header[5]].strftime("%Y-%m-%d") if isinstance(row[Header[5]], datetime) else "Không có ngày bắt đầu"
-        KeHoachDen = row[Header[6]].strftime("%Y-%m-%d") if isinstance(row[Header[6]], datetime) else "Không có ngày kết thúc"
-        print(f"MaDuAn: {MaDuAn}, MoTaCongViec: {MoTaCongViec}, KeHoachTu: {KeHoachTu}, KeHoachDen: {KeHoachDen}")
-        print(f"working_days: {working_days}, days_task: {days_task}, weekend_days: {weekend_days}")
-        # error_message = []
-        # message = ""
-        
-        if working_days <= 0:
-            # return {
-            #     "status": "error",
-            #     "message": f'''Dự án {MaDuAn} có công việc {MoTaCongViec}: Có ngày làm việc rơi vào Thứ 7 hoặc Chủ nhật. Vui lòng điều chỉnh lại ngày bắt đầu & kết thúc. Ngày bắt đầu hiện tại: {KeHoachTu}, Ngày kết thúc hiện tại: {KeHoachDen}.'''
-            # }
-            # message += f'''Dự án {MaDuAn} có công việc {MoTaCongViec}: Có ngày làm việc rơi vào Thứ 7 hoặc Chủ nhật. Vui lòng điều chỉnh lại ngày bắt đầu & kết thúc. Ngày bắt đầu hiện tại: {KeHoachTu}, Ngày kết thúc hiện tại: {KeHoachDen}.\n'''
-            message.append(f'''Dự án {MaDuAn} có công việc {MoTaCongViec}: Có ngày làm việc rơi vào Thứ 7 hoặc Chủ nhật. Vui lòng điều chỉnh lại ngày bắt đầu & kết thúc. Ngày bắt đầu hiện tại: {KeHoachTu}, Ngày kết thúc hiện tại: {KeHoachDen}.''')
-        QTY = round(float(row[Header[8]])/working_days, 2) if working_days > 0 else 0
-        NoiLamViec = row[Header[7]] if row[Header[7]] else "Không có nơi làm việc"
-        # if QTY > 8:
-        #     return {
-        #         "status": "error",
-        #         "message": f'''Dự án {MaDuAn} có công việc {MoTaCongViec}: QTY ({QTY}) giờ > 8 giờ. Vui lòng điều chỉnh lại ngày bắt đầu và kết thúc. Ngày bắt đầu hiện tại: {KeHoachTu}, Ngày kết thúc hiện tại: {KeHoachDen}.'''
-        #     }
-        # if QTY <= 0:
-        #     return {
-        #         "status": "error",
-        #         "message": f'''Dự án {MaDuAn} có công việc {MoTaCongViec}: QTY ({QTY}) giờ <= 0 giờ. Vui lòng điều chỉnh lại ngày bắt đầu và kết thúc. Ngày bắt đầu hiện tại: {KeHoachTu}, Ngày kết thúc hiện tại: {KeHoachDen}.'''
-        #     }
-        #     message += f'''Dự án {MaDuAn} có công việc {MoTaCongViec}: QTY ({QTY}) giờ <= 0 giờ. Vui lòng điều chỉnh lại ngày bắt đầu và kết thúc. Ngày bắt đầu hiện tại: {KeHoachTu}, Ngày kết thúc hiện tại: {KeHoachDen}.\n'''
-        #     message.append(f'''Dự án {MaDuAn} có công việc {MoTaCongViec}: QTY ({QTY}) giờ <= 0 giờ. Vui lòng điều chỉnh lại ngày bắt đầu và kết thúc. Ngày bắt đầu hiện tại: {KeHoachTu}, Ngày kết thúc hiện tại: {KeHoachDen}.''')
-        
-        task = {
-            "Mô tả công việc": MoTaCongViec,
-            "Kế hoạch - Từ": KeHoachTu,
-            "Kế hoạch - Đến": KeHoachDen,
-            "QTY": QTY,
-            "Nơi làm việc": NoiLamViec
-        }
+    start = _plan_dates(df.iloc[:, 5])
+    end = _plan_dates(df.iloc[:, 6])
+    if (start > end).any():
+        raise ValueError("start_date must be before end_date")
+    # Số ngày làm việc (trừ Thứ 7, Chủ nhật và ngày lễ) của tất cả công việc, tính một lần
+    working_days = count_working_days(start.values, end.values)
 
-        for name in members:
-            name = name.strip()
-            if not name or name.lower() == "none":
-                continue
-            if name not in result:
-                result[name] = {}
-            if MaDuAn not in result[name]:
-                result[name][MaDuAn] = []
-            result[name][MaDuAn].append(task)
+    description = df.iloc[:, 1]
+    MoTaCongViec = description.where(description.notna() & (description != ""), "Không có mô tả công việc")
+    KeHoachTu = start.dt.strftime("%Y-%m-%d")
+    KeHoachDen = end.dt.strftime("%Y-%m-%d")
+    place = df.iloc[:, 7]
+    NoiLamViec = place.where(place.notna() & (place != ""), "Không có nơi làm việc")
+    hours = pd.to_numeric(df.iloc[:, 8], errors="coerce").to_numpy(dtype=float)
+    valid = working_days > 0
+    QTY = np.zeros(len(df))
+    np.divide(hours, working_days, out=QTY, where=valid)
 
-    if message:
+    errors = form_task_errors(MaDuAn, excel_rows, MoTaCongViec, KeHoachTu, KeHoachDen, working_days, hours)
+    if errors:
         return {
             "status": "error",
-            "message": message
+            "message": [error["message"] for error in errors]
+        }
+
+    tasks = [
+        {
+            "Mô tả công việc": MoTa,
+            "Kế hoạch - Từ": Tu,
+            "Kế hoạch - Đến": Den,
+            "QTY": round(qty, 2) if days > 0 else 0,
+            "Nơi làm việc": Noi
         }
+        for MoTa, Tu, Den, qty, days, Noi in zip(MoTaCongViec, KeHoachTu, KeHoachDen, QTY.tolist(), working_days, NoiLamViec)
+    ]
+
+    # Tách danh sách nhân sự "A, B, C" thành từng dòng (nhân sự, chỉ số công việc)
+    members = df.iloc[:, 3].astype(str).str.split(",").explode().str.strip()
+    members = members[(members != "") & (members.str.lower() != "none")]
 
     output_json = []
-    for name, projects in result.items():
-        if not name.strip():
-            continue
+    for name, task_idx in members.groupby(members, sort=False).indices.items():
         output_json.append({
             "Tên nhân sự": name,
             "Dự án": [
                 {
-                    "Mã dự án": code,
-                    "Thông tin": tasks
-                } for code, tasks in projects.items()
+                    "Mã dự án": MaDuAn,
+                    "Thông tin": [tasks[i] for i in members.index[task_idx]]
+                }
             ]
         })
-    # print(output_json)
     return output_json
+
+def validate_form(file_path: BytesIO) -> dict:
+    """
+    Hàm kiểm tra nhanh một form TimeTracker mà không parse toàn bộ: với mỗi sheet form (read_form_sheet)
+    chỉ đọc ô mã dự án và các cột A -> I (STT, mô tả, nhân sự, ngày kế hoạch, số giờ). Áp dụng cùng các quy tắc với
+    processing_json, nhưng báo lỗi theo từng dòng thay vì dừng ở lỗi đầu tiên.
+    Trả về dict status ("valid" / "invalid"), sheets (các sheet form), skipped_sheets (các sheet bị bỏ qua),
+    tasks (số công việc có nhân sự) và errors (list lỗi gồm sheet, row, column, code, message).
+    """
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheets = [(name, read_form_sheet(workbook[name], FORM_VALIDATE_COLUMNS)) for name in workbook.sheetnames]
+    finally:
+        workbook.close()
+    skipped = [name for name, sheet in sheets if sheet is None]
+    sheets = [(name, sheet) for name, sheet in sheets if sheet is not None]
+
+    errors, tasks = [], 0
+    if not sheets:
+        errors.append({"sheet": None, "row": None, "column": None, "code": "no_form_sheet", "message": "Không tìm thấy sheet nào có header form TimeTracker (STT, mô tả, nhân sự, kế hoạch Từ / Đến và mã dự án). Vui lòng dùng đúng form mẫu."})
+    for name, (MaDuAn, project_cell, _, _, data, first_data_row) in sheets:
+        sheet_errors, sheet_tasks = validate_form_rows(MaDuAn, project_cell, data, first_data_row)
+        errors.extend({"sheet": name, **error} for error in sheet_errors)
+        tasks += sheet_tasks
+    return {
+        "status": "invalid" if errors else "valid",
+        "sheets": [name for name, _ in sheets],
+        "skipped_sheets": skipped,
+        "tasks": tasks,
+        "errors": errors
+    }
+
+def validate_form_rows(MaDuAn, project_cell: Optional[tuple], data: List[tuple], first_data_row: int):
+    """
+    Hàm kiểm tra các dòng dữ liệu của một sheet form (validate_form).
+    Trả về (list lỗi gồm row, column, code, message theo thứ tự dòng, số công việc có nhân sự).
+    """
+    errors = []
+    if MaDuAn is None or str(MaDuAn).strip() == "":
+        row, column = project_cell if project_cell is not None else (None, None)
+        errors.append({
+            "row": row,
+            "column": get_column_letter(column) if column is not None else None,
+            "code": "missing_project",
+            "message": MISSING_PROJECT_MESSAGE
+        })
+
+    df = pd.DataFrame(data, columns=range(FORM_VALIDATE_COLUMNS)) if data else pd.DataFrame(columns=range(FORM_VALIDATE_COLUMNS))
+    df = df[df[0].notna()]
+    df = df[:-1]
+    df = df[df[3].notna()]
+    excel_rows = df.index.to_numpy() + first_data_row
+    description = df[1].where(df[1].notna() & (df[1] != ""), "Không có mô tả công việc")
+
+    # Ô ngày không phải ngày: báo lỗi theo dòng, các dòng còn lại vẫn được kiểm tra tiếp
+    is_date = {
+        column: df[column].map(lambda value: isinstance(value, datetime) and not pd.isna(value)).to_numpy(dtype=bool)
+        for column in (5, 6)
+    }
+    for column, letter, label in ((5, "F", "bắt đầu"), (6, "G", "kết thúc")):
+        for row, MoTa, value in zip(excel_rows[~is_date[column]], description[~is_date[column]], df[column][~is_date[column]]):
+            errors.append({
+                "row": int(row),
+                "column": letter,
+                "code": "invalid_date",
+                "message": f"Dự án {MaDuAn} có công việc {MoTa}: Ngày {label} không hợp lệ ({value}). Vui lòng kiểm tra lại."
+            })
+    dated = is_date[5] & is_date[6]
+    start = pd.to_datetime(df[5][dated])
+    end = pd.to_datetime(df[6][dated])
+    order = (start > end).to_numpy()
+    for row, MoTa in zip(excel_rows[dated][order], description[dated][order]):
+        errors.append({
+            "row": int(row),
+            "column": "F:G",
+            "code": "date_order",
+            "message": f"Dự án {MaDuAn} có công việc {MoTa}: Ngày bắt đầu sau ngày kết thúc. Vui lòng kiểm tra lại."
+        })
+    checked = ~order
+    hours = pd.to_numeric(df[8][dated][checked], errors="coerce").to_numpy(dtype=float)
+    errors.extend(form_task_errors(
+        MaDuAn,
+        excel_rows[dated][checked],
+        description[dated][checked],
+        start[checked].dt.strftime("%Y-%m-%d"),
+        end[checked].dt.strftime("%Y-%m-%d"),
+        count_working_days(start[checked].values, end[checked].values),
+        hours
+    ))
+    errors.sort(key=lambda error: error["row"] or 0)
+    return errors, int(len(df))
+
+def validation_error(code: str, message: str, status: str = "error") -> dict:
+    """
+    Hàm tạo kết quả kiểm tra (cùng các trường với validate_form) cho file không kiểm tra được.
+    """
+    return {
+        "status": status,
+        "sheets": [],
+        "skipped_sheets": [],
+        "tasks": 0,
+        "errors": [{"sheet": None, "row": None, "column": None, "code": code, "message": message}]
+    }
+
+def validate_form_bytes(data: bytes) -> dict:
+    """
+    Hàm kiểm tra nội dung file form (dạng bytes) bằng validate_form, dùng để chạy trong process con.
+    Kết quả có thêm elapsed_ms (thời gian kiểm tra); file không mở được thì trả về status "error".
+    """
+    started = time.monotonic()
+    try:
+        result = validate_form(BytesIO(data))
+    except HolidayCoverageError as e:
+        result = validation_error("holiday_calendar", str(e), status="invalid")
+    except Exception as e:
+        result = validation_error("unreadable", f"Không đọc được file: {e}")
+    result["elapsed_ms"] = round((time.monotonic() - started) * 1000, 3)
+    return result
+
+def fetch_validation(minio_client: Minio, bucket_name: str, object_name: str):
+    """
+    Hàm lấy một file form để kiểm tra: nếu ETag hiện tại đã có kết quả trong cache kiểm tra (get_validation_cache)
+    thì trả kết quả đó, ngược lại tải nội dung file về.
+    Trả về (kết quả đã cache kèm elapsed_ms hoặc None, nội dung file hoặc None, khoá cache).
+    """
+    started = time.monotonic()
+    validation_cache = get_validation_cache()
+    etag = minio_client.stat_object(bucket_name, object_name).etag
+    key = (bucket_name, object_name, etag, POD_FORM_PARSER_VERSION, holiday_fingerprint())
+    result = validation_cache.get(key)
+    if result is not None:
+        return {**result, "elapsed_ms": round((time.monotonic() - started) * 1000, 3)}, None, key
+    data, etag = download_object(minio_client, bucket_name, object_name)
+    return None, data, (bucket_name, object_name, etag, POD_FORM_PARSER_VERSION, holiday_fingerprint())
+
+def validate_files(minio_client: Minio, bucket_name: str, path_files: List[str], max_workers: Optional[int] = None) -> List[dict]:
+    """
+    Hàm kiểm tra nhiều file form: tải bằng nhiều luồng, kiểm tra bằng pool process parse (file nào tải xong
+    được kiểm tra ngay). File có ETag đã được kiểm tra trước đó lấy lại kết quả từ cache kiểm tra, không tải lại.
+    Trả về list kết quả validate_form_bytes của từng file theo thứ tự path_files, kèm path_file và cached
+    (kết quả lấy từ cache hay không); mọi kết quả có cùng các trường, elapsed_ms là thời gian xử lý file đó.
+    """
+    validation_cache = get_validation_cache()
+    parse_executor = get_parse_executor()
+    downloader = ThreadPoolExecutor(max_workers=max_workers or POD_MERGE_WORKERS)
+    futures = {}
+    started = time.monotonic()
+    try:
+        fetch_futures = {
+            downloader.submit(fetch_validation, minio_client, bucket_name, file_path): index
+            for index, file_path in enumerate(path_files)
+        }
+        results = [None] * len(path_files)
+        keys = {}
+        for future in as_completed(fetch_futures):
+            index = fetch_futures[future]
+            if future.exception() is not None:
+                results[index] = {
+                    **validation_error("not_found", f"Không tải được file: {future.exception()}"),
+                    "elapsed_ms": round((time.monotonic() - started) * 1000, 3),
+                    "cached": False
+                }
+                continue
+            result, data, keys[index] = future.result()
+            if result is not None:
+                results[index] = {**result, "cached": True}
+            else:
+                futures[index] = parse_executor.submit(validate_form_bytes, data)
+        for index, future in futures.items():
+            result = future.result()
+            if result["status"] != "error":
+                validation_cache.put(keys[index], {key: value for key, value in result.items() if key != "elapsed_ms"})
+            results[index] = {**result, "cached": False}
+        return [{"path_file": file_path, **result} for file_path, result in zip(path_files, results)]
+    except BrokenProcessPool:
+        reset_parse_executor(parse_executor)
+        raise
+    finally:
+        downloader.shutdown(wait=False, cancel_futures=True)
+        for future in futures.values():
+            future.cancel()
+
+def POD_TimeTracker_Validate_function(minio_client: Minio, input: BaseModel, MINIO_BUCKET: str):
+    """
+    Hàm kiểm tra các file form trước khi merge, trả về lỗi theo từng dòng của từng file.
+    Tham số:
+    - minio_client: Đối tượng Minio để tương tác với MinIO.
+    - input: Đối tượng chứa path_files (đường dẫn file trong bucket).
+    - MINIO_BUCKET: Tên bucket.
+    Trả về:
+    - dict: status, valid (mọi file đều hợp lệ), files (kết quả từng file: path_file, status, sheets, skipped_sheets,
+      tasks, errors, elapsed_ms, cached).
+    """
+    path_files = [
+        path_file.split(f"{MINIO_BUCKET}/")[-1] if f"{MINIO_BUCKET}/" in path_file else path_file
+        for path_file in input.path_files
+    ]
+    if not path_files:
+        return {"status": "error", "message": "No files provided in path_files."}
+    files = validate_files(minio_client, MINIO_BUCKET, path_files)
+    return {
+        "status": "success",
+        "valid": all(item["status"] == "valid" for item in files),
+        "files": files
+    }
+
+def download_object(minio_client: Minio, bucket_name: str, object_name: str):
+    """
+    Hàm tải toàn bộ nội dung một object từ MinIO và trả kết nối về pool.
+    Trả về (nội dung, ETag của đúng phiên bản đã tải).
+    """
+    response = minio_client.get_object(bucket_name, object_name)
+    try:
+        return response.read(), (response.headers.get("ETag") or "").strip('"')
+    finally:
+        response.close()
+        response.release_conn()
+
+def stat_objects(minio_client: Minio, bucket_name: str, object_names: List[str], max_workers: Optional[int] = None) -> List[str]:
+    """
+    Hàm lấy ETag của nhiều object cùng lúc (stat_object bằng nhiều luồng), theo đúng thứ tự object_names.
+    """
+    if not object_names:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or POD_MERGE_WORKERS) as executor:
+        return [stat.etag for stat in executor.map(lambda name: minio_client.stat_object(bucket_name, name), object_names)]
+
+def merge_result_key(path_files: List[str], input_etags: List[str], summary: Optional[tuple] = None) -> str:
+    """
+    Hàm tính khoá memo của một lần merge từ ETag các file đầu vào (theo thứ tự), file tổng hợp gốc (object, ETag)
+    và phiên bản pipeline. Lịch nghỉ lễ (holiday_fingerprint, cùng lịch mà các pool process dùng để phân bổ giờ)
+    cũng thuộc phiên bản vì nó thay đổi kết quả phân bổ giờ.
+    """
+    version = f"{POD_PIPELINE_VERSION}|{holiday_fingerprint()}"
+    return MergeResultIndex.key(list(zip(path_files, input_etags)), summary, version)
+
+def lookup_merge_result(minio_client: Minio, merge_index: MergeResultIndex, merge_key: str) -> Optional[dict]:
+    """
+    Hàm tra kết quả merge đã memo. Kết quả chỉ được dùng nếu file tổng hợp còn trên MinIO;
+    file đã bị xoá (theo lifecycle của bucket) thì kết quả bị loại khỏi chỉ mục.
+    """
+    memo = merge_index.get(merge_key)
+    if memo is None:
+        return None
+    bucket_name, object_name = memo["output"].split("/", 1)
+    try:
+        minio_client.stat_object(bucket_name, object_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchBucket"):
+            merge_index.discard(merge_key)
+            return None
+        raise
+    return memo
+
+def save_merge_result(merge_index: MergeResultIndex, merge_key: str, output: str, overwork):
+    """
+    Hàm lưu kết quả merge vào chỉ mục memo. Lỗi khi lưu chỉ được ghi log, không làm hỏng lần merge.
+    """
+    try:
+        merge_index.put(merge_key, output, overwork)
+    except Exception as e:
+        print(f"Không lưu được kết quả merge vào chỉ mục: {e}")
+
+def fetch_form(minio_client: Minio, form_cache: ParsedFormCache, bucket_name: str, object_name: str, etag: Optional[str] = None):
+    """
+    Hàm lấy một file form: kiểm tra ETag bằng stat_object (bỏ qua nếu đã biết etag), nếu đã có trong cache
+    thì trả kết quả parse đã lưu, ngược lại tải nội dung file về.
+    Trả về (kết quả parse hoặc None, nội dung file hoặc None, ETag).
+    """
+    if etag is None:
+        etag = minio_client.stat_object(bucket_name, object_name).etag
+    json = form_cache.get(bucket_name, object_name, etag)
+    if json is not None:
+        return json, None, etag
+    data, etag = download_object(minio_client, bucket_name, object_name)
+    return None, data, etag
+
+def parse_form_bytes(data: bytes):
+    """
+    Hàm parse nội dung file form (dạng bytes) bằng processing_json, dùng để chạy trong process con.
+    """
+    return processing_json(BytesIO(data))
+
+def parse_form_sheets_bytes(data: bytes, sheet_names: Optional[List[str]] = None) -> List[tuple]:
+    """
+    Hàm parse một nhóm sheet của file form (dạng bytes) bằng read_form_sheets, dùng để chạy trong process con.
+    """
+    return read_form_sheets(BytesIO(data), sheet_names)
+
+def submit_form_parse(executor: ProcessPoolExecutor, data: bytes) -> list:
+    """
+    Hàm đưa việc parse một file form vào pool process parse. Workbook nhiều sheet được chia thành tối đa
+    POD_MERGE_WORKERS nhóm sheet liên tiếp, mỗi nhóm một tác vụ, để các sheet được parse song song.
+    Trả về list future theo thứ tự sheet, lấy kết quả bằng collect_form_parse.
+    """
+    sheet_names = workbook_sheet_names(data)
+    groups = min(len(sheet_names), POD_MERGE_WORKERS)
+    if groups <= 1:
+        return [executor.submit(parse_form_sheets_bytes, data)]
+    size = -(-len(sheet_names) // groups)
+    return [
+        executor.submit(parse_form_sheets_bytes, data, sheet_names[start:start + size])
+        for start in range(0, len(sheet_names), size)
+    ]
+
+def collect_form_parse(futures: list):
+    """
+    Hàm chờ các tác vụ của submit_form_parse và gộp kết quả các sheet (combine_form_sheets).
+    Lỗi của tác vụ được raise như khi parse cả file.
+    """
+    return combine_form_sheets([result for future in futures for result in future.result()])
+
+_parse_executor = None
+
+def get_parse_executor() -> ProcessPoolExecutor:
+    """
+    Trả về pool process dùng chung để parse file (khởi tạo ở lần gọi đầu tiên).
+    Dùng forkserver để process con không kế thừa các luồng/kết nối của API.
+    """
+    global _parse_executor
+    if _parse_executor is None:
+        mp_context = multiprocessing.get_context("forkserver")
+        # Forkserver import sẵn module này (pandas, openpyxl) một lần, process con khởi động nhanh hơn
+        mp_context.set_forkserver_preload([__name__])
+        # Process con dùng đúng lịch nghỉ lễ của process này (không tự đọc lại POD_HOLIDAYS / POD_HOLIDAYS_FILE)
+        _parse_executor = ProcessPoolExecutor(
+            max_workers=POD_MERGE_WORKERS,
+            mp_context=mp_context,
+            initializer=init_business_calendar,
+            initargs=(get_business_calendar_holidays(),)
+        )
+    return _parse_executor
+
+def shutdown_parse_executor():
+    global _parse_executor
+    if _parse_executor is not None:
+        _parse_executor.shutdown(wait=False, cancel_futures=True)
+        _parse_executor = None
+
+def reset_parse_executor(executor: ProcessPoolExecutor):
+    global _parse_executor
+    if _parse_executor is executor:
+        _parse_executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def fetch_and_parse_files(minio_client: Minio, path_files: List[str], max_workers: Optional[int] = None, etags: Optional[List[str]] = None):
+    """
+    Hàm tải (bằng nhiều luồng) và parse (bằng nhiều process) các file form trong path_files.
+    File nào tải xong sẽ được đưa sang parse ngay, nên thời gian chờ mạng và thời gian parse chồng lên nhau.
+    File có ETag chưa đổi so với lần parse trước được lấy thẳng từ cache, không tải và parse lại.
+    Tham số:
+    - minio_client: Đối tượng Minio để tương tác với MinIO.
+    - path_files: Danh sách đường dẫn file trong bucket "estec".
+    - max_workers: Số luồng tải file đồng thời, mặc định là POD_MERGE_WORKERS.
+    - etags: ETag của từng file nếu đã stat trước đó (vd. để tính khoá memo), tránh stat lại.
+    Trả về (results, cache_info):
+    - results là list kết quả processing_json của từng file theo đúng thứ tự path_files,
+      hoặc dict lỗi của file đầu tiên (theo thứ tự path_files) không hợp lệ.
+    - cache_info là dict số file lấy từ cache (hits) và số file phải parse (misses).
+    Lỗi khi tải hoặc parse được raise theo thứ tự path_files.
+    """
+    form_cache = get_parsed_form_cache()
+    parse_executor = get_parse_executor()
+    downloader = ThreadPoolExecutor(max_workers=max_workers or POD_MERGE_WORKERS)
+    parse_futures = {}
+    known_etags = etags
+    etags = {}
+    cache_info = {"hits": 0, "misses": 0}
+    try:
+        fetch_futures = {
+            downloader.submit(fetch_form, minio_client, form_cache, "estec", file_path, known_etags[index] if known_etags else None): index
+            for index, file_path in enumerate(path_files)
+        }
+        for future in as_completed(fetch_futures):
+            index = fetch_futures[future]
+            if future.exception() is not None:
+                parse_futures[index] = future
+                continue
+            json, data, etags[index] = future.result()
+            if json is not None:
+                cache_info["hits"] += 1
+                parse_futures[index] = future
+            else:
+                cache_info["misses"] += 1
+                parse_futures[index] = submit_form_parse(parse_executor, data)
+
+        results = []
+        for index in range(len(path_files)):
+            future = parse_futures[index]
+            json = collect_form_parse(future) if isinstance(future, list) else future.result()[0]
+            if isinstance(json, dict) and json.get("status") == "error":
+                return json, cache_info
+            results.append(json)
+        return results, cache_info
+    except BrokenProcessPool:
+        # Process parse bị kill giữa chừng: bỏ pool hỏng, lần merge sau (hoặc lần chạy lại của job) tạo pool mới
+        reset_parse_executor(parse_executor)
+        raise
+    finally:
+        downloader.shutdown(wait=False, cancel_futures=True)
+        for index, futures in parse_futures.items():
+            if not isinstance(futures, list):
+                continue
+            # Lưu mọi kết quả parse hợp lệ đã xong, kể cả khi merge dừng sớm vì một file khác lỗi
+            if all(future.done() and not future.cancelled() and future.exception() is None for future in futures):
+                json = collect_form_parse(futures)
+                if not (isinstance(json, dict) and json.get("status") == "error"):
+                    form_cache.put("estec", path_files[index], etags[index], json)
+            else:
+                for future in futures:
+                    future.cancel()
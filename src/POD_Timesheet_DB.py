@@ -0,0 +1,314 @@
+import os
+import time
+from io import BytesIO
+from datetime import date
+from typing import List, Optional
+from src.POD_Calendar import get_holiday_years
+
+# Ghi các ô ngày của mỗi lần merge vào bảng "TimesheetEntry" trên PostgreSQL (0 = tắt)
+POD_TIMESHEET_DB = os.getenv("POD_TIMESHEET_DB", "1").lower() in ("1", "true", "yes")
+# Số dòng tối đa trả về của một truy vấn số giờ / số ngày quá giờ
+POD_HOURS_QUERY_LIMIT = int(os.getenv("POD_HOURS_QUERY_LIMIT", "10000"))
+# Số năm được phép nằm ngoài các năm lịch nghỉ lễ phủ khi nạp timesheet (mỗi năm là một partition của "TimesheetEntry")
+POD_TIMESHEET_YEAR_MARGIN = int(os.getenv("POD_TIMESHEET_YEAR_MARGIN", "1"))
+
+# Các cách nhóm của truy vấn số giờ: tên tham số -> biểu thức SQL
+HOURS_GROUP_COLUMNS = {
+    "employee": '"employee"',
+    "project": '"project"',
+    "task": '"task"',
+    "date": '"work_date"',
+    "month": 'to_char("work_date", \'YYYY-MM\')',
+    "source_file": '"source_file"',
+}
+TIMESHEET_COPY_COLUMNS = ["source_file", "employee", "project", "task", "work_date", "hours"]
+
+def timesheet_partition_name(year: int) -> str:
+    return f"TimesheetEntry_{year}"
+
+class TimesheetYearRangeError(ValueError):
+    """
+    Ngày kế hoạch nằm ngoài khoảng năm được phép nạp vào "TimesheetEntry" (timesheet_year_window).
+    """
+
+def timesheet_year_window() -> tuple:
+    """
+    Hàm trả về khoảng năm (năm đầu, năm cuối) được phép nạp vào "TimesheetEntry": các năm lịch nghỉ lễ phủ
+    (get_holiday_years), nới thêm POD_TIMESHEET_YEAR_MARGIN năm mỗi phía.
+    Lịch không phủ năm nào thì lấy năm hiện tại làm mốc.
+    """
+    years = get_holiday_years() or {date.today().year}
+    return min(years) - POD_TIMESHEET_YEAR_MARGIN, max(years) + POD_TIMESHEET_YEAR_MARGIN
+
+def ensure_timesheet_partitions(cursor, first_day: date, last_day: date):
+    """
+    Hàm tạo (nếu chưa có) các partition theo năm của bảng "TimesheetEntry" cho khoảng ngày [first_day, last_day].
+    Khoảng ngày vượt ra ngoài timesheet_year_window (thường do gõ nhầm năm, vd. 2205) bị từ chối
+    bằng TimesheetYearRangeError trước khi tạo partition nào, để một lỗi nhập liệu không tạo hàng trăm partition.
+    Việc tạo partition được khoá chung để nhiều lần nạp đồng thời không tạo trùng.
+    """
+    year_min, year_max = timesheet_year_window()
+    if first_day.year < year_min or last_day.year > year_max:
+        raise TimesheetYearRangeError(
+            f"Ngày kế hoạch từ {first_day.isoformat()} đến {last_day.isoformat()} nằm ngoài các năm {year_min} - {year_max} "
+            f"được phép nạp vào timesheet. Vui lòng kiểm tra lại năm của ngày kế hoạch."
+        )
+    for year in range(first_day.year, last_day.year + 1):
+        name = timesheet_partition_name(year)
+        cursor.execute("SELECT to_regclass(%s)", (f'"{name}"',))
+        if cursor.fetchone()[0] is not None:
+            continue
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('TimesheetEntry'))")
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "TimesheetEntry" FOR VALUES FROM (%s) TO (%s)',
+            (date(year, 1, 1), date(year + 1, 1, 1))
+        )
+
+def apply_daily_hours(cursor, sources: List[str], sign: int):
+    """
+    Hàm cộng (sign = 1) hoặc trừ (sign = -1) phần đóng góp của các file form trong "TimesheetEntry"
+    vào bảng tổng số giờ theo (nhân sự, ngày) "EmployeeDailyHours".
+    Đóng góp của mỗi file được làm tròn như nhau khi cộng và khi trừ, nên bảng không bị lệch sau nhiều lần nạp lại.
+    """
+    query = """
+        INSERT INTO "EmployeeDailyHours" ("employee", "work_date", "hours", "entries")
+        SELECT "employee", "work_date", %s * SUM("hours"), %s * SUM("entries")
+        FROM (
+            SELECT "employee", "work_date", ROUND(SUM("hours")::numeric, 4) AS "hours", COUNT(*) AS "entries"
+            FROM "TimesheetEntry"
+            WHERE "source_file" = ANY(%s) AND "employee" IS NOT NULL
+            GROUP BY "source_file", "employee", "work_date"
+        ) AS "delta"
+        GROUP BY "employee", "work_date"
+        ON CONFLICT ("employee", "work_date") DO UPDATE SET
+            "hours" = "EmployeeDailyHours"."hours" + EXCLUDED."hours",
+            "entries" = "EmployeeDailyHours"."entries" + EXCLUDED."entries"
+        """
+    cursor.execute(query, (sign, sign, list(sources)))
+
+def pending_timesheet_sources(conn, sources: List[str], etags: List[str]) -> List[int]:
+    """
+    Hàm trả về chỉ số (theo thứ tự sources) các file form chưa được nạp vào "TimesheetEntry"
+    hoặc đã được nạp từ một phiên bản (ETag) khác.
+    """
+    cursor = conn.cursor()
+    try:
+        query = """
+            SELECT "source_file", "source_etag" FROM "TimesheetSource"
+            WHERE "source_file" = ANY(%s)
+            """
+        cursor.execute(query, (list(sources),))
+        loaded = dict(cursor.fetchall())
+        conn.commit()
+    finally:
+        cursor.close()
+    return [index for index, source in enumerate(sources) if loaded.get(source) != etags[index]]
+
+def load_timesheet_entries(conn, summary_file: str, sources: List[str], etags: List[str], copy: dict) -> int:
+    """
+    Hàm nạp các ô ngày của các file form vào bảng "TimesheetEntry" bằng một lệnh COPY FROM STDIN,
+    thay cho các ô đã nạp trước đó của cùng file (mỗi file form chỉ giữ phiên bản mới nhất).
+    Bảng "EmployeeDailyHours" được cập nhật trong cùng transaction: trừ phần của phiên bản cũ, cộng phần của phiên bản mới.
+    Tham số:
+    - summary_file: Đường dẫn file tổng hợp của lần merge, ghi lại trong "TimesheetSource".
+    - sources, etags: Đường dẫn và ETag của các file form cần nạp.
+    - copy: Kết quả timesheet_copy_data của các file này (dữ liệu CSV, số dòng mỗi file, ngày nhỏ nhất / lớn nhất).
+    Trả về số dòng đã nạp.
+    """
+    cursor = conn.cursor()
+    try:
+        # Khoá theo từng file (theo thứ tự cố định để không deadlock): hai lần merge cùng file được nạp lần lượt
+        for source in sorted(set(sources)):
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (f"TimesheetSource:{source}",))
+        if copy["first_day"] is not None:
+            ensure_timesheet_partitions(cursor, copy["first_day"], copy["last_day"])
+        # Bảng tổng theo ngày được cập nhật lần lượt (một khoá chung) để các lần nạp đồng thời không deadlock
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext('EmployeeDailyHours'))")
+        apply_daily_hours(cursor, sources, -1)
+        cursor.execute('DELETE FROM "TimesheetEntry" WHERE "source_file" = ANY(%s)', (list(sources),))
+        columns = ", ".join(f'"{column}"' for column in TIMESHEET_COPY_COLUMNS)
+        cursor.copy_expert(f'COPY "TimesheetEntry" ({columns}) FROM STDIN WITH (FORMAT csv)', BytesIO(copy["data"]))
+        apply_daily_hours(cursor, sources, 1)
+        cursor.execute('DELETE FROM "EmployeeDailyHours" WHERE "entries" <= 0')
+        query = """
+            INSERT INTO "TimesheetSource" ("source_file", "source_etag", "summary_file", "row_count", "loaded_at")
+            VALUES (%s, %s, %s, %s, NOW())
+            ON CONFLICT ("source_file") DO UPDATE SET
+                "source_etag" = EXCLUDED."source_etag", "summary_file" = EXCLUDED."summary_file",
+                "row_count" = EXCLUDED."row_count", "loaded_at" = EXCLUDED."loaded_at"
+            """
+        cursor.executemany(query, [
+            (source, etag, summary_file, int(rows))
+            for source, etag, rows in zip(sources, etags, copy["rows"])
+        ])
+        conn.commit()
+    finally:
+        cursor.close()
+    return int(sum(copy["rows"]))
+
+def query_timesheet_hours(conn, group_by: List[str], employees: Optional[List[str]] = None, projects: Optional[List[str]] = None,
+                          date_from: Optional[date] = None, date_to: Optional[date] = None, limit: int = POD_HOURS_QUERY_LIMIT) -> List[dict]:
+    """
+    Hàm tính tổng số giờ trong "TimesheetEntry" theo bộ lọc (nhân sự, dự án, khoảng ngày) và nhóm theo group_by
+    (các khoá của HOURS_GROUP_COLUMNS; rỗng = một dòng tổng). Lọc theo ngày chỉ đọc các partition của khoảng ngày đó.
+    Trả về list dict gồm các cột nhóm, "hours" (tổng số giờ) và "days" (số ngày có giờ).
+    """
+    conditions, params = [], []
+    if employees:
+        conditions.append('"employee" = ANY(%s)')
+        params.append(list(employees))
+    if projects:
+        conditions.append('"project" = ANY(%s)')
+        params.append(list(projects))
+    if date_from is not None:
+        conditions.append('"work_date" >= %s')
+        params.append(date_from)
+    if date_to is not None:
+        conditions.append('"work_date" <= %s')
+        params.append(date_to)
+    select = [f"{HOURS_GROUP_COLUMNS[key]} AS \"{key}\"" for key in group_by]
+    query = f"""
+        SELECT {", ".join(select + ['SUM("hours") AS "hours"', 'COUNT(DISTINCT "work_date") AS "days"'])}
+        FROM "TimesheetEntry"
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        {"GROUP BY " + ", ".join(HOURS_GROUP_COLUMNS[key] for key in group_by) if group_by else ""}
+        {"ORDER BY " + ", ".join(HOURS_GROUP_COLUMNS[key] for key in group_by) if group_by else ""}
+        LIMIT %s
+        """
+    params.append(limit)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        conn.commit()
+    finally:
+        cursor.close()
+    columns = group_by + ["hours", "days"]
+    return [
+        {column: value.isoformat() if isinstance(value, date) else value for column, value in zip(columns, row)}
+        for row in rows
+    ]
+
+def POD_TimeTracker_Hours_function(conn, input):
+    """
+    Hàm xử lý truy vấn số giờ từ bảng "TimesheetEntry".
+    Tham số:
+    - conn: Kết nối PostgreSQL.
+    - input: Đối tượng chứa employees, projects, date_from, date_to, group_by và limit.
+    Trả về:
+    - dict: status, rows (kết quả query_timesheet_hours), total_hours, truncated (đã cắt bớt theo limit) và elapsed_ms.
+    Nếu tham số không hợp lệ, trả về dict chứa status là "error" và message mô tả lỗi.
+    """
+    group_by = list(dict.fromkeys(input.group_by or []))
+    unknown = [key for key in group_by if key not in HOURS_GROUP_COLUMNS]
+    if unknown:
+        return {
+            "status": "error",
+            "message": f"Không hỗ trợ nhóm theo {', '.join(unknown)}. Chỉ hỗ trợ: {', '.join(HOURS_GROUP_COLUMNS)}."
+        }
+    if input.date_from is not None and input.date_to is not None and input.date_from > input.date_to:
+        return {
+            "status": "error",
+            "message": "date_from phải nhỏ hơn hoặc bằng date_to."
+        }
+    limit = min(input.limit or POD_HOURS_QUERY_LIMIT, POD_HOURS_QUERY_LIMIT)
+    started = time.monotonic()
+    rows = query_timesheet_hours(conn, group_by, input.employees, input.projects, input.date_from, input.date_to, limit + 1)
+    elapsed = time.monotonic() - started
+    return {
+        "status": "success",
+        "group_by": group_by,
+        "rows": rows[:limit],
+        "total_hours": float(sum(row["hours"] or 0 for row in rows[:limit])),
+        "truncated": len(rows) > limit,
+        "elapsed_ms": round(elapsed * 1000, 3)
+    }
+
+def query_overwork(conn, threshold: float, employees: Optional[List[str]] = None, date_from: Optional[date] = None,
+                   date_to: Optional[date] = None, limit: int = POD_HOURS_QUERY_LIMIT) -> List[dict]:
+    """
+    Hàm tìm các ngày nhân sự làm quá threshold giờ (cộng mọi dự án) từ bảng "EmployeeDailyHours",
+    kèm số giờ của từng dự án trong ngày đó (từ "TimesheetEntry"). Tối đa limit ngày, theo thứ tự nhân sự rồi ngày.
+    Trả về list dict cùng dạng với check_overwork: employee, overwork (date_val, hours, projects).
+    """
+    conditions, params = ['"hours" > %s'], [threshold]
+    entry_conditions, entry_params = [], []
+    if employees:
+        conditions.append('"employee" = ANY(%s)')
+        params.append(list(employees))
+    if date_from is not None:
+        conditions.append('"work_date" >= %s')
+        params.append(date_from)
+        entry_conditions.append('AND "entry"."work_date" >= %s')
+        entry_params.append(date_from)
+    if date_to is not None:
+        conditions.append('"work_date" <= %s')
+        params.append(date_to)
+        entry_conditions.append('AND "entry"."work_date" <= %s')
+        entry_params.append(date_to)
+    # Lặp lại điều kiện ngày trên "TimesheetEntry" để chỉ đọc các partition của khoảng ngày
+    query = f"""
+        WITH "over" AS (
+            SELECT "employee", "work_date", "hours" FROM "EmployeeDailyHours"
+            WHERE {" AND ".join(conditions)}
+            ORDER BY "employee", "work_date"
+            LIMIT %s
+        )
+        SELECT "over"."employee", "over"."work_date", "over"."hours", "entry"."project", SUM("entry"."hours")
+        FROM "over"
+        JOIN "TimesheetEntry" AS "entry"
+            ON "entry"."employee" = "over"."employee" AND "entry"."work_date" = "over"."work_date" {" ".join(entry_conditions)}
+        GROUP BY "over"."employee", "over"."work_date", "over"."hours", "entry"."project"
+        ORDER BY "over"."employee", "over"."work_date", "entry"."project"
+        """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params + [limit] + entry_params)
+        rows = cursor.fetchall()
+        conn.commit()
+    finally:
+        cursor.close()
+
+    output = []
+    for employee, day, total, project, hours in rows:
+        if not output or output[-1]["employee"] != employee:
+            output.append({"employee": employee, "overwork": []})
+        days = output[-1]["overwork"]
+        if not days or days[-1]["date_val"] != day.isoformat():
+            days.append({"date_val": day.isoformat(), "hours": float(total), "projects": []})
+        days[-1]["projects"].append({"project": project, "hours": round(float(hours), 4)})
+    return output
+
+def POD_TimeTracker_Overwork_function(conn, input):
+    """
+    Hàm xử lý truy vấn các ngày làm quá giờ của nhân sự từ PostgreSQL (không đọc file xlsx).
+    Tham số:
+    - conn: Kết nối PostgreSQL.
+    - input: Đối tượng chứa employees, date_from, date_to, threshold và limit.
+    Trả về:
+    - dict: status, overwork (kết quả query_overwork), days (số ngày quá giờ), truncated và elapsed_ms.
+    Nếu tham số không hợp lệ, trả về dict chứa status là "error" và message mô tả lỗi.
+    """
+    if input.date_from is not None and input.date_to is not None and input.date_from > input.date_to:
+        return {
+            "status": "error",
+            "message": "date_from phải nhỏ hơn hoặc bằng date_to."
+        }
+    limit = min(input.limit or POD_HOURS_QUERY_LIMIT, POD_HOURS_QUERY_LIMIT)
+    started = time.monotonic()
+    overwork = query_overwork(conn, input.threshold, input.employees, input.date_from, input.date_to, limit + 1)
+    elapsed = time.monotonic() - started
+    days = sum(len(item["overwork"]) for item in overwork)
+    if days > limit:
+        last = overwork[-1]
+        last["overwork"].pop()
+        if not last["overwork"]:
+            overwork.pop()
+    return {
+        "status": "success",
+        "threshold": input.threshold,
+        "overwork": overwork,
+        "days": min(days, limit),
+        "truncated": days > limit,
+        "elapsed_ms": round(elapsed * 1000, 3)
+    }
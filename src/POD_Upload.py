@@ -0,0 +1,376 @@
+import os
+import uuid
+import asyncio
+import zipfile
+from io import BytesIO
+from datetime import datetime, timedelta
+from typing import List, Optional
+from fastapi import UploadFile
+from minio import Minio
+from minio.commonconfig import CopySource
+from minio.error import S3Error
+from starlette.concurrency import run_in_threadpool
+from src.POD_TimeTracker import XLSX_CONTENT_TYPE, submit_form_parse, collect_form_parse, get_parse_executor
+from src.POD_Cache import get_parsed_form_cache
+
+# Thư mục chứa file form đầu vào trong bucket
+POD_INPUT_PREFIX = "data/POD/TimeTracker/Input/"
+# Thư mục tạm cho file upload bằng URL presigned: mỗi lần presign có một thư mục con riêng,
+# file chỉ được chép sang Input sau khi kiểm tra ở complete_uploads
+POD_STAGING_PREFIX = "data/POD/TimeTracker/Staging/"
+# Giới hạn upload: dung lượng mỗi file, tổng dung lượng một request, số file upload đồng thời và kích thước part multipart
+POD_UPLOAD_MAX_FILE_BYTES = int(os.getenv("POD_UPLOAD_MAX_FILE_BYTES", str(20 * 1024 * 1024)))
+POD_UPLOAD_MAX_REQUEST_BYTES = int(os.getenv("POD_UPLOAD_MAX_REQUEST_BYTES", str(200 * 1024 * 1024)))
+POD_UPLOAD_CONCURRENCY = int(os.getenv("POD_UPLOAD_CONCURRENCY", "4"))
+POD_UPLOAD_PART_SIZE = max(int(os.getenv("POD_UPLOAD_PART_SIZE", str(8 * 1024 * 1024))), 5 * 1024 * 1024)
+# Số file tối đa trong một file zip upload
+POD_UPLOAD_MAX_ZIP_ENTRIES = int(os.getenv("POD_UPLOAD_MAX_ZIP_ENTRIES", "200"))
+# Thời hạn (giây) của URL presigned PUT cho client upload thẳng lên MinIO
+POD_UPLOAD_PRESIGN_EXPIRES = int(os.getenv("POD_UPLOAD_PRESIGN_EXPIRES", "900"))
+
+ALLOWED_UPLOAD_EXTENSIONS = (".xlsx", ".xlsm")
+# Trình duyệt / client khác nhau gửi content-type khác nhau cho file xlsx, nội dung thật được kiểm tra bằng magic bytes
+ALLOWED_UPLOAD_CONTENT_TYPES = {
+    XLSX_CONTENT_TYPE,
+    "application/vnd.ms-excel.sheet.macroenabled.12",
+    "application/octet-stream",
+    "application/zip",
+    "application/x-zip-compressed",
+    "",
+}
+# File xlsx là file zip
+ZIP_MAGIC = b"PK\x03\x04"
+
+def upload_filename(filename: Optional[str]) -> str:
+    """
+    Hàm chỉ giữ phần tên file (bỏ mọi thư mục, kể cả dạng Windows) để client không ghi được ra ngoài thư mục Input.
+    """
+    return os.path.basename((filename or "").replace("\\", "/"))
+
+def input_object_name(filename: str) -> str:
+    """
+    Hàm trả về tên object của file form trong thư mục Input.
+    """
+    return f"{POD_INPUT_PREFIX}{upload_filename(filename)}"
+
+def validate_upload(filename: Optional[str], content_type: Optional[str], size: Optional[int], head: Optional[bytes] = None) -> Optional[str]:
+    """
+    Hàm kiểm tra một file form trước khi lưu: tên file, phần mở rộng, content-type, dung lượng và magic bytes (nếu có head).
+    Trả về thông báo lỗi, hoặc None nếu file hợp lệ.
+    """
+    name = upload_filename(filename)
+    if not name:
+        return "File không có tên."
+    if not name.lower().endswith(ALLOWED_UPLOAD_EXTENSIONS):
+        return f"{name}: chỉ chấp nhận file {', '.join(ALLOWED_UPLOAD_EXTENSIONS)}."
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type not in ALLOWED_UPLOAD_CONTENT_TYPES:
+        return f"{name}: content-type {content_type} không phải file Excel."
+    if size is not None and size > POD_UPLOAD_MAX_FILE_BYTES:
+        return f"{name}: dung lượng {size} bytes vượt quá giới hạn {POD_UPLOAD_MAX_FILE_BYTES} bytes."
+    if size == 0:
+        return f"{name}: file rỗng."
+    if head is not None and not head.startswith(ZIP_MAGIC):
+        return f"{name}: nội dung không phải file Excel (xlsx)."
+    return None
+
+def upload_size(file: UploadFile) -> int:
+    """
+    Hàm trả về dung lượng file upload (Starlette đã ghi file vào bộ đệm tạm khi nhận request).
+    """
+    if file.size is not None:
+        return file.size
+    position = file.file.tell()
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(position)
+    return size
+
+def read_head(file: UploadFile, length: int = 4) -> bytes:
+    file.file.seek(0)
+    head = file.file.read(length)
+    file.file.seek(0)
+    return head
+
+def validate_uploads(files: List[UploadFile]) -> List[str]:
+    """
+    Hàm kiểm tra toàn bộ file của một request upload (từng file và tổng dung lượng).
+    Trả về danh sách lỗi (rỗng nếu tất cả hợp lệ).
+    """
+    errors = []
+    total = 0
+    for file in files:
+        size = upload_size(file)
+        total += size
+        error = validate_upload(file.filename, file.content_type, size, read_head(file))
+        if error:
+            errors.append(error)
+    if total > POD_UPLOAD_MAX_REQUEST_BYTES:
+        errors.append(f"Tổng dung lượng {total} bytes vượt quá giới hạn {POD_UPLOAD_MAX_REQUEST_BYTES} bytes cho một lần upload.")
+    return errors
+
+def put_upload(minio_client: Minio, bucket_name: str, object_name: str, file: UploadFile, size: int):
+    """
+    Hàm upload một file lên MinIO bằng cách đọc dần từ bộ đệm của Starlette (file lớn hơn part_size được upload multipart).
+    Hàm chạy đồng bộ, được gọi trong threadpool để không chặn event loop.
+    """
+    file.file.seek(0)
+    minio_client.put_object(
+        bucket_name,
+        object_name,
+        file.file,
+        length=size,
+        content_type=XLSX_CONTENT_TYPE,
+        part_size=POD_UPLOAD_PART_SIZE
+    )
+
+async def upload_files(minio_client: Minio, bucket_name: str, files: List[UploadFile]) -> dict:
+    """
+    Hàm kiểm tra rồi upload các file form vào thư mục Input, tối đa POD_UPLOAD_CONCURRENCY file cùng lúc.
+    Nếu có file không hợp lệ thì không file nào được lưu.
+    Trả về dict status / path_files (theo thứ tự files) hoặc status / message (danh sách lỗi).
+    """
+    errors = validate_uploads(files)
+    if errors:
+        return {
+            "status": "error",
+            "message": errors
+        }
+
+    semaphore = asyncio.Semaphore(POD_UPLOAD_CONCURRENCY)
+    async def upload_one(file: UploadFile) -> str:
+        object_name = input_object_name(file.filename)
+        async with semaphore:
+            await run_in_threadpool(put_upload, minio_client, bucket_name, object_name, file, upload_size(file))
+        return object_name
+
+    uploaded_paths = await asyncio.gather(*(upload_one(file) for file in files))
+    return {
+        "status": "success",
+        "path_files": list(uploaded_paths)
+    }
+
+def staging_object_name(filename: str) -> str:
+    """
+    Hàm trả về tên object tạm (không trùng giữa các lần presign) cho một file upload bằng URL presigned.
+    """
+    return f"{POD_STAGING_PREFIX}{uuid.uuid4().hex}/{upload_filename(filename)}"
+
+def is_staging_object(path_file: str) -> bool:
+    """
+    Hàm kiểm tra path_file có đúng dạng object tạm do staging_object_name tạo ra hay không.
+    """
+    if not path_file.startswith(POD_STAGING_PREFIX):
+        return False
+    token, _, filename = path_file[len(POD_STAGING_PREFIX):].partition("/")
+    return len(token) == 32 and all(c in "0123456789abcdef" for c in token) and filename != "" and filename == upload_filename(filename)
+
+def presign_uploads(minio_client: Minio, bucket_name: str, filenames: List[str]) -> dict:
+    """
+    Hàm tạo URL presigned PUT để client upload file form thẳng lên MinIO (dữ liệu file không đi qua API).
+    Mỗi file được upload vào một object tạm riêng (staging_object_name), không ghi đè file trong Input.
+    Tên file được kiểm tra trước (tên, phần mở rộng); dung lượng và nội dung được kiểm tra ở complete_uploads.
+    Trả về dict status / uploads (mỗi phần tử gồm filename, path_file (object tạm), method, url) / expires_at,
+    hoặc status / message (danh sách lỗi) nếu có tên file không hợp lệ.
+    """
+    errors = [error for error in (validate_upload(filename, None, None) for filename in filenames) if error]
+    if not filenames:
+        errors.append("Chưa có file nào để upload.")
+    if errors:
+        return {
+            "status": "error",
+            "message": errors
+        }
+
+    expires = timedelta(seconds=POD_UPLOAD_PRESIGN_EXPIRES)
+    expires_at = (datetime.now() + expires).isoformat(timespec="seconds")
+    uploads = []
+    for filename in filenames:
+        object_name = staging_object_name(filename)
+        uploads.append({
+            "filename": upload_filename(filename),
+            "path_file": object_name,
+            "method": "PUT",
+            "url": minio_client.presigned_put_object(bucket_name, object_name, expires=expires)
+        })
+    return {
+        "status": "success",
+        "uploads": uploads,
+        "expires_at": expires_at
+    }
+
+def read_object_head(minio_client: Minio, bucket_name: str, object_name: str, length: int = 4) -> bytes:
+    response = minio_client.get_object(bucket_name, object_name, offset=0, length=length)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+def verify_upload(minio_client: Minio, bucket_name: str, path_file: str) -> Optional[str]:
+    """
+    Hàm kiểm tra một file client đã upload bằng URL presigned: là object tạm của presign_uploads, đã tồn tại
+    (stat_object), dung lượng trong giới hạn và nội dung là file xlsx (magic bytes).
+    Object tạm không hợp lệ bị xoá (key chỉ thuộc về lần presign đó); file trong Input không bị động tới.
+    Trả về thông báo lỗi, hoặc None nếu file hợp lệ.
+    """
+    if not is_staging_object(path_file):
+        return f"{path_file}: không phải file upload bằng URL presigned (thư mục {POD_STAGING_PREFIX})."
+    try:
+        stat = minio_client.stat_object(bucket_name, path_file)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            return f"{path_file}: chưa được upload."
+        raise
+    head = read_object_head(minio_client, bucket_name, path_file) if stat.size else b""
+    error = validate_upload(path_file, None, stat.size, head)
+    if error:
+        minio_client.remove_object(bucket_name, path_file)
+    return error
+
+def complete_uploads(minio_client: Minio, bucket_name: str, path_files: List[str]) -> dict:
+    """
+    Hàm xác nhận các file đã upload bằng presign_uploads trước khi dùng cho POD_TimeTracker_Merge:
+    kiểm tra từng object tạm (verify_upload), nếu tất cả hợp lệ thì chép sang thư mục Input rồi xoá object tạm.
+    Nếu có file không hợp lệ thì không file nào được chép vào Input.
+    Trả về dict status / path_files (đường dẫn trong Input, theo thứ tự path_files),
+    hoặc status / message (danh sách lỗi) nếu có file chưa upload hoặc không hợp lệ.
+    """
+    errors = [error for error in (verify_upload(minio_client, bucket_name, path_file) for path_file in path_files) if error]
+    if not path_files:
+        errors.append("Chưa có file nào để xác nhận.")
+    if errors:
+        return {
+            "status": "error",
+            "message": errors
+        }
+    input_paths = []
+    for path_file in path_files:
+        object_name = input_object_name(path_file)
+        minio_client.copy_object(bucket_name, object_name, CopySource(bucket_name, path_file))
+        minio_client.remove_object(bucket_name, path_file)
+        input_paths.append(object_name)
+    return {
+        "status": "success",
+        "path_files": input_paths
+    }
+
+def zip_form_entries(archive: zipfile.ZipFile) -> List[zipfile.ZipInfo]:
+    """
+    Hàm trả về các file trong zip cần upload, bỏ qua thư mục và file hệ thống (__MACOSX, file ẩn).
+    """
+    return [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith("__MACOSX/")
+        and not upload_filename(info.filename).startswith(".")
+    ]
+
+def validate_zip_entries(archive: zipfile.ZipFile, entries: List[zipfile.ZipInfo]) -> List[str]:
+    """
+    Hàm kiểm tra các file trong zip trước khi giải nén (tên, dung lượng sau giải nén, magic bytes, trùng tên,
+    tổng dung lượng và số file). Trả về danh sách lỗi (rỗng nếu tất cả hợp lệ).
+    """
+    errors = []
+    if not entries:
+        errors.append("File zip không có file form nào.")
+    if len(entries) > POD_UPLOAD_MAX_ZIP_ENTRIES:
+        errors.append(f"File zip có {len(entries)} file, vượt quá giới hạn {POD_UPLOAD_MAX_ZIP_ENTRIES} file.")
+        return errors
+    names = set()
+    total = 0
+    for info in entries:
+        name = upload_filename(info.filename)
+        total += info.file_size
+        if name in names:
+            errors.append(f"{info.filename}: trùng tên với một file khác trong zip.")
+            continue
+        names.add(name)
+        error = validate_upload(info.filename, None, info.file_size)
+        if error is None:
+            with archive.open(info) as entry:
+                error = validate_upload(info.filename, None, info.file_size, entry.read(len(ZIP_MAGIC)))
+        if error:
+            errors.append(error)
+    if total > POD_UPLOAD_MAX_REQUEST_BYTES:
+        errors.append(f"Tổng dung lượng sau giải nén {total} bytes vượt quá giới hạn {POD_UPLOAD_MAX_REQUEST_BYTES} bytes.")
+    return errors
+
+def ingest_zip(minio_client: Minio, bucket_name: str, file: UploadFile, parse: bool = False) -> dict:
+    """
+    Hàm nhận một file zip chứa các file form, giải nén dần từng file thẳng lên thư mục Input của MinIO.
+    Nếu có file không hợp lệ thì không file nào được lưu.
+    Tham số:
+    - file: File zip (Starlette đã ghi vào bộ đệm tạm, đọc được theo vị trí).
+    - parse: True thì parse từng file ngay khi giải nén xong (song song với việc giải nén các file sau)
+      và lưu kết quả vào cache parse, để lần merge tiếp theo không phải tải và parse lại.
+    Trả về dict status / path_files (theo thứ tự trong zip) / parsed (nếu parse, kết quả parse từng file),
+    hoặc status / message (danh sách lỗi).
+    """
+    size = upload_size(file)
+    if size > POD_UPLOAD_MAX_REQUEST_BYTES:
+        return {
+            "status": "error",
+            "message": [f"{upload_filename(file.filename)}: dung lượng {size} bytes vượt quá giới hạn {POD_UPLOAD_MAX_REQUEST_BYTES} bytes."]
+        }
+    file.file.seek(0)
+    try:
+        archive = zipfile.ZipFile(file.file)
+    except zipfile.BadZipFile:
+        return {
+            "status": "error",
+            "message": [f"{upload_filename(file.filename)}: không phải file zip hợp lệ."]
+        }
+
+    with archive:
+        entries = zip_form_entries(archive)
+        errors = validate_zip_entries(archive, entries)
+        if errors:
+            return {
+                "status": "error",
+                "message": errors
+            }
+
+        path_files = []
+        parse_futures = []
+        for info in entries:
+            object_name = input_object_name(info.filename)
+            with archive.open(info) as entry:
+                if parse:
+                    # File cần parse được giữ trong bộ nhớ (tối đa POD_UPLOAD_MAX_FILE_BYTES) để không phải tải lại từ MinIO
+                    data = entry.read()
+                    result = minio_client.put_object(bucket_name, object_name, BytesIO(data), length=len(data),
+                                                     content_type=XLSX_CONTENT_TYPE, part_size=POD_UPLOAD_PART_SIZE)
+                    parse_futures.append((object_name, result.etag, submit_form_parse(get_parse_executor(), data)))
+                else:
+                    minio_client.put_object(bucket_name, object_name, entry, length=info.file_size,
+                                            content_type=XLSX_CONTENT_TYPE, part_size=POD_UPLOAD_PART_SIZE)
+            path_files.append(object_name)
+
+    response = {
+        "status": "success",
+        "path_files": path_files
+    }
+    if parse:
+        response["parsed"] = collect_parsed_forms(bucket_name, parse_futures)
+    return response
+
+def collect_parsed_forms(bucket_name: str, parse_futures: list) -> List[dict]:
+    """
+    Hàm chờ kết quả parse các file vừa giải nén, lưu kết quả hợp lệ vào cache parse (theo ETag lúc upload).
+    Trả về kết quả parse từng file: path_file, status, message (nếu lỗi).
+    """
+    form_cache = get_parsed_form_cache()
+    parsed = []
+    for object_name, etag, futures in parse_futures:
+        try:
+            json = collect_form_parse(futures)
+        except Exception as e:
+            parsed.append({"path_file": object_name, "status": "error", "message": [str(e)]})
+            continue
+        if isinstance(json, dict) and json.get("status") == "error":
+            parsed.append({"path_file": object_name, "status": "error", "message": json["message"]})
+            continue
+        form_cache.put(bucket_name, object_name, etag, json)
+        parsed.append({"path_file": object_name, "status": "success"})
+    return parsed
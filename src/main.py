@@ -1,17 +1,23 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Form, Header
 from pydantic import BaseModel, Field
 from minio import Minio
 import pandas as pd
 from io import BytesIO
 from dotenv import load_dotenv
 import os
+import json
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, date
 from src.POD_TimeTracker import *
+from src.POD_Upload import *
+from src.POD_Jobs import *
+from src.POD_Timesheet_DB import *
+from src.Executors import *
 from src.Authentication import *
 from src.DB_Connection import *
 import uuid
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 # Tải biến môi trường từ file .env
 load_dotenv()
@@ -57,78 +63,333 @@ postgres_db = {
     "password": POSTGRES_PASSWORD
 }
 
+@app.on_event("startup")
+def startup_api():
+    if POD_JOB_WORKERS > 0:
+        start_job_workers(run_POD_TimeTracker_Merge_job)
+
+@app.on_event("shutdown")
+def shutdown_api():
+    stop_job_workers()
+    shutdown_merge_executor()
+    shutdown_fast_lane()
+    close_postgres_pool()
+    shutdown_parse_executor()
+
+@app.get("/DB_Pool_Stats", tags=["System"])
+def DB_Pool_Stats_api():
+    try:
+        return {
+            "status": "success",
+            "pool": get_postgres_pool().stats()
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+@app.get("/POD_Job_Stats", tags=["System"])
+def POD_Job_Stats_api():
+    try:
+        with get_postgres_pool().connection() as conn:
+            queue = job_queue_stats(conn)
+        workers = get_job_workers()
+        return {
+            "status": "success",
+            "queue": queue,
+            "workers": workers.stats() if workers is not None else None,
+            "merge_executor": get_merge_executor().stats() if get_merge_executor() is not None else None,
+            "fast_lane": get_fast_lane().stats()
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+@app.get("/POD_Cache_Stats", tags=["System"])
+def POD_Cache_Stats_api():
+    try:
+        return {
+            "status": "success",
+            "cache": get_parsed_form_cache().stats(),
+            "merge_index": get_merge_result_index().stats(),
+            "workbooks": get_workbook_cache().stats(),
+            "payloads": get_payload_cache().stats(),
+            "presigned_urls": get_presign_cache().stats(),
+            "validations": get_validation_cache().stats()
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
 ### POD ###
 ## TimeTracker
 class POD_TimeTracker_Merge(BaseModel):
     request_id: str = Field(default="evisor-1234567890", example="evisor-1234567890")
     user_id: str = Field(default="hoanvlh", example="hoanvlh")
+    session_id: Optional[str] = Field(default=None, example="v1.eyJ1aWQiOiJob2FudmxoIn0.signature")
     start_time: datetime = Field(example="2025-06-23T15:20:00")
     path_files: List[str] = Field(example=["data/POD/TimeTracker/Input/Form mau 1.xlsx", "data/POD/TimeTracker/Input/Form mau 2.xlsx"])
     summary_file: Optional[str] = Field(default=None, example="data/POD/TimeTracker/Output/ES_20250704_104529.xlsx")
+    force: bool = Field(default=False, example=False)
 
 @app.post("/POD_TimeTracker_Merge", tags=["POD"])
 def POD_TimeTracker_Merge_api(input: POD_TimeTracker_Merge):
     try:
-        conn = get_postgres_connection(POSTGRESQL_SERVER, POSTGRES_PORT_EXTERNAL, POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD)
-        session = check_session(conn, input.user_id)
+        session = validate_session(input.user_id, input.session_id)
         if not session:
             return {
                 "status": "error", 
                 "message": "Phiên làm việc đã hết hạn hoặc không hợp lệ. Vui lòng đăng nhập lại."
                 }
         else:
-            if input.summary_file is None:
-                return POD_TimeTracker_Merge_function(minio_client, input)
-            else:
-                return POD_TimeTracker_Merge_Manual_function(minio_client, input)
+            payload = json.loads(input.json(exclude={"session_id"}))
+            with get_postgres_pool().connection() as conn:
+                job = enqueue_job(conn, input.user_id, input.request_id, payload)
+            workers = get_job_workers()
+            if workers is not None:
+                workers.wake()
+            return {
+                "status": "success",
+                "request_id": input.request_id,
+                "user_id": input.user_id,
+                **job
+            }
+    except JobRejected as e:
+        return JSONResponse(
+            status_code=429,
+            content={
+                "status": "error",
+                "message": str(e),
+                "retry_after": e.retry_after
+            },
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         return {
             "status": "error", 
             "message": str(e)
             }
 
-@app.post("/POD_TimeTracker_Upload", tags=["POD"])
-async def POD_TimeTracker_Upload_api(files: List[UploadFile] = File(...)):
+def run_POD_TimeTracker_Merge_job(payload: dict, progress) -> dict:
+    """
+    Hàm xử lý một job merge trong hàng đợi (chạy trên luồng worker của POD_Jobs).
+    """
+    input = POD_TimeTracker_Merge(**payload)
+    if input.summary_file is None:
+        return POD_TimeTracker_Merge_function(minio_client, input, progress)
+    else:
+        return POD_TimeTracker_Merge_Manual_function(minio_client, input, progress)
+
+class POD_TimeTracker_Validate(BaseModel):
+    request_id: str = Field(default="evisor-1234567890", example="evisor-1234567890")
+    user_id: str = Field(default="hoanvlh", example="hoanvlh")
+    session_id: Optional[str] = Field(default=None, example="v1.eyJ1aWQiOiJob2FudmxoIn0.signature")
+    path_files: List[str] = Field(example=["data/POD/TimeTracker/Input/Form mau 1.xlsx", "data/POD/TimeTracker/Input/Form mau 2.xlsx"])
+
+@app.post("/POD_TimeTracker_Validate", tags=["POD"])
+def POD_TimeTracker_Validate_api(input: POD_TimeTracker_Validate):
+    try:
+        session = validate_session(input.user_id, input.session_id)
+        if not session:
+            return {
+                "status": "error", 
+                "message": "Phiên làm việc đã hết hạn hoặc không hợp lệ. Vui lòng đăng nhập lại."
+                }
+        else:
+            return POD_TimeTracker_Validate_function(minio_client, input, MINIO_BUCKET)
+    except Exception as e:
+        return {
+            "status": "error", 
+            "message": str(e)
+            }
+
+class POD_TimeTracker_Job(BaseModel):
+    request_id: str = Field(default="evisor-1234567890", example="evisor-1234567890")
+    user_id: str = Field(default="hoanvlh", example="hoanvlh")
+    session_id: Optional[str] = Field(default=None, example="v1.eyJ1aWQiOiJob2FudmxoIn0.signature")
+    job_id: str = Field(example="3f1c2a9e-8d4b-4a57-9c1e-2b7f5d6e8a90")
+
+@app.post("/POD_TimeTracker_Job", tags=["POD"])
+@fast_lane
+def POD_TimeTracker_Job_api(input: POD_TimeTracker_Job):
     try:
-        uploaded_paths = []
-        for file in files:
-            object_name = f"data/POD/TimeTracker/Input/{file.filename}"
-            content = await file.read()
-            minio_client.put_object(
-                MINIO_BUCKET,
-                object_name,
-                BytesIO(content),
-                length=len(content),
-                content_type=file.content_type
-            )
-            uploaded_paths.append(object_name)
+        session = validate_session(input.user_id, input.session_id)
+        if not session:
+            return {
+                "status": "error", 
+                "message": "Phiên làm việc đã hết hạn hoặc không hợp lệ. Vui lòng đăng nhập lại."
+                }
+        with get_postgres_pool().connection() as conn:
+            job = get_job(conn, input.job_id, input.user_id)
+        if job is None:
+            return {
+                "status": "error",
+                "message": f"Không tìm thấy job {input.job_id}."
+            }
         return {
             "status": "success",
-            "path_files": uploaded_paths
+            **job
         }
+    except Exception as e:
+        return {
+            "status": "error", 
+            "message": str(e)
+            }
+
+class POD_TimeTracker_Hours(BaseModel):
+    request_id: str = Field(default="evisor-1234567890", example="evisor-1234567890")
+    user_id: str = Field(default="hoanvlh", example="hoanvlh")
+    session_id: Optional[str] = Field(default=None, example="v1.eyJ1aWQiOiJob2FudmxoIn0.signature")
+    employees: Optional[List[str]] = Field(default=None, example=["Lê Hoàng Phúc"])
+    projects: Optional[List[str]] = Field(default=None, example=["ES-2025-001"])
+    date_from: Optional[date] = Field(default=None, example="2025-03-01")
+    date_to: Optional[date] = Field(default=None, example="2025-03-31")
+    group_by: List[str] = Field(default=["employee"], example=["employee", "month"])
+    limit: Optional[int] = Field(default=None, ge=1, example=1000)
+
+@app.post("/POD_TimeTracker_Hours", tags=["POD"])
+@fast_lane
+def POD_TimeTracker_Hours_api(input: POD_TimeTracker_Hours):
+    try:
+        session = validate_session(input.user_id, input.session_id)
+        if not session:
+            return {
+                "status": "error", 
+                "message": "Phiên làm việc đã hết hạn hoặc không hợp lệ. Vui lòng đăng nhập lại."
+                }
+        with get_postgres_pool().connection() as conn:
+            return POD_TimeTracker_Hours_function(conn, input)
+    except Exception as e:
+        return {
+            "status": "error", 
+            "message": str(e)
+            }
+
+class POD_TimeTracker_Overwork(BaseModel):
+    request_id: str = Field(default="evisor-1234567890", example="evisor-1234567890")
+    user_id: str = Field(default="hoanvlh", example="hoanvlh")
+    session_id: Optional[str] = Field(default=None, example="v1.eyJ1aWQiOiJob2FudmxoIn0.signature")
+    employees: Optional[List[str]] = Field(default=None, example=["Lê Hoàng Phúc"])
+    date_from: Optional[date] = Field(default=None, example="2025-03-01")
+    date_to: Optional[date] = Field(default=None, example="2025-03-31")
+    threshold: float = Field(default=8, ge=0, example=8)
+    limit: Optional[int] = Field(default=None, ge=1, example=1000)
+
+@app.post("/POD_TimeTracker_Overwork", tags=["POD"])
+@fast_lane
+def POD_TimeTracker_Overwork_api(input: POD_TimeTracker_Overwork):
+    try:
+        session = validate_session(input.user_id, input.session_id)
+        if not session:
+            return {
+                "status": "error", 
+                "message": "Phiên làm việc đã hết hạn hoặc không hợp lệ. Vui lòng đăng nhập lại."
+                }
+        with get_postgres_pool().connection() as conn:
+            return POD_TimeTracker_Overwork_function(conn, input)
+    except Exception as e:
+        return {
+            "status": "error", 
+            "message": str(e)
+            }
+
+@app.post("/POD_TimeTracker_Upload", tags=["POD"])
+async def POD_TimeTracker_Upload_api(files: List[UploadFile] = File(...)):
+    try:
+        return await upload_files(minio_client, MINIO_BUCKET, files)
     except Exception as e:
         return {
             "status": "error",
             "message": str(e)
         }
     
+@app.post("/POD_TimeTracker_Upload_Zip", tags=["POD"])
+def POD_TimeTracker_Upload_Zip_api(file: UploadFile = File(...), parse: bool = Form(default=False)):
+    try:
+        return ingest_zip(minio_client, MINIO_BUCKET, file, parse)
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+class POD_TimeTracker_Upload_Presign(BaseModel):
+    request_id: str = Field(default="evisor-1234567890", example="evisor-1234567890")
+    user_id: str = Field(default="hoanvlh", example="hoanvlh")
+    session_id: Optional[str] = Field(default=None, example="v1.eyJ1aWQiOiJob2FudmxoIn0.signature")
+    filenames: List[str] = Field(example=["Form mau 1.xlsx", "Form mau 2.xlsx"])
+
+@app.post("/POD_TimeTracker_Upload_Presign", tags=["POD"])
+@fast_lane
+def POD_TimeTracker_Upload_Presign_api(input: POD_TimeTracker_Upload_Presign):
+    try:
+        session = validate_session(input.user_id, input.session_id)
+        if not session:
+            return {
+                "status": "error", 
+                "message": "Phiên làm việc đã hết hạn hoặc không hợp lệ. Vui lòng đăng nhập lại."
+                }
+        else:
+            return presign_uploads(minio_client, MINIO_BUCKET, input.filenames)
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
+class POD_TimeTracker_Upload_Complete(BaseModel):
+    request_id: str = Field(default="evisor-1234567890", example="evisor-1234567890")
+    user_id: str = Field(default="hoanvlh", example="hoanvlh")
+    session_id: Optional[str] = Field(default=None, example="v1.eyJ1aWQiOiJob2FudmxoIn0.signature")
+    path_files: List[str] = Field(example=["data/POD/TimeTracker/Staging/0f8c2d6e4b7a4f1e9d3c5b2a1e0f9d8c/Form mau 1.xlsx"])
+
+@app.post("/POD_TimeTracker_Upload_Complete", tags=["POD"])
+@fast_lane
+def POD_TimeTracker_Upload_Complete_api(input: POD_TimeTracker_Upload_Complete):
+    try:
+        session = validate_session(input.user_id, input.session_id)
+        if not session:
+            return {
+                "status": "error", 
+                "message": "Phiên làm việc đã hết hạn hoặc không hợp lệ. Vui lòng đăng nhập lại."
+                }
+        else:
+            return complete_uploads(minio_client, MINIO_BUCKET, input.path_files)
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+
 class POD_TimeTracker_Getfile(BaseModel):
     request_id: str = Field(default="evisor-1234567890", example="evisor-1234567890")
     user_id: str = Field(default="hoanvlh", example="hoanvlh")
+    session_id: Optional[str] = Field(default=None, example="v1.eyJ1aWQiOiJob2FudmxoIn0.signature")
     path_file: str = Field(default=None, example="data/POD/TimeTracker/Output/ES_20250702_093042.xlsx")
+    offset: int = Field(default=0, ge=0, example=0)
+    limit: Optional[int] = Field(default=None, ge=1, example=500)
+    columns: Optional[List[str]] = Field(default=None, example=["STT", "Tên nhân sự", "Mã dự án", "Mô tả công việc"])
+    date_from: Optional[str] = Field(default=None, example="2025-03-01")
+    date_to: Optional[str] = Field(default=None, example="2025-03-31")
+    employees: Optional[List[str]] = Field(default=None, example=["Lê Hoàng Phúc"])
+    stream: bool = Field(default=False, example=False)
 
 @app.post("/POD_TimeTracker_Getfile", tags=["POD"])
-async def POD_TimeTracker_Getfile_postapi(input: POD_TimeTracker_Getfile):
+def POD_TimeTracker_Getfile_postapi(input: POD_TimeTracker_Getfile, if_none_match: Optional[str] = Header(default=None)):
     try:
-        conn = get_postgres_connection(POSTGRESQL_SERVER, POSTGRES_PORT_EXTERNAL, POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD)
-        session = check_session(conn, input.user_id)
+        session = validate_session(input.user_id, input.session_id)
         if not session:
             return {
                 "status": "error", 
                 "message": "Phiên làm việc đã hết hạn hoặc không hợp lệ. Vui lòng đăng nhập lại."
                 }
         else:
-            return POD_TimeTracker_Getfile_function(minio_client, input, MINIO_BUCKET)
+            return POD_TimeTracker_Getfile_function(minio_client, input, MINIO_BUCKET, if_none_match)
     except Exception as e:
         return {
             "status": "error", 
@@ -138,13 +399,38 @@ async def POD_TimeTracker_Getfile_postapi(input: POD_TimeTracker_Getfile):
 class POD_TimeTracker_Download(BaseModel):
     request_id: str = Field(default="evisor-1234567890", example="evisor-1234567890")
     user_id: str = Field(default="hoanvlh", example="hoanvlh")
+    session_id: Optional[str] = Field(default=None, example="v1.eyJ1aWQiOiJob2FudmxoIn0.signature")
     path_file: str = Field(default=None, example="data/POD/TimeTracker/Output/ES_20250702_093042.xlsx")
 
 @app.post("/POD_TimeTracker_Download", tags=["POD"])
-def POD_TimeTracker_Download_postapi(input: POD_TimeTracker_Download):
+@fast_lane
+def POD_TimeTracker_Download_postapi(input: POD_TimeTracker_Download, if_none_match: Optional[str] = Header(default=None)):
+    try:
+        session = validate_session(input.user_id, input.session_id)
+
+        if not session:
+            return {
+                "status": "error", 
+                "message": "Phiên làm việc đã hết hạn hoặc không hợp lệ. Vui lòng đăng nhập lại."
+                }
+        else:
+            return POD_TimeTracker_Download_function(minio_client, input, MINIO_BUCKET, if_none_match)
+    except Exception as e:
+        return {
+            "status": "error", 
+            "message": str(e)
+            }
+    
+class POD_TimeTracker_Download_Zip(BaseModel):
+    request_id: str = Field(default="evisor-1234567890", example="evisor-1234567890")
+    user_id: str = Field(default="hoanvlh", example="hoanvlh")
+    session_id: Optional[str] = Field(default=None, example="v1.eyJ1aWQiOiJob2FudmxoIn0.signature")
+    path_files: List[str] = Field(example=["data/POD/TimeTracker/Output/ES_20250702_093042.xlsx", "data/POD/TimeTracker/Output/ES_20250704_104529.xlsx"])
+
+@app.post("/POD_TimeTracker_Download_Zip", tags=["POD"])
+def POD_TimeTracker_Download_Zip_postapi(input: POD_TimeTracker_Download_Zip):
     try:
-        conn = get_postgres_connection(POSTGRESQL_SERVER, POSTGRES_PORT_EXTERNAL, POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD)
-        session = check_session(conn, input.user_id)
+        session = validate_session(input.user_id, input.session_id)
 
         if not session:
             return {
@@ -152,7 +438,7 @@ def POD_TimeTracker_Download_postapi(input: POD_TimeTracker_Download):
                 "message": "Phiên làm việc đã hết hạn hoặc không hợp lệ. Vui lòng đăng nhập lại."
                 }
         else:
-            return POD_TimeTracker_Download_function(minio_client, input, MINIO_BUCKET)
+            return POD_TimeTracker_Download_Zip_function(minio_client, input, MINIO_BUCKET)
     except Exception as e:
         return {
             "status": "error", 
@@ -165,11 +451,11 @@ class Authentication(BaseModel):
     password: str = Field(example="Ef27Xw34")
 
 @app.post("/Login", tags=["Authentication"])
+@fast_lane
 def Authentication_api(input: Authentication):
     try:
-        conn = get_postgres_connection(POSTGRESQL_SERVER, POSTGRES_PORT_EXTERNAL, POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD)
-        print(f"Connected to PostgreSQL database: {conn}")
-        return Authentication_function(conn, input)
+        with get_postgres_pool().connection() as conn:
+            return Authentication_function(conn, input)
     except Exception as e:
         return {
             "status": "error", 
@@ -180,11 +466,11 @@ class Authentication_Logout(BaseModel):
     username: str = Field(example="hoanvlh")
 
 @app.post("/Logout", tags=["Authentication"])
+@fast_lane
 def Authentication_Logout_api(input: Authentication_Logout):
     try:
-        conn = get_postgres_connection(POSTGRESQL_SERVER, POSTGRES_PORT_EXTERNAL, POSTGRES_DB, POSTGRES_USER, POSTGRES_PASSWORD)
-        print(f"Connected to PostgreSQL database: {conn}")
-        return Authentication_Logout_function(conn, input)
+        with get_postgres_pool().connection() as conn:
+            return Authentication_Logout_function(conn, input)
     except Exception as e:
         return {
             "status": "error", 
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Các test import module theo dạng "src.X" giống main.py, nên cần thư mục gốc của repo trong sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# src.Authentication từ chối khởi động nếu thiếu SESSION_SECRET
+os.environ.setdefault("SESSION_SECRET", "test-session-secret")
@@ -0,0 +1,63 @@
+import hashlib
+from types import SimpleNamespace
+from urllib.parse import quote, unquote, urlparse
+from minio.error import S3Error
+
+def etag(data: bytes) -> str:
+    return hashlib.md5(data).hexdigest()
+
+class FakeResponse:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.headers = {"ETag": f'"{etag(data)}"'}
+
+    def read(self) -> bytes:
+        return self.data
+
+    def stream(self, amt: int):
+        for start in range(0, len(self.data), amt):
+            yield self.data[start:start + amt]
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+class FakeMinio:
+    """MinIO giả giữ object trong dict, đủ các lệnh dùng cho luồng presign -> PUT -> complete, URL tải file, tải / stat file form và ghi file tổng hợp / sidecar."""
+    def __init__(self):
+        self.objects = {}
+        self.presigned_gets = 0
+
+    def presigned_put_object(self, bucket_name, object_name, expires=None):
+        return f"http://minio.local/{bucket_name}/{quote(object_name)}?X-Amz-Signature=fake"
+
+    def presigned_get_object(self, bucket_name, object_name, expires=None):
+        self.presigned_gets += 1
+        return f"http://minio.local/{bucket_name}/{quote(object_name)}?X-Amz-Signature=fake-{self.presigned_gets}"
+
+    def put(self, url: str, data: bytes):
+        """PUT của client lên URL presigned."""
+        bucket_name, _, object_name = unquote(urlparse(url).path).lstrip("/").partition("/")
+        self.objects[(bucket_name, object_name)] = data
+
+    def put_object(self, bucket_name, object_name, data, length, content_type=None, part_size=0):
+        self.objects[(bucket_name, object_name)] = data.read(length)
+        return SimpleNamespace(etag=etag(self.objects[(bucket_name, object_name)]))
+
+    def stat_object(self, bucket_name, object_name):
+        if (bucket_name, object_name) not in self.objects:
+            raise S3Error(None, "NoSuchKey", "Object does not exist", object_name, "r", "h", bucket_name, object_name)
+        data = self.objects[(bucket_name, object_name)]
+        return SimpleNamespace(size=len(data), etag=etag(data))
+
+    def get_object(self, bucket_name, object_name, offset=0, length=0):
+        data = self.objects[(bucket_name, object_name)]
+        return FakeResponse(data[offset:offset + length] if length else data[offset:])
+
+    def copy_object(self, bucket_name, object_name, source):
+        self.objects[(bucket_name, object_name)] = self.objects[(source.bucket_name, source.object_name)]
+
+    def remove_object(self, bucket_name, object_name):
+        self.objects.pop((bucket_name, object_name), None)
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from src import Authentication
+from src.Authentication import create_session_token, validate_session
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_authentication(**env):
+    environ = {key: value for key, value in os.environ.items() if key not in ("SESSION_SECRET", "EVISOR_DEV_MODE")}
+    return subprocess.run(
+        [sys.executable, "-c", "import src.Authentication"],
+        cwd=REPO_DIR, env={**environ, **env}, capture_output=True, text=True
+    )
+
+def test_missing_secret_refuses_to_start():
+    result = import_authentication()
+    assert result.returncode != 0
+    assert "SESSION_SECRET" in result.stderr
+
+def test_missing_secret_allowed_in_dev_mode():
+    result = import_authentication(EVISOR_DEV_MODE="1")
+    assert result.returncode == 0, result.stderr
+
+class NoDatabase:
+    def connection(self):
+        raise AssertionError("validate_session không được truy vấn DB")
+
+def test_request_without_token_is_rejected_without_db(monkeypatch):
+    monkeypatch.setattr(Authentication, "get_postgres_pool", lambda: NoDatabase())
+    monkeypatch.setattr(Authentication, "SESSION_LEGACY_FALLBACK", False)
+    assert validate_session("hoanvlh") is False
+
+def test_token_is_verified_without_db(monkeypatch):
+    monkeypatch.setattr(Authentication, "get_postgres_pool", lambda: NoDatabase())
+    monkeypatch.setattr(Authentication.session_revocations, "_refresh_if_stale", lambda: None)
+    now = datetime.now()
+    token = create_session_token("hoanvlh", "sid", now, now + timedelta(hours=1))
+    assert validate_session("hoanvlh", token) is True
+    assert validate_session("other", token) is False
+
+def test_legacy_fallback_is_opt_in(monkeypatch):
+    calls = []
+    class Pool:
+        def connection(self):
+            return Connection()
+    class Connection:
+        def __enter__(self):
+            return self
+        def __exit__(self, *args):
+            return False
+    monkeypatch.setattr(Authentication, "get_postgres_pool", lambda: Pool())
+    monkeypatch.setattr(Authentication, "check_session", lambda conn, user_id: calls.append(user_id) or True)
+    monkeypatch.setattr(Authentication, "SESSION_LEGACY_FALLBACK", True)
+    assert validate_session("hoanvlh") is True
+    assert calls == ["hoanvlh"]
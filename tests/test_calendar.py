@@ -0,0 +1,56 @@
+import pytest
+from src import POD_Calendar
+from src.POD_Cache import ParsedFormCache
+from src.POD_Calendar import check_holiday_coverage, count_working_days, HolidayCoverageError
+
+@pytest.fixture(autouse=True)
+def fresh_calendar(monkeypatch):
+    """Mỗi test dựng lại lịch nghỉ lễ từ biến môi trường của test đó."""
+    monkeypatch.delenv("POD_HOLIDAYS", raising=False)
+    monkeypatch.delenv("POD_HOLIDAYS_FILE", raising=False)
+    monkeypatch.setattr(POD_Calendar, "_business_calendar", None)
+    monkeypatch.setattr(POD_Calendar, "_holiday_years", None)
+    monkeypatch.setattr(POD_Calendar, "_warned_years", set())
+    monkeypatch.setattr(POD_Calendar, "POD_HOLIDAYS_STRICT", False)
+
+def test_default_calendar_covers_2025_2026():
+    assert check_holiday_coverage(["2025-01-02"], ["2026-12-31"]) == []
+    # 30/4 và 1/5/2025 là ngày lễ
+    assert count_working_days(["2025-04-28"], ["2025-05-02"]).tolist() == [3]
+
+def test_uncovered_year_warns_once(capsys):
+    assert count_working_days(["2027-01-04"], ["2027-01-08"]).tolist() == [5]
+    assert "2027" in capsys.readouterr().out
+    count_working_days(["2027-02-01"], ["2027-02-05"])
+    assert capsys.readouterr().out == ""
+
+def test_uncovered_year_fails_in_strict_mode(monkeypatch):
+    monkeypatch.setattr(POD_Calendar, "POD_HOLIDAYS_STRICT", True)
+    with pytest.raises(HolidayCoverageError, match="2024"):
+        count_working_days(["2024-12-30"], ["2025-01-03"])
+
+def test_holidays_file_defines_covered_years(monkeypatch, tmp_path):
+    holidays_file = tmp_path / "holidays.txt"
+    holidays_file.write_text("# 2027\n2027-01-01\n", encoding="utf-8")
+    monkeypatch.setenv("POD_HOLIDAYS_FILE", str(holidays_file))
+    assert check_holiday_coverage(["2027-01-01"], ["2027-01-08"]) == []
+    assert check_holiday_coverage(["2025-01-01"], ["2025-01-08"]) == [2025]
+
+def test_fingerprint_follows_loaded_calendar(monkeypatch, tmp_path):
+    holidays_file = tmp_path / "holidays.txt"
+    holidays_file.write_text("2025-01-01\n", encoding="utf-8")
+    monkeypatch.setenv("POD_HOLIDAYS_FILE", str(holidays_file))
+    fingerprint = POD_Calendar.holiday_fingerprint()
+    key = ParsedFormCache._version("etag")
+    # Sửa file khi process đang chạy: lịch đã nạp (và khoá cache) không đổi
+    holidays_file.write_text("2025-01-01\n2025-04-30\n", encoding="utf-8")
+    assert POD_Calendar.holiday_fingerprint() == fingerprint
+    # Khởi động lại (lịch được nạp lại): khoá cache kết quả parse đổi theo
+    monkeypatch.setattr(POD_Calendar, "_business_calendar", None)
+    assert POD_Calendar.holiday_fingerprint() != fingerprint
+    assert ParsedFormCache._version("etag") != key
+
+def test_worker_calendar_matches_parent():
+    POD_Calendar.init_business_calendar(["2025-04-30"])
+    assert POD_Calendar.get_business_calendar_holidays() == ["2025-04-30"]
+    assert count_working_days(["2025-04-28"], ["2025-05-02"]).tolist() == [4]
@@ -0,0 +1,48 @@
+import os
+import psycopg2
+import pytest
+from src.DB_Connection import PostgresPool
+
+@pytest.fixture
+def postgres_pool():
+    try:
+        postgres_pool = PostgresPool(
+            minconn=1,
+            maxconn=3,
+            checkout_timeout=1,
+            host=os.getenv("POSTGRESQL_SERVER"),
+            port=os.getenv("POSTGRES_PORT_EXTERNAL"),
+            database=os.getenv("POSTGRES_DB"),
+            user=os.getenv("POSTGRES_USER"),
+            password=os.getenv("POSTGRES_PASSWORD")
+        )
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL không sẵn sàng: {e}")
+    yield postgres_pool
+    postgres_pool.close()
+
+def counts(postgres_pool: PostgresPool) -> tuple:
+    stats = postgres_pool.stats()
+    return stats["in_use"], stats["idle"], stats["open"]
+
+def test_stats_track_idle_connections(postgres_pool):
+    assert counts(postgres_pool) == (0, 1, 1)
+    with postgres_pool.connection():
+        assert counts(postgres_pool) == (1, 0, 1)
+        with postgres_pool.connection():
+            assert counts(postgres_pool) == (2, 0, 2)
+        # psycopg2 chỉ giữ lại minconn kết nối rảnh, kết nối thứ hai bị đóng khi trả
+        assert counts(postgres_pool) == (1, 1, 2)
+    assert counts(postgres_pool) == (0, 1, 1)
+    assert postgres_pool.stats()["checkouts"] == 2
+
+def test_broken_connection_is_not_idle(postgres_pool):
+    with pytest.raises(psycopg2.OperationalError):
+        with postgres_pool.connection() as conn:
+            conn.close()
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+    assert counts(postgres_pool) == (0, 0, 0)
+    assert postgres_pool.stats()["discarded"] == 1
+    with postgres_pool.connection():
+        assert counts(postgres_pool) == (1, 0, 1)
+    assert counts(postgres_pool) == (0, 1, 1)
@@ -0,0 +1,106 @@
+import uuid
+from datetime import datetime
+from io import BytesIO
+import openpyxl
+from fake_minio import FakeMinio
+from src.POD_TimeTracker import processing_json, validate_form, validate_files, MISSING_PROJECT_MESSAGE
+
+HEADER = ["NO./ STT", "DESCRIPTION/ MÔ TẢ CÔNG VIỆC", "PRIORITY/ MỨC ĐỘ ƯU TIÊN", "ASSIGNEE/ NHÂN SỰ THỰC HIỆN", "SHIFT/ CA", "PLAN/ KẾ HOẠCH", None, "Nơi làm việc", "QTY/ SL"]
+SUB_HEADER = [None, None, None, None, None, "Từ", "Đến", None, None]
+
+def add_form_sheet(workbook, title: str, label: bool = True, project: str = "ES192-5-A2302"):
+    """Thêm một sheet theo bố cục form mẫu: mã dự án ở L2:M2, header ở dòng 7-8, dữ liệu từ dòng 9."""
+    sheet = workbook.create_sheet(title)
+    if label:
+        sheet["L2"] = "Mã dự án:"
+    sheet["M2"] = project
+    sheet.append([])
+    for _ in range(4):
+        sheet.append([])
+    for row in (HEADER, SUB_HEADER):
+        sheet.append(row)
+    sheet.append([1, "Khảo sát", None, "Nguyễn Văn A, Trần Văn B", None, datetime(2025, 3, 3), datetime(2025, 3, 4), "Văn phòng", 16])
+    sheet.append([2, "Lắp đặt", None, "Nguyễn Văn A", None, datetime(2025, 3, 5), datetime(2025, 3, 5), None, 8])
+    sheet.append(["Tổng", None, None, None, None, None, None, None, 24])
+    return sheet
+
+def to_bytes(workbook) -> BytesIO:
+    buffer = BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+def new_workbook():
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    return workbook
+
+def test_non_form_sheets_are_skipped():
+    workbook = new_workbook()
+    guide = workbook.create_sheet("Hướng dẫn")
+    guide.append(["STT", "Bước"])
+    guide.append([1, "Điền mã dự án vào ô M2"])
+    add_form_sheet(workbook, "Tuần 10")
+    result = processing_json(to_bytes(workbook))
+    assert [person["Tên nhân sự"] for person in result] == ["Nguyễn Văn A", "Trần Văn B"]
+    assert result[0]["Dự án"][0]["Mã dự án"] == "ES192-5-A2302"
+    assert [task["QTY"] for task in result[0]["Dự án"][0]["Thông tin"]] == [8, 8]
+
+    report = validate_form(to_bytes(workbook))
+    assert report["status"] == "valid"
+    assert report["sheets"] == ["Tuần 10"]
+    assert report["skipped_sheets"] == ["Hướng dẫn"]
+
+def test_workbook_without_form_sheet():
+    workbook = new_workbook()
+    workbook.create_sheet("Hướng dẫn").append(["STT", "Bước"])
+    result = processing_json(to_bytes(workbook))
+    assert result["status"] == "error"
+    assert "Hướng dẫn" in result["message"][0]
+
+def test_project_code_falls_back_to_m2():
+    workbook = new_workbook()
+    add_form_sheet(workbook, "Tuần 10", label=False, project="ES200-1")
+    result = processing_json(to_bytes(workbook))
+    assert result[0]["Dự án"][0]["Mã dự án"] == "ES200-1"
+
+def test_missing_project_code():
+    workbook = new_workbook()
+    add_form_sheet(workbook, "Tuần 10", project=None)
+    result = processing_json(to_bytes(workbook))
+    assert result == {"status": "error", "message": [MISSING_PROJECT_MESSAGE]}
+
+    report = validate_form(to_bytes(workbook))
+    assert report["status"] == "invalid"
+    assert report["errors"][0]["code"] == "missing_project"
+    assert (report["errors"][0]["row"], report["errors"][0]["column"]) == (2, "M")
+
+def test_cached_validation_has_same_fields():
+    workbook = new_workbook()
+    workbook.create_sheet("Hướng dẫn").append(["STT", "Bước"])
+    add_form_sheet(workbook, "Tuần 10")
+    minio_client = FakeMinio()
+    path_file = f"data/POD/TimeTracker/Input/{uuid.uuid4().hex}.xlsx"
+    minio_client.objects[("estec", path_file)] = to_bytes(workbook).getvalue()
+
+    fresh, = validate_files(minio_client, "estec", [path_file])
+    cached, = validate_files(minio_client, "estec", [path_file])
+    assert (fresh["cached"], cached["cached"]) == (False, True)
+    assert sorted(fresh) == sorted(cached)
+    for field in ("status", "sheets", "skipped_sheets", "tasks", "errors"):
+        assert fresh[field] == cached[field]
+    assert fresh["sheets"] == ["Tuần 10"] and fresh["tasks"] == 2
+
+def test_missing_project_code_without_label():
+    workbook = new_workbook()
+    workbook.create_sheet("Hướng dẫn").append(["STT", "Bước"])
+    add_form_sheet(workbook, "Tuần 10", label=False, project=None)
+    # Sheet có header form nhưng thiếu cả nhãn lẫn ô M2: báo lỗi mã dự án, không bỏ qua sheet
+    result = processing_json(to_bytes(workbook))
+    assert result == {"status": "error", "message": [MISSING_PROJECT_MESSAGE]}
+
+    report = validate_form(to_bytes(workbook))
+    assert report["status"] == "invalid"
+    assert report["sheets"] == ["Tuần 10"]
+    assert report["errors"][0]["code"] == "missing_project"
+    assert (report["errors"][0]["row"], report["errors"][0]["column"]) == (2, "M")
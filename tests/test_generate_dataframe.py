@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+from benchmarks.bench_generate_dataframe import generate_dataframe_rows
+from src import POD_Calendar
+from src.POD_TimeTracker import generate_dataframe
+
+def task(description: str, start: str, end: str, qty: float) -> dict:
+    return {"Mô tả công việc": description, "Kế hoạch - Từ": start, "Kế hoạch - Đến": end, "QTY": qty, "Nơi làm việc": "Văn phòng"}
+
+# Nghỉ lễ 30/4 - 1/5, công việc chồng nhau, công việc một ngày, tuần 5/5 - 11/5 không có công việc nào (cột trống)
+HOLIDAY_AND_GAP = [
+    {"Tên nhân sự": "Nguyễn Văn A", "Dự án": [
+        {"Mã dự án": "ES192-5-A2302", "Thông tin": [
+            task("Khảo sát", "2025-04-28", "2025-05-02", 8),
+            task("Báo cáo", "2025-04-29", "2025-05-04", 2.5)
+        ]},
+        {"Mã dự án": "ES200-1", "Thông tin": [task("Họp", "2025-05-02", "2025-05-02", 4)]}
+    ]},
+    {"Tên nhân sự": "Trần Văn B", "Dự án": [
+        {"Mã dự án": "ES200-1", "Thông tin": [task("Lắp đặt", "2025-05-12", "2025-05-14", 6)]}
+    ]}
+]
+
+# Cuối tuần 8/3 - 9/3 nằm trong kế hoạch của mọi công việc (cột chỉ có số 0)
+SHARED_WEEKEND = [
+    {"Tên nhân sự": "Nguyễn Văn A", "Dự án": [
+        {"Mã dự án": "ES192-5-A2302", "Thông tin": [task("Khảo sát", "2025-03-07", "2025-03-10", 8)]}
+    ]},
+    {"Tên nhân sự": "Trần Văn B", "Dự án": [
+        {"Mã dự án": "ES192-5-A2302", "Thông tin": [task("Khảo sát", "2025-03-08", "2025-03-09", 3)]}
+    ]}
+]
+
+@pytest.fixture(autouse=True)
+def default_calendar(monkeypatch):
+    """Dùng lịch nghỉ lễ mặc định cho cả hai bản."""
+    monkeypatch.delenv("POD_HOLIDAYS", raising=False)
+    monkeypatch.delenv("POD_HOLIDAYS_FILE", raising=False)
+    monkeypatch.setattr(POD_Calendar, "_business_calendar", None)
+
+@pytest.mark.parametrize("json_data", [HOLIDAY_AND_GAP, SHARED_WEEKEND], ids=["holiday_and_gap", "shared_weekend"])
+def test_matches_row_by_row_reference(json_data):
+    result = generate_dataframe(json_data)
+    pd.testing.assert_frame_equal(result, generate_dataframe_rows(json_data))
+
+def test_calendar_values():
+    result = generate_dataframe(HOLIDAY_AND_GAP).set_index("Mô tả công việc")
+    assert result.loc["Khảo sát", ["2025-04-29", "2025-04-30", "2025-05-01", "2025-05-02"]].tolist() == [8, 0, 0, 8]
+    assert result.loc["Báo cáo", ["2025-05-02", "2025-05-03", "2025-05-04"]].tolist() == [2.5, 0, 0]
+    assert pd.isna(result.loc["Báo cáo", "2025-05-05"])
+    assert result["2025-05-07"].isna().all()
+    assert generate_dataframe(SHARED_WEEKEND)["2025-03-08"].dtype == "int64"
@@ -0,0 +1,156 @@
+import asyncio
+import json
+import uuid
+from io import BytesIO
+from typing import List, Optional
+import pytest
+from pydantic import BaseModel
+from fake_minio import FakeMinio
+from src import POD_Cache
+from src.POD_Cache import FrameCache, TTLCache
+from src.POD_TimeTracker import POD_TimeTracker_Getfile_function, POD_TimeTracker_Download_function, build_timesheet, json_to_tasks, write_summary_workbook
+
+BUCKET = "estec"
+EMPLOYEES = ["Nguyễn Văn A", "Trần Văn B", "Lê Văn C"]
+
+class DownloadInput(BaseModel):
+    request_id: str = "evisor-1234567890"
+    user_id: str = "hoanvlh"
+    path_file: str = None
+
+class GetfileInput(BaseModel):
+    request_id: str = "evisor-1234567890"
+    user_id: str = "hoanvlh"
+    path_file: str = None
+    offset: int = 0
+    limit: Optional[int] = None
+    columns: Optional[List[str]] = None
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    employees: Optional[List[str]] = None
+    stream: bool = False
+
+def summary_bytes(qtys: tuple = (8, 4, 2)) -> bytes:
+    """File tổng hợp 3 nhân sự, mỗi người một công việc 3/3 - 5/3/2025."""
+    forms = [
+        {"Tên nhân sự": name, "Dự án": [{"Mã dự án": "ES192-5-A2302", "Thông tin": [
+            {"Mô tả công việc": "Khảo sát", "Kế hoạch - Từ": "2025-03-03", "Kế hoạch - Đến": "2025-03-05", "QTY": qty, "Nơi làm việc": None}
+        ]}]}
+        for name, qty in zip(EMPLOYEES, qtys)
+    ]
+    buffer = BytesIO()
+    write_summary_workbook(build_timesheet([json_to_tasks(forms)]), buffer)
+    return buffer.getvalue()
+
+@pytest.fixture(autouse=True)
+def fresh_caches(monkeypatch):
+    """Cache riêng cho mỗi test, không ghi ra đĩa."""
+    monkeypatch.setattr(POD_Cache, "_workbook_cache", FrameCache(memory_items=8, disk_dir=None, disk_max_bytes=0))
+    monkeypatch.setattr(POD_Cache, "_payload_cache", TTLCache(ttl=300, max_items=64))
+    monkeypatch.setattr(POD_Cache, "_presign_cache", TTLCache(ttl=300, max_items=64))
+
+@pytest.fixture
+def summary():
+    minio_client = FakeMinio()
+    path_file = f"data/POD/TimeTracker/Output/{uuid.uuid4().hex}.xlsx"
+    minio_client.objects[(BUCKET, path_file)] = summary_bytes()
+    return minio_client, path_file
+
+def getfile(minio_client, path_file: str, if_none_match: Optional[str] = None, **params):
+    return POD_TimeTracker_Getfile_function(minio_client, GetfileInput(path_file=path_file, **params), BUCKET, if_none_match)
+
+def read_stream(response) -> bytes:
+    async def collect():
+        return b"".join([chunk if isinstance(chunk, bytes) else chunk.encode("utf-8") async for chunk in response.body_iterator])
+    return asyncio.run(collect())
+
+def test_pages_cover_all_rows(summary):
+    pages = [json.loads(getfile(*summary, offset=offset, limit=2).body) for offset in (0, 2)]
+    assert [page["total"] for page in pages] == [3, 3]
+    assert [row["Tên nhân sự"] for page in pages for row in page["data"]] == EMPLOYEES
+    assert (pages[1]["offset"], pages[1]["limit"], len(pages[1]["data"])) == (2, 2, 1)
+
+def test_column_projection_and_filters(summary):
+    page = json.loads(getfile(*summary, columns=["Tên nhân sự", "2025-03-03", "2025-03-04"], date_from="2025-03-04", employees=["Trần Văn B"]).body)
+    assert page["total"] == 1
+    assert page["data"] == [{"Tên nhân sự": "Trần Văn B", "2025-03-04": 4}]
+
+def test_unknown_column(summary):
+    result = getfile(*summary, columns=["Không có"])
+    assert result["status"] == "error"
+    assert "Không có" in result["message"]
+
+def test_stream_ndjson(summary):
+    response = getfile(*summary, offset=1, stream=True, columns=["Tên nhân sự", "2025-03-05"])
+    assert response.headers["X-Total-Count"] == "3"
+    lines = read_stream(response).decode("utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == [{"Tên nhân sự": "Trần Văn B", "2025-03-05": 4}, {"Tên nhân sự": "Lê Văn C", "2025-03-05": 2}]
+
+def fail_download(*args, **kwargs):
+    raise AssertionError("file không được tải lại")
+
+def test_if_none_match_returns_304(summary):
+    minio_client, path_file = summary
+    first = getfile(*summary, limit=2)
+    etag = first.headers["ETag"]
+    minio_client.get_object = fail_download
+    # Khớp ETag (kể cả trong danh sách / ETag yếu): 304, không đọc file
+    for if_none_match in (etag, f'"other", W/{etag}', "*"):
+        response = getfile(*summary, if_none_match=if_none_match, limit=2)
+        assert (response.status_code, response.headers["ETag"]) == (304, etag)
+    # Không gửi If-None-Match: nội dung lấy từ cache
+    assert getfile(*summary, limit=2).body == first.body
+    # Tham số khác: ETag khác, bảng lấy từ cache dạng cột
+    other = getfile(*summary, limit=1, if_none_match=etag)
+    assert other.status_code == 200 and other.headers["ETag"] != etag
+
+def test_etag_changes_when_file_is_replaced(summary):
+    minio_client, path_file = summary
+    etag = getfile(*summary).headers["ETag"]
+    minio_client.objects[(BUCKET, path_file)] = summary_bytes((6, 4, 2))
+    response = getfile(*summary, if_none_match=etag)
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+    assert json.loads(response.body)["data"][0]["2025-03-03"] == 6
+
+def test_download_reuses_presigned_url(summary):
+    minio_client, path_file = summary
+    first = POD_TimeTracker_Download_function(minio_client, DownloadInput(path_file=f"{BUCKET}/{path_file}"), BUCKET)
+    second = POD_TimeTracker_Download_function(minio_client, DownloadInput(path_file=path_file), BUCKET)
+    assert json.loads(first.body)["url"] == json.loads(second.body)["url"]
+    assert minio_client.presigned_gets == 1
+    etag = first.headers["ETag"]
+    assert POD_TimeTracker_Download_function(minio_client, DownloadInput(path_file=path_file), BUCKET, etag).status_code == 304
+    # File mới (ETag mới): URL mới
+    minio_client.objects[(BUCKET, path_file)] = summary_bytes((6, 4, 2))
+    third = POD_TimeTracker_Download_function(minio_client, DownloadInput(path_file=path_file), BUCKET, etag)
+    assert third.status_code == 200 and minio_client.presigned_gets == 2
+
+def test_ttl_cache_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(POD_Cache.time, "monotonic", lambda: now[0])
+    cache = TTLCache(ttl=60, max_items=8)
+    cache.put("a", 1)
+    cache.put("b", 2, ttl=10)
+    now[0] += 30
+    assert (cache.get("a"), cache.get("b")) == (1, None)
+    now[0] += 30
+    assert cache.get("a") is None
+    assert cache.stats()["items"] == 0
+
+def test_ttl_cache_eviction_by_items_and_bytes():
+    cache = TTLCache(ttl=60, max_items=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    # "b" ít được dùng gần đây nhất
+    assert [cache.get(key) for key in ("a", "b", "c")] == [1, None, 3]
+
+    cache = TTLCache(ttl=60, max_items=8, max_bytes=100)
+    for key in "abcd":
+        cache.put(key, key, size=25)
+    cache.put("e", "e", size=25)
+    assert cache.get("a") is None and cache.stats()["bytes"] == 100
+    # Giá trị lớn hơn 1/4 dung lượng không được cache
+    cache.put("big", "big", size=26)
+    assert cache.get("big") is None and cache.get("b") == "b"
@@ -0,0 +1,63 @@
+import uuid
+import pytest
+from src.POD_Jobs import job_dedup_key, enqueue_job
+from src.DB_Connection import get_postgres_pool
+
+def merge_payload(**changes) -> dict:
+    payload = {
+        "request_id": "evisor-1234567890",
+        "user_id": "hoanvlh",
+        "start_time": "2025-06-23T15:20:00",
+        "path_files": ["data/POD/TimeTracker/Input/Form mau 1.xlsx", "data/POD/TimeTracker/Input/Form mau 2.xlsx"],
+        "summary_file": None,
+        "force": False
+    }
+    payload.update(changes)
+    return payload
+
+def test_dedup_key_ignores_request_id_and_start_time():
+    first = merge_payload()
+    resubmitted = merge_payload(request_id="evisor-999", start_time="2025-06-23T15:25:41")
+    assert job_dedup_key("hoanvlh", first) == job_dedup_key("hoanvlh", resubmitted)
+
+def test_dedup_key_depends_on_file_order():
+    # Thứ tự file quyết định thứ tự dòng trong file tổng hợp: đổi thứ tự là một job khác
+    first = merge_payload()
+    reordered = merge_payload(path_files=list(reversed(first["path_files"])))
+    assert job_dedup_key("hoanvlh", first) != job_dedup_key("hoanvlh", reordered)
+
+def test_dedup_key_depends_on_work():
+    base = job_dedup_key("hoanvlh", merge_payload())
+    assert job_dedup_key("other", merge_payload()) != base
+    assert job_dedup_key("hoanvlh", merge_payload(path_files=["data/POD/TimeTracker/Input/Form mau 1.xlsx"])) != base
+    assert job_dedup_key("hoanvlh", merge_payload(summary_file="estec/data/POD/TimeTracker/Output/ES_1.xlsx")) != base
+    assert job_dedup_key("hoanvlh", merge_payload(force=True)) != base
+
+@pytest.fixture
+def conn():
+    try:
+        connection = get_postgres_pool().connection()
+        conn = connection.__enter__()
+    except Exception as e:
+        pytest.skip(f"PostgreSQL không sẵn sàng: {e}")
+    try:
+        yield conn
+    finally:
+        connection.__exit__(None, None, None)
+
+def test_resubmission_returns_same_job(conn):
+    user_id = f"test-{uuid.uuid4().hex[:8]}"
+    try:
+        first = enqueue_job(conn, user_id, "evisor-1", merge_payload(user_id=user_id), user_limit=0, queue_max=0)
+        resubmitted = enqueue_job(
+            conn, user_id, "evisor-2",
+            merge_payload(user_id=user_id, request_id="evisor-2", start_time="2025-06-23T16:00:00"),
+            user_limit=0, queue_max=0
+        )
+        assert resubmitted["job_id"] == first["job_id"]
+        assert resubmitted["duplicate"] is True
+    finally:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM "MergeJob" WHERE "user_id" = %s', (user_id,))
+        conn.commit()
+        cursor.close()
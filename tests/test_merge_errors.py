@@ -0,0 +1,51 @@
+from datetime import datetime
+import psycopg2
+import pytest
+import urllib3
+from minio.error import S3Error
+from pydantic import BaseModel
+from typing import List, Optional
+from src.POD_TimeTracker import is_transient_error, POD_TimeTracker_Merge_function
+
+class MergeInput(BaseModel):
+    request_id: str = "evisor-1234567890"
+    user_id: str = "hoanvlh"
+    start_time: datetime = datetime(2025, 6, 23, 15, 20)
+    path_files: List[str] = ["data/POD/TimeTracker/Input/Form mau 1.xlsx"]
+    summary_file: Optional[str] = None
+    force: bool = True
+
+def s3_error(code: str) -> S3Error:
+    return S3Error(None, code, code, "/estec/data", "r", "h")
+
+class FailingMinio:
+    """MinIO giả: mọi lệnh stat_object đều raise lỗi cho trước."""
+    def __init__(self, error: Exception):
+        self.error = error
+
+    def stat_object(self, bucket_name, object_name):
+        raise self.error
+
+@pytest.mark.parametrize("error", [
+    s3_error("InternalError"),
+    urllib3.exceptions.MaxRetryError(None, "/estec/data"),
+    ConnectionResetError(),
+    psycopg2.OperationalError("server closed the connection unexpectedly"),
+])
+def test_infrastructure_errors_are_transient(error):
+    assert is_transient_error(error)
+    wrapped = Exception("Error saving file to MinIO")
+    wrapped.__cause__ = error
+    assert is_transient_error(wrapped)
+
+@pytest.mark.parametrize("error", [s3_error("NoSuchKey"), ValueError("start_date must be before end_date")])
+def test_data_errors_are_not_transient(error):
+    assert not is_transient_error(error)
+
+def test_merge_raises_infrastructure_errors_for_retry():
+    with pytest.raises(urllib3.exceptions.MaxRetryError):
+        POD_TimeTracker_Merge_function(FailingMinio(urllib3.exceptions.MaxRetryError(None, "/estec/data")), MergeInput())
+
+def test_merge_returns_error_for_missing_file():
+    result = POD_TimeTracker_Merge_function(FailingMinio(s3_error("NoSuchKey")), MergeInput())
+    assert result["status"] == "error"
@@ -0,0 +1,57 @@
+from io import BytesIO
+import numpy as np
+import pandas as pd
+from fake_minio import FakeMinio
+from src.POD_TimeTracker import render_summary, save_summary_sidecar, load_summary_sidecar, summary_to_cells, sidecar_object_name, INFO_COLUMNS
+
+BUCKET = "estec"
+SUMMARY = "data/POD/TimeTracker/Output/POD_TimeTracker_test.xlsx"
+
+def task(description: str, start: str, end: str, qty: float) -> dict:
+    return {"Mô tả công việc": description, "Kế hoạch - Từ": start, "Kế hoạch - Đến": end, "QTY": qty, "Nơi làm việc": "Văn phòng"}
+
+FORMS = [[
+    {"Tên nhân sự": "Nguyễn Văn A", "Dự án": [
+        {"Mã dự án": "ES192-5-A2302", "Thông tin": [task("Khảo sát", "2025-04-28", "2025-05-02", 8), task("Báo cáo", "2025-05-05", "2025-05-06", 2.5)]}
+    ]},
+    {"Tên nhân sự": "Trần Văn B", "Dự án": [
+        {"Mã dự án": "ES200-1", "Thông tin": [task("Lắp đặt", "2025-05-02", "2025-05-05", 6)]}
+    ]}
+]]
+
+def export(minio_client: FakeMinio):
+    """Ghi file tổng hợp và sidecar của FORMS lên MinIO giả, trả về timesheet và nội dung xlsx."""
+    timesheet, workbook, _ = render_summary(FORMS)
+    minio_client.objects[(BUCKET, SUMMARY)] = workbook
+    save_summary_sidecar(minio_client, f"{BUCKET}/{SUMMARY}", timesheet)
+    return timesheet, workbook
+
+def assert_cells_equal(left: tuple, right: tuple, check_dtype: bool = True):
+    pd.testing.assert_frame_equal(left[0].reset_index(drop=True), right[0].reset_index(drop=True), check_dtype=check_dtype)
+    for left_array, right_array in zip(left[1:], right[1:]):
+        np.testing.assert_array_equal(left_array, right_array)
+
+def test_sidecar_round_trip():
+    minio_client = FakeMinio()
+    timesheet, workbook = export(minio_client)
+    assert (BUCKET, sidecar_object_name(SUMMARY)) in minio_client.objects
+
+    cells = load_summary_sidecar(minio_client, BUCKET, SUMMARY, minio_client.stat_object(BUCKET, SUMMARY).etag)
+    assert_cells_equal(cells, timesheet.to_cells())
+    # Cùng giá trị với cách đọc lại file xlsx (ô merge được điền lại bằng ffill, STT thành số thực)
+    df = pd.read_excel(BytesIO(workbook), engine="openpyxl")
+    df[INFO_COLUMNS] = df[INFO_COLUMNS].ffill()
+    assert_cells_equal(cells, summary_to_cells(df), check_dtype=False)
+
+def test_sidecar_ignored_when_summary_changed():
+    minio_client = FakeMinio()
+    export(minio_client)
+    # File tổng hợp bị sửa tay / upload đè: ETag không còn khớp với sidecar
+    minio_client.objects[(BUCKET, SUMMARY)] += b" "
+    assert load_summary_sidecar(minio_client, BUCKET, SUMMARY, minio_client.stat_object(BUCKET, SUMMARY).etag) is None
+
+def test_missing_sidecar():
+    minio_client = FakeMinio()
+    export(minio_client)
+    del minio_client.objects[(BUCKET, sidecar_object_name(SUMMARY))]
+    assert load_summary_sidecar(minio_client, BUCKET, SUMMARY, minio_client.stat_object(BUCKET, SUMMARY).etag) is None
@@ -0,0 +1,57 @@
+from io import BytesIO
+import numpy as np
+import openpyxl
+from src.POD_TimeTracker import build_timesheet, json_to_tasks, write_summary_workbook, INFO_COLUMNS
+
+def task(description: str, start: str, end: str, qty: float) -> dict:
+    return {"Mô tả công việc": description, "Kế hoạch - Từ": start, "Kế hoạch - Đến": end, "QTY": qty, "Nơi làm việc": "Văn phòng"}
+
+# Nghỉ lễ 30/4 - 1/5. Ngày 29/4 nhân sự A làm 8 + 2,5 giờ, ngày 2/5 nhân sự B làm 9 giờ
+FORM_A = [{"Tên nhân sự": "Nguyễn Văn A", "Dự án": [
+    {"Mã dự án": "ES192-5-A2302", "Thông tin": [task("Báo cáo", "2025-04-29", "2025-04-29", 2.5), task("Khảo sát", "2025-04-28", "2025-05-02", 8)]}
+]}]
+FORM_B = [{"Tên nhân sự": "Trần Văn B", "Dự án": [
+    {"Mã dự án": "ES200-1", "Thông tin": [task("Lắp đặt", "2025-05-02", "2025-05-02", 9)]}
+]}]
+
+def test_long_format_cells():
+    timesheet = build_timesheet([json_to_tasks(FORM_B), json_to_tasks(FORM_A)])
+    # Dòng sắp xếp theo STT, nhân sự, dự án, ngày bắt đầu
+    assert timesheet.info["Mô tả công việc"].tolist() == ["Khảo sát", "Báo cáo", "Lắp đặt"]
+    assert list(timesheet.info.columns) == INFO_COLUMNS
+    cells = timesheet.cells
+    # Chỉ các ngày trong kế hoạch có ô (5 + 1 + 1), theo thứ tự (dòng, ngày)
+    assert cells["Dòng"].tolist() == [0, 0, 0, 0, 0, 1, 2]
+    assert [str(day)[:10] for day in cells["Ngày"]] == ["2025-04-28", "2025-04-29", "2025-04-30", "2025-05-01", "2025-05-02", "2025-04-29", "2025-05-02"]
+    assert cells["Giờ"].tolist() == [8, 8, 0, 0, 8, 2.5, 9]
+    assert cells["Tên nhân sự"].dtype == "category"
+    assert cells["Tên nhân sự"].astype(str).tolist() == ["Nguyễn Văn A"] * 6 + ["Trần Văn B"]
+    np.testing.assert_array_equal(timesheet.calendar_days(), np.arange("2025-04-28", "2025-05-03", dtype="datetime64[D]"))
+
+def test_base_rows_stay_before_new_rows():
+    base = build_timesheet([json_to_tasks(FORM_A)])
+    timesheet = build_timesheet([json_to_tasks(FORM_A)], base_cells=base.to_cells())
+    assert len(timesheet.info) == 4
+    assert timesheet.info["Mô tả công việc"].tolist() == ["Khảo sát", "Khảo sát", "Báo cáo", "Báo cáo"]
+    assert np.bincount(timesheet.cells["Dòng"]).tolist() == [5, 5, 1, 1]
+
+def test_export_styles_and_merged_ranges():
+    buffer = BytesIO()
+    overwork = write_summary_workbook(build_timesheet([json_to_tasks(FORM_A + FORM_B)]), buffer)
+    assert [item["employee"] for item in overwork] == ["Nguyễn Văn A", "Trần Văn B"]
+    sheet = openpyxl.load_workbook(BytesIO(buffer.getvalue()))["Sheet1"]
+
+    # Cột G -> K: 28/4 -> 2/5, ngày lễ 30/4 và 1/5 có header màu hồng
+    assert [sheet.cell(row=1, column=column).value for column in range(7, 12)] == ["2025-04-28", "2025-04-29", "2025-04-30", "2025-05-01", "2025-05-02"]
+    assert [sheet.cell(row=1, column=column).style for column in range(6, 12)] == ["pod_header"] * 3 + ["pod_header_weekend"] * 2 + ["pod_header"]
+    assert sheet["A2"].style == "pod_info"
+    # Đúng 8 giờ: không tô; tổng ngày của nhân sự > 8: vàng; ô > 8: đỏ; < 8: xanh
+    assert sheet["G2"].style == "pod_day"
+    assert (sheet["H2"].style, sheet["H3"].style) == ("pod_day_warning", "pod_day_warning")
+    assert sheet["K4"].style == "pod_day_overwork"
+    assert sheet["I2"].style == "pod_day_normal"
+    assert sheet["G3"].value is None
+
+    # STT, nhân sự, dự án của hai dòng nhân sự A được merge; mô tả khác nhau thì không
+    assert sorted(str(merged) for merged in sheet.merged_cells.ranges) == ["A2:A3", "B2:B3", "C2:C3"]
+    assert (sheet["B2"].value, sheet["B3"].value) == ("Nguyễn Văn A", None)
@@ -0,0 +1,43 @@
+from datetime import date
+import pytest
+from src import POD_Calendar
+from src.POD_Timesheet_DB import ensure_timesheet_partitions, timesheet_year_window, TimesheetYearRangeError
+
+class RecordingCursor:
+    """Cursor giả: ghi lại các câu lệnh, mọi partition đều chưa tồn tại."""
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, query, params=None):
+        self.statements.append(query)
+
+    def fetchone(self):
+        return (None,)
+
+    def created(self):
+        return [query for query in self.statements if query.startswith("CREATE TABLE")]
+
+@pytest.fixture(autouse=True)
+def default_calendar(monkeypatch):
+    """Dùng lịch nghỉ lễ mặc định (phủ 2025 - 2026)."""
+    monkeypatch.delenv("POD_HOLIDAYS", raising=False)
+    monkeypatch.delenv("POD_HOLIDAYS_FILE", raising=False)
+    monkeypatch.setattr(POD_Calendar, "_business_calendar", None)
+    monkeypatch.setattr(POD_Calendar, "_holiday_years", None)
+
+def test_year_window_follows_holiday_calendar():
+    assert timesheet_year_window() == (2024, 2027)
+
+def test_partitions_created_within_window():
+    cursor = RecordingCursor()
+    ensure_timesheet_partitions(cursor, date(2024, 12, 30), date(2026, 1, 2))
+    assert [query.split('"')[1] for query in cursor.created()] == ["TimesheetEntry_2024", "TimesheetEntry_2025", "TimesheetEntry_2026"]
+
+def test_typo_year_rejected_without_creating_partitions():
+    cursor = RecordingCursor()
+    with pytest.raises(TimesheetYearRangeError, match="2205"):
+        ensure_timesheet_partitions(cursor, date(2025, 3, 3), date(2205, 3, 4))
+    assert cursor.statements == []
+    with pytest.raises(TimesheetYearRangeError):
+        ensure_timesheet_partitions(cursor, date(2015, 3, 3), date(2025, 3, 4))
+    assert cursor.statements == []
@@ -0,0 +1,50 @@
+from io import BytesIO
+import openpyxl
+from fake_minio import FakeMinio
+from src.POD_Upload import complete_uploads, presign_uploads, POD_INPUT_PREFIX
+
+BUCKET = "estec"
+
+def xlsx_bytes() -> bytes:
+    buffer = BytesIO()
+    openpyxl.Workbook().save(buffer)
+    return buffer.getvalue()
+
+def test_presign_put_complete():
+    minio_client = FakeMinio()
+    presigned = presign_uploads(minio_client, BUCKET, ["Form mau 1.xlsx"])
+    assert presigned["status"] == "success"
+    upload = presigned["uploads"][0]
+    assert not upload["path_file"].startswith(POD_INPUT_PREFIX)
+
+    minio_client.put(upload["url"], xlsx_bytes())
+    result = complete_uploads(minio_client, BUCKET, [upload["path_file"]])
+    assert result == {"status": "success", "path_files": [f"{POD_INPUT_PREFIX}Form mau 1.xlsx"]}
+    assert set(minio_client.objects) == {(BUCKET, f"{POD_INPUT_PREFIX}Form mau 1.xlsx")}
+
+def test_complete_rejects_bad_magic_without_touching_input():
+    minio_client = FakeMinio()
+    existing = (BUCKET, f"{POD_INPUT_PREFIX}Form mau 1.xlsx")
+    minio_client.objects[existing] = xlsx_bytes()
+    upload = presign_uploads(minio_client, BUCKET, ["Form mau 1.xlsx"])["uploads"][0]
+
+    minio_client.put(upload["url"], b"not an excel file")
+    result = complete_uploads(minio_client, BUCKET, [upload["path_file"]])
+    assert result["status"] == "error"
+    assert "không phải file Excel" in result["message"][0]
+    # File hợp lệ cùng tên của client khác trong Input vẫn còn nguyên
+    assert set(minio_client.objects) == {existing}
+
+def test_complete_rejects_missing_object():
+    minio_client = FakeMinio()
+    upload = presign_uploads(minio_client, BUCKET, ["Form mau 1.xlsx"])["uploads"][0]
+    result = complete_uploads(minio_client, BUCKET, [upload["path_file"]])
+    assert result["status"] == "error"
+    assert "chưa được upload" in result["message"][0]
+
+def test_complete_rejects_paths_outside_staging():
+    minio_client = FakeMinio()
+    minio_client.objects[(BUCKET, f"{POD_INPUT_PREFIX}Form mau 1.xlsx")] = xlsx_bytes()
+    result = complete_uploads(minio_client, BUCKET, [f"{POD_INPUT_PREFIX}Form mau 1.xlsx"])
+    assert result["status"] == "error"
+    assert (BUCKET, f"{POD_INPUT_PREFIX}Form mau 1.xlsx") in minio_client.objects
@@ -0,0 +1,95 @@
+import asyncio
+import zipfile
+from io import BytesIO
+from typing import List
+from pydantic import BaseModel
+from starlette.datastructures import UploadFile
+from fake_minio import FakeMinio
+from src.POD_Upload import ingest_zip, POD_INPUT_PREFIX
+from src.POD_TimeTracker import POD_TimeTracker_Download_Zip_function, iter_zip_objects
+
+BUCKET = "estec"
+
+class DownloadZipInput(BaseModel):
+    request_id: str = "evisor-1234567890"
+    user_id: str = "hoanvlh"
+    path_files: List[str]
+
+def xlsx_like(text: str) -> bytes:
+    """Nội dung bắt đầu bằng magic bytes của file zip / xlsx (chỉ magic bytes được kiểm tra khi nhận zip)."""
+    return b"PK\x03\x04" + text.encode("utf-8")
+
+def zip_upload(entries: dict, filename: str = "forms.zip") -> UploadFile:
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return UploadFile(file=buffer, filename=filename)
+
+def read_stream(response) -> bytes:
+    async def collect():
+        return b"".join([chunk async for chunk in response.body_iterator])
+    return asyncio.run(collect())
+
+def test_ingest_zip_uploads_forms_in_order():
+    minio_client = FakeMinio()
+    upload = zip_upload({
+        "Tuần 10/Form mau 2.xlsx": xlsx_like("form 2"),
+        "Tuần 10/": b"",
+        "__MACOSX/Tuần 10/._Form mau 2.xlsx": b"mac",
+        "Form mau 1.xlsx": xlsx_like("form 1"),
+    })
+    result = ingest_zip(minio_client, BUCKET, upload)
+    assert result == {"status": "success", "path_files": [f"{POD_INPUT_PREFIX}Form mau 2.xlsx", f"{POD_INPUT_PREFIX}Form mau 1.xlsx"]}
+    assert minio_client.objects[(BUCKET, f"{POD_INPUT_PREFIX}Form mau 1.xlsx")] == xlsx_like("form 1")
+    assert len(minio_client.objects) == 2
+
+def test_ingest_zip_is_all_or_nothing():
+    minio_client = FakeMinio()
+    upload = zip_upload({
+        "Form mau 1.xlsx": xlsx_like("form 1"),
+        "Form mau 2.xlsx": b"not an excel file",
+        "Ghi chú.txt": b"note",
+        "Tuần 11/Form mau 1.xlsx": xlsx_like("form 1 (tuần 11)"),
+    })
+    result = ingest_zip(minio_client, BUCKET, upload)
+    assert result["status"] == "error"
+    assert len(result["message"]) == 3
+    assert any("trùng tên" in message for message in result["message"])
+    # Có file không hợp lệ: không file nào được lưu, kể cả file hợp lệ
+    assert minio_client.objects == {}
+
+def test_ingest_rejects_non_zip():
+    minio_client = FakeMinio()
+    result = ingest_zip(minio_client, BUCKET, UploadFile(file=BytesIO(b"not a zip"), filename="forms.zip"))
+    assert result["status"] == "error"
+    assert minio_client.objects == {}
+
+def test_download_zip_streams_files():
+    minio_client = FakeMinio()
+    files = {
+        "data/POD/TimeTracker/Output/ES_1.xlsx": xlsx_like("summary 1" * 100),
+        "data/POD/TimeTracker/Input/ES_1.xlsx": xlsx_like("form 1"),
+    }
+    for object_name, data in files.items():
+        minio_client.objects[(BUCKET, object_name)] = data
+    response = POD_TimeTracker_Download_Zip_function(minio_client, DownloadZipInput(path_files=[f"{BUCKET}/{name}" for name in files]), BUCKET)
+    assert response.media_type == "application/zip"
+    with zipfile.ZipFile(BytesIO(read_stream(response))) as archive:
+        # Trùng tên file: thêm hậu tố (1)
+        assert archive.namelist() == ["ES_1.xlsx", "ES_1 (1).xlsx"]
+        assert [archive.read(name) for name in archive.namelist()] == list(files.values())
+
+def test_download_zip_chunks_and_missing_file():
+    minio_client = FakeMinio()
+    data = xlsx_like("summary" * 1000)
+    minio_client.objects[(BUCKET, "data/POD/TimeTracker/Output/ES_1.xlsx")] = data
+    # Mỗi đoạn đọc từ MinIO được gửi ngay, không chờ cả file
+    chunks = list(iter_zip_objects(minio_client, BUCKET, ["data/POD/TimeTracker/Output/ES_1.xlsx"], chunk_size=1024))
+    assert len(chunks) > len(data) // 1024
+    with zipfile.ZipFile(BytesIO(b"".join(chunks))) as archive:
+        assert archive.read("ES_1.xlsx") == data
+    # File không tồn tại: báo lỗi trước khi bắt đầu gửi
+    result = POD_TimeTracker_Download_Zip_function(minio_client, DownloadZipInput(path_files=["data/POD/TimeTracker/Output/ES_1.xlsx", "data/POD/TimeTracker/Output/ES_2.xlsx"]), BUCKET)
+    assert result["status"] == "error"